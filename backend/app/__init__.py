@@ -7,6 +7,9 @@ from .routes.update import update_bp
 from .routes.news_routes import news_bp
 from .routes.notification.routes import notification_bp
 from .routes.refresh_times_routes import refresh_times_bp
+from .routes.diagnostics_routes import diagnostics_bp
+from .routes.license_routes import license_bp
+from .routes.job_routes import jobs_bp
 
 def create_app():
     app = Flask(__name__)
@@ -27,5 +30,8 @@ def create_app():
     app.register_blueprint(news_bp, url_prefix='/api')
     app.register_blueprint(notification_bp, url_prefix='/api')
     app.register_blueprint(refresh_times_bp, url_prefix='/api')
+    app.register_blueprint(diagnostics_bp, url_prefix='/api')
+    app.register_blueprint(license_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
     
     return app
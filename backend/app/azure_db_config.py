@@ -1,9 +1,299 @@
 
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 import pyodbc
 import json
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, FrozenSet, Tuple, Sequence
+
+from .date_utils import parse_datetime_utc
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available within the checkout timeout."""
+
+
+class PooledCursor:
+    """A pyodbc cursor that keeps its PooledConnection alive.
+
+    Without this reference, get_db_connection().cursor() would drop the
+    connection wrapper at once, and its finalizer would hand the session to
+    another thread while the cursor is still using it.
+    """
+
+    def __init__(self, connection, raw_cursor):
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, '_raw', raw_cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+    def execute(self, *args, **kwargs):
+        # pyodbc returns the raw cursor for chaining; return this wrapper instead
+        self._raw.execute(*args, **kwargs)
+        return self
+
+    # Defined here rather than forwarded, so a chained execute(...).fetchall()
+    # keeps the wrapper, and with it the connection, alive until it returns
+    def fetchone(self):
+        return self._raw.fetchone()
+
+    def fetchall(self):
+        return self._raw.fetchall()
+
+    def fetchmany(self, *args):
+        return self._raw.fetchmany(*args)
+
+    def fetchval(self):
+        return self._raw.fetchval()
+
+    def __iter__(self):
+        yield from self._raw
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+
+class PooledConnection:
+    """A pyodbc connection borrowed from a ConnectionPool.
+
+    Behaves like the underlying connection, except that close() hands it back
+    to the pool instead of tearing down the session. It can also be used as a
+    context manager: the transaction is committed (or rolled back on error) and
+    the connection is returned to the pool on exit. Cursors hold a reference
+    to it, so it is only returned on garbage collection once they are gone.
+    """
+
+    def __init__(self, pool, raw_conn, created_at):
+        self._pool = pool
+        self._raw = raw_conn
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._released:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool")
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        # Settings such as autocommit belong to the pyodbc connection
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+            return
+        if self._released:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool")
+        setattr(self._raw, name, value)
+
+    def cursor(self):
+        if self._released:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool")
+        return PooledCursor(self, self._raw.cursor())
+
+    def execute(self, *args, **kwargs):
+        """Run a statement on a new cursor, like pyodbc's Connection.execute."""
+        return self.cursor().execute(*args, **kwargs)
+
+    def close(self):
+        """Return the connection to the pool."""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._raw.commit()
+            else:
+                self._raw.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Connections that are dropped without close() still go back to the pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of pyodbc connections."""
+
+    def __init__(self, connect, max_size=10, timeout=30.0, max_lifetime=1800.0, validate_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+
+        self._idle = deque()  # (raw_conn, created_at, returned_at)
+        self._size = 0
+        self._cond = threading.Condition()
+
+        # Statistics
+        self._checkouts = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+
+    def acquire(self, timeout=None):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout}s waiting for a database connection "
+                            f"(pool size {self.max_size}, all in use)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    raw, created_at, returned_at = self._idle.pop()
+                else:
+                    # Reserve a slot and open the connection outside the lock
+                    self._size += 1
+                    raw = None
+
+            if raw is None:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+                with self._cond:
+                    self._created += 1
+                break
+
+            now = time.monotonic()
+            if self.max_lifetime and now - created_at > self.max_lifetime:
+                self._discard(raw, recycled=True)
+                continue
+            if self.validate_after is not None and now - returned_at > self.validate_after:
+                if not self._is_alive(raw):
+                    self._discard(raw)
+                    continue
+            break
+
+        wait_time = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._total_wait += wait_time
+            self._max_wait = max(self._max_wait, wait_time)
+
+        return PooledConnection(self, raw, created_at)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always returns it."""
+        conn = self.acquire(timeout)
+        with conn:
+            yield conn
+
+    def _release(self, raw, created_at):
+        """Take a connection back, resetting any open transaction and autocommit."""
+        try:
+            raw.rollback()
+            if raw.autocommit:
+                raw.autocommit = False
+        except Exception:
+            self._discard(raw)
+            return
+
+        if self.max_lifetime and time.monotonic() - created_at > self.max_lifetime:
+            self._discard(raw, recycled=True)
+            return
+
+        with self._cond:
+            self._idle.append((raw, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, raw, recycled=False):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            if recycled:
+                self._recycled += 1
+            else:
+                self._discarded += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def close_all(self):
+        """Close every idle connection. Borrowed connections are closed as they come back."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw, _, _ in idle:
+            self._discard(raw, recycled=True)
+
+    def stats(self):
+        """Return a snapshot of pool usage for sizing and diagnostics."""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._size - idle,
+                'idle': idle,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'total_wait_seconds': round(self._total_wait, 4),
+                'avg_wait_seconds': round(self._total_wait / self._checkouts, 4) if self._checkouts else 0.0,
+                'max_wait_seconds': round(self._max_wait, 4),
+                'connections_created': self._created,
+                'connections_recycled': self._recycled,
+                'connections_discarded': self._discarded,
+            }
+
 
 class AzureSQLConfig:
     """Configuration and connection management for Azure SQL Database."""
@@ -18,6 +308,14 @@ class AzureSQLConfig:
         
         if not all([self.server, self.database, self.username, self.password]):
             raise ValueError("Missing required Azure SQL Database environment variables")
+        
+        # Connection pool settings
+        self.pool_size = int(os.getenv('AZURE_SQL_POOL_SIZE', '10'))
+        self.pool_timeout = float(os.getenv('AZURE_SQL_POOL_TIMEOUT', '30'))
+        self.pool_max_lifetime = float(os.getenv('AZURE_SQL_POOL_MAX_LIFETIME', '1800'))
+        self.pool_validate_after = float(os.getenv('AZURE_SQL_POOL_VALIDATE_AFTER', '30'))
+        self._pool = None
+        self._pool_lock = threading.Lock()
     
     def get_connection_string(self):
         """Get the connection string for Azure SQL Database."""
@@ -32,25 +330,220 @@ class AzureSQLConfig:
             f"Connection Timeout=30;"
         )
     
-    def get_connection(self):
-        """Get a connection to Azure SQL Database."""
+    def _open_connection(self):
+        """Open a new physical connection to Azure SQL Database."""
         try:
             conn = pyodbc.connect(self.get_connection_string())
             return conn
         except Exception as e:
             print(f"Error connecting to Azure SQL Database: {e}")
             raise
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        """The shared connection pool, created on first use."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self._open_connection,
+                        max_size=self.pool_size,
+                        timeout=self.pool_timeout,
+                        max_lifetime=self.pool_max_lifetime,
+                        validate_after=self.pool_validate_after
+                    )
+        return self._pool
+    
+    def get_connection(self):
+        """Borrow a pooled connection to Azure SQL Database.
+        
+        Calling close() on the returned connection hands it back to the pool.
+        """
+        return self.pool.acquire()
+    
+    def connection(self):
+        """Context manager that borrows a pooled connection and returns it on exit."""
+        return self.pool.connection()
+    
+    def open_dedicated_connection(self):
+        """Open a connection outside the pool; the caller closes it.
+        
+        For sessions held for a long time, such as fetch locks, which would
+        otherwise take pooled connections away from requests.
+        """
+        return self._open_connection()
+
+# Storage layouts for tenant data
+PER_TENANT_LAYOUT = "per_tenant"
+SHARED_LAYOUT = "shared"
+
+# Multi-tenant tables used by the shared layout, keyed by table type
+SHARED_TABLE_NAMES = {
+    "updates": "m365_updates",
+    "m365_news": "m365_news",
+    "windows_known_issues": "m365_win_issues",
+    "windows_products": "m365_win_products",
+}
+
+# Table types whose rows carry a content_hash for change detection
+CONTENT_HASH_TABLE_TYPES = ("updates", "windows_known_issues", "windows_products")
+
+# schema_versions key for the shared tables; sanitized tenant prefixes never contain '*'
+SHARED_SCHEMA_KEY = "*shared*"
+
+# Tenant-independent catalog tables, fetched once and read by every tenant
+GLOBAL_TABLE_NAMES = {
+    "m365_news": "global_m365_news",
+    "windows_known_issues": "global_win_issues",
+    "windows_products": "global_win_products",
+}
+
+# Columns a catalog table shares with the tenant overlay table of the same type
+CATALOG_COLUMNS = {
+    "m365_news": [
+        "id", "title", "published_date", "link", "summary", "categories", "fetch_date",
+        "published_date_utc", "fetch_date_utc"
+    ],
+    "windows_known_issues": [
+        "id", "product_id", "title", "description", "status", "start_date", "resolved_date",
+        "web_view_url", "start_date_utc", "resolved_date_utc"
+    ],
+}
+
+def create_global_catalog_tables(cursor):
+    """Create the global catalog tables if they don't exist yet.
+    
+    The RSS news feed and the Windows known issues are the same for every
+    tenant, so they are stored once. Products record when their known issues
+    were last refreshed, so a product shared by many tenants is fetched once
+    per refresh interval.
+    """
+    news_table = GLOBAL_TABLE_NAMES["m365_news"]
+    cursor.execute(f"""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{news_table}' AND xtype='U')
+        BEGIN
+            CREATE TABLE {news_table} (
+                id NVARCHAR(255) NOT NULL,
+                title NVARCHAR(MAX),
+                published_date NVARCHAR(100),
+                link NVARCHAR(MAX),
+                summary NVARCHAR(MAX),
+                categories NVARCHAR(MAX),
+                fetch_date NVARCHAR(100),
+                published_date_utc DATETIME2 NULL,
+                fetch_date_utc DATETIME2 NULL,
+                CONSTRAINT PK_{news_table} PRIMARY KEY NONCLUSTERED (id)
+            );
+            CREATE CLUSTERED INDEX CX_{news_table} ON {news_table} (published_date_utc);
+        END
+    """)
+    
+    issues_table = GLOBAL_TABLE_NAMES["windows_known_issues"]
+    cursor.execute(f"""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{issues_table}' AND xtype='U')
+        BEGIN
+            CREATE TABLE {issues_table} (
+                id NVARCHAR(255) NOT NULL,
+                product_id NVARCHAR(255),
+                title NVARCHAR(MAX),
+                description NVARCHAR(MAX),
+                status NVARCHAR(255),
+                start_date NVARCHAR(100),
+                resolved_date NVARCHAR(100),
+                web_view_url NVARCHAR(MAX),
+                start_date_utc DATETIME2 NULL,
+                resolved_date_utc DATETIME2 NULL,
+                content_hash BINARY(32) NULL,
+                CONSTRAINT PK_{issues_table} PRIMARY KEY NONCLUSTERED (id)
+            );
+            CREATE CLUSTERED INDEX CX_{issues_table} ON {issues_table} (product_id, start_date_utc);
+        END
+    """)
+    
+    products_table = GLOBAL_TABLE_NAMES["windows_products"]
+    cursor.execute(f"""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{products_table}' AND xtype='U')
+        CREATE TABLE {products_table} (
+            id NVARCHAR(255) NOT NULL PRIMARY KEY,
+            name NVARCHAR(MAX),
+            group_name NVARCHAR(MAX),
+            friendly_names NVARCHAR(MAX),
+            content_hash BINARY(32) NULL,
+            issues_refreshed_at DATETIME2 NULL
+        )
+    """)
+
+def backfill_typed_dates(cursor, table_name: str, key_columns: Sequence[str], date_columns: Sequence[str]) -> int:
+    """Set the "<column>_utc" companions of string date columns, parsed in Python.
+    
+    SQL Server can't parse the RFC 822 dates of RSS feeds, and the naive
+    timestamps this backend writes are local time, so values are parsed with
+    parse_datetime_utc exactly as the fetchers do on insert. Only rows whose
+    stored value differs are updated. Returns the number of rows updated.
+    """
+    select_list = ", ".join(f"{column}, {column}_utc" for column in date_columns)
+    cursor.execute(f"SELECT {', '.join(key_columns)}, {select_list} FROM {table_name}")
+    
+    updates = []
+    for row in cursor.fetchall():
+        keys = tuple(row[:len(key_columns)])
+        values = row[len(key_columns):]
+        typed = tuple(parse_datetime_utc(values[2 * i]) for i in range(len(date_columns)))
+        stored = tuple(values[2 * i + 1] for i in range(len(date_columns)))
+        if typed != stored:
+            updates.append(typed + keys)
+    
+    if updates:
+        set_clause = ", ".join(f"{column}_utc = ?" for column in date_columns)
+        where_clause = " AND ".join(f"{column} = ?" for column in key_columns)
+        cursor.fast_executemany = True
+        cursor.executemany(f"UPDATE {table_name} SET {set_clause} WHERE {where_clause}", updates)
+        cursor.fast_executemany = False
+    return len(updates)
+
+@dataclass(frozen=True)
+class TableMetadata:
+    """Cached catalog information for a tenant table."""
+    exists: bool
+    columns: FrozenSet[str]
 
 class TenantTableManager:
     """Manages tenant-specific tables in Azure SQL Database."""
     
-    def __init__(self, azure_config: AzureSQLConfig):
+    def __init__(self, azure_config: AzureSQLConfig, storage_layout: Optional[str] = None):
         self.azure_config = azure_config
+        self.storage_layout = storage_layout or os.getenv('TENANT_STORAGE_LAYOUT', PER_TENANT_LAYOUT)
+        if self.storage_layout not in (PER_TENANT_LAYOUT, SHARED_LAYOUT):
+            raise ValueError(f"Unknown TENANT_STORAGE_LAYOUT: {self.storage_layout}")
+        
+        # Table prefixes whose tables are known to be at the current schema version
+        self._verified_schemas = set()
+        self._schema_versions_ready = False
+        self._schema_lock = threading.Lock()
+        
+        # Catalog metadata and list queries per table, refreshed only when DDL runs
+        self._table_metadata: Dict[str, TableMetadata] = {}
+        self._select_statements: Dict[str, Optional[str]] = {}
+    
+    def get_table_prefix(self, tenant_name: str) -> str:
+        """Sanitize a tenant name for use as a table name prefix."""
+        return ''.join(c if c.isalnum() else '_' for c in tenant_name.lower())
     
     def get_table_name(self, tenant_name: str, table_type: str) -> str:
-        """Generate table name for a tenant and table type."""
-        # Sanitize tenant name for use in table names
-        safe_name = ''.join(c if c.isalnum() else '_' for c in tenant_name.lower())
+        """Generate table name for a tenant and table type in the configured storage layout."""
+        if self.storage_layout == SHARED_LAYOUT:
+            return self.get_shared_table_name(table_type)
+        return self.get_per_tenant_table_name(tenant_name, table_type)
+    
+    def get_shared_table_name(self, table_type: str) -> str:
+        """Get the name of the multi-tenant table for a table type."""
+        if table_type == "news":
+            table_type = "m365_news"
+        return SHARED_TABLE_NAMES.get(table_type, f"m365_{table_type}")
+    
+    def get_per_tenant_table_name(self, tenant_name: str, table_type: str) -> str:
+        """Generate the per-tenant table name for a tenant and table type."""
+        safe_name = self.get_table_prefix(tenant_name)
         
         if table_type == "updates":
             return f"{safe_name}_m365_updates"
@@ -63,18 +556,241 @@ class TenantTableManager:
         else:
             return f"{safe_name}_m365_{table_type}"
     
-    def create_tenant_tables(self, tenant_name: str, tenant_id: str, service_type: str = "m365"):
-        """Create necessary tables for a Microsoft 365 tenant."""
-        conn = self.azure_config.get_connection()
-        cursor = conn.cursor()
+    def _create_tables(self, cursor, tenant_name: str, tenant_id: Optional[str] = None):
+        """Create the four tenant tables if they don't exist yet."""
+        # Create updates table with proper column sizes
+        updates_table = self.get_per_tenant_table_name(tenant_name, "updates")
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{updates_table}' AND xtype='U')
+            CREATE TABLE {updates_table} (
+                id NVARCHAR(255) PRIMARY KEY,
+                title NVARCHAR(MAX),
+                category NVARCHAR(255),
+                severity NVARCHAR(50),
+                startDateTime NVARCHAR(100) DEFAULT '',
+                lastModifiedDateTime NVARCHAR(100) DEFAULT '',
+                isMajorChange NVARCHAR(20),
+                actionRequiredByDateTime NVARCHAR(100) DEFAULT '',
+                services NVARCHAR(MAX) DEFAULT '',
+                hasAttachments BIT,
+                roadmapId NVARCHAR(255) DEFAULT '',
+                platform NVARCHAR(255) DEFAULT '',
+                status NVARCHAR(255) DEFAULT '',
+                lastUpdateTime NVARCHAR(100) DEFAULT '',
+                bodyContent NVARCHAR(MAX) DEFAULT '',
+                tags NVARCHAR(MAX) DEFAULT ''
+            )
+        """)
         
-        try:
-            # Create updates table with proper column sizes
-            updates_table = self.get_table_name(tenant_name, "updates")
+        # Create m365_news table
+        news_table = self.get_per_tenant_table_name(tenant_name, "m365_news")
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{news_table}' AND xtype='U')
+            CREATE TABLE {news_table} (
+                id NVARCHAR(255) PRIMARY KEY,
+                title NVARCHAR(MAX),
+                published_date NVARCHAR(100),
+                link NVARCHAR(MAX),
+                summary NVARCHAR(MAX),
+                categories NVARCHAR(MAX),
+                fetch_date NVARCHAR(100)
+            )
+        """)
+        
+        # Create windows_known_issues table
+        issues_table = self.get_per_tenant_table_name(tenant_name, "windows_known_issues")
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{issues_table}' AND xtype='U')
+            CREATE TABLE {issues_table} (
+                id NVARCHAR(255) PRIMARY KEY,
+                product_id NVARCHAR(255),
+                title NVARCHAR(MAX),
+                description NVARCHAR(MAX),
+                status NVARCHAR(255),
+                start_date NVARCHAR(100),
+                resolved_date NVARCHAR(100),
+                web_view_url NVARCHAR(MAX)
+            )
+        """)
+        
+        # Create windows_products table
+        products_table = self.get_per_tenant_table_name(tenant_name, "windows_products")
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{products_table}' AND xtype='U')
+            CREATE TABLE {products_table} (
+                id NVARCHAR(255) PRIMARY KEY,
+                name NVARCHAR(MAX),
+                group_name NVARCHAR(MAX),
+                friendly_names NVARCHAR(MAX)
+            )
+        """)
+    
+    def _widen_is_major_change(self, cursor, tenant_name: str, tenant_id: Optional[str] = None):
+        """Fix the isMajorChange column size on updates tables created by older versions."""
+        table_name = self.get_per_tenant_table_name(tenant_name, "updates")
+        cursor.execute(f"ALTER TABLE {table_name} ALTER COLUMN isMajorChange NVARCHAR(20)")
+    
+    # Date columns that get a typed DATETIME2 (UTC) companion, keyed by table type
+    TYPED_DATE_COLUMNS = {
+        "updates": ("startDateTime", "lastModifiedDateTime", "actionRequiredByDateTime"),
+        "m365_news": ("published_date", "fetch_date"),
+        "windows_known_issues": ("start_date", "resolved_date"),
+    }
+    
+    # Secondary indexes: table type -> (index suffix, key columns, included columns)
+    TENANT_INDEXES = {
+        "updates": (
+            ("lastmod", "lastModifiedDateTime_utc DESC", "category, severity, isMajorChange"),
+            ("category_status", "category, status", None),
+        ),
+        "m365_news": (
+            ("published", "published_date_utc DESC", None),
+        ),
+        "windows_known_issues": (
+            ("start", "start_date_utc DESC", "product_id, status"),
+            ("status", "status", "product_id"),
+        ),
+    }
+    
+    def _add_typed_date_columns(self, cursor, tenant_name: str, tenant_id: Optional[str] = None):
+        """Add DATETIME2 companions to the string date columns, backfill them and index them.
+        
+        The original NVARCHAR columns are kept as-is for fidelity; the typed
+        "<column>_utc" columns are used for filtering and sorting.
+        """
+        for table_type, date_columns in self.TYPED_DATE_COLUMNS.items():
+            table_name = self.get_per_tenant_table_name(tenant_name, table_type)
+            for column in date_columns:
+                cursor.execute(f"""
+                    IF COL_LENGTH('{table_name}', '{column}_utc') IS NULL
+                    ALTER TABLE {table_name} ADD {column}_utc DATETIME2 NULL
+                """)
+            backfill_typed_dates(cursor, table_name, ["id"], date_columns)
+        
+        for table_type, indexes in self.TENANT_INDEXES.items():
+            table_name = self.get_per_tenant_table_name(tenant_name, table_type)
+            for suffix, key_columns, included_columns in indexes:
+                index_name = f"IX_{table_name}_{suffix}"
+                include_clause = f" INCLUDE ({included_columns})" if included_columns else ""
+                cursor.execute(f"""
+                    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{index_name}' AND object_id = OBJECT_ID('{table_name}'))
+                    CREATE INDEX {index_name} ON {table_name} ({key_columns}){include_clause}
+                """)
+    
+    def _add_tenant_id_column(self, cursor, tenant_name: str, tenant_id: Optional[str] = None):
+        """Add a tenant_id column to the per-tenant tables.
+        
+        This lets the same queries run against either storage layout and
+        prepares the tables for migration to the shared layout. Existing rows
+        are backfilled through the column default.
+        """
+        if not tenant_id:
+            raise ValueError(f"A tenant id is required to migrate tables for tenant {tenant_name}")
+        
+        safe_tenant_id = tenant_id.replace("'", "''")
+        for table_type in SHARED_TABLE_NAMES:
+            table_name = self.get_per_tenant_table_name(tenant_name, table_type)
+            cursor.execute(f"""
+                IF COL_LENGTH('{table_name}', 'tenant_id') IS NULL
+                ALTER TABLE {table_name} ADD tenant_id NVARCHAR(255) NULL
+                    CONSTRAINT DF_{table_name}_tenant_id DEFAULT '{safe_tenant_id}' WITH VALUES
+            """)
+    
+    def _add_content_hash_columns(self, cursor, tenant_name: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Add a content_hash column to the tables fetchers upsert into.
+        
+        Fetchers store a SHA-256 of each row's values and compare it to skip
+        rows that did not change. Existing rows start with a NULL hash and are
+        rewritten once by the next fetch.
+        """
+        for table_type in CONTENT_HASH_TABLE_TYPES:
+            if self.storage_layout == SHARED_LAYOUT:
+                table_name = self.get_shared_table_name(table_type)
+            else:
+                table_name = self.get_per_tenant_table_name(tenant_name, table_type)
+            cursor.execute(f"""
+                IF COL_LENGTH('{table_name}', 'content_hash') IS NULL
+                ALTER TABLE {table_name} ADD content_hash BINARY(32) NULL
+            """)
+    
+    def _move_catalog_rows_to_global(self, cursor, tenant_name: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Move fetched news and known issues from tenant tables into the global catalog.
+        
+        The tenant tables remain as an overlay for tenant-specific rows, such
+        as the notification test data and placeholder sample news, which are
+        left in place.
+        """
+        create_global_catalog_tables(cursor)
+        for table_type, columns in CATALOG_COLUMNS.items():
+            if self.storage_layout == SHARED_LAYOUT:
+                source_table = self.get_shared_table_name(table_type)
+            else:
+                source_table = self.get_per_tenant_table_name(tenant_name, table_type)
+            target_table = GLOBAL_TABLE_NAMES[table_type]
+            column_list = ", ".join(columns)
+            # Several tenants may hold the same item; keep one copy of each
+            cursor.execute(f"""
+                INSERT INTO {target_table} ({column_list})
+                SELECT {column_list} FROM (
+                    SELECT {', '.join(f's.{column}' for column in columns)},
+                           ROW_NUMBER() OVER (PARTITION BY s.id ORDER BY s.id) AS copy_number
+                    FROM {source_table} s
+                    WHERE s.id NOT LIKE 'test-%' AND s.id NOT LIKE 'sample-%'
+                    AND NOT EXISTS (SELECT 1 FROM {target_table} g WHERE g.id = s.id)
+                ) AS source
+                WHERE copy_number = 1
+            """)
             cursor.execute(f"""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{updates_table}' AND xtype='U')
+                DELETE s FROM {source_table} s
+                WHERE s.id NOT LIKE 'test-%' AND s.id NOT LIKE 'sample-%'
+                AND EXISTS (SELECT 1 FROM {target_table} g WHERE g.id = s.id)
+            """)
+    
+    def _reparse_catalog_dates(self, cursor):
+        """Recompute the typed dates of the global catalog tables."""
+        create_global_catalog_tables(cursor)
+        for table_type in CATALOG_COLUMNS:
+            backfill_typed_dates(cursor, GLOBAL_TABLE_NAMES[table_type], ["id"], self.TYPED_DATE_COLUMNS[table_type])
+    
+    def _reparse_typed_dates(self, cursor, tenant_name: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Recompute the typed date columns in Python.
+        
+        Schema version 3 filled them with TRY_CONVERT, which left RSS dates
+        NULL and read the local fetch_date strings as UTC. The global catalog
+        copies made from those rows are recomputed too.
+        """
+        for table_type, date_columns in self.TYPED_DATE_COLUMNS.items():
+            if self.storage_layout == SHARED_LAYOUT:
+                backfill_typed_dates(cursor, self.get_shared_table_name(table_type), ["tenant_id", "id"], date_columns)
+            else:
+                backfill_typed_dates(cursor, self.get_per_tenant_table_name(tenant_name, table_type), ["id"], date_columns)
+        self._reparse_catalog_dates(cursor)
+    
+    def _schema_migrations(self):
+        """Ordered (version, migration) pairs applied to each tenant's tables."""
+        return [
+            (1, self._create_tables),
+            (2, self._widen_is_major_change),
+            (3, self._add_typed_date_columns),
+            (4, self._add_tenant_id_column),
+            (5, self._add_content_hash_columns),
+            (6, self._move_catalog_rows_to_global),
+            (7, self._reparse_typed_dates),
+        ]
+    
+    def _create_shared_tables(self, cursor, tenant_name: Optional[str] = None, tenant_id: Optional[str] = None):
+        """Create the multi-tenant tables used by the shared storage layout.
+        
+        Rows are keyed by (tenant_id, id) and clustered on (tenant_id, date) so
+        reads for one tenant or a set of tenants are range scans.
+        """
+        updates_table = SHARED_TABLE_NAMES["updates"]
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{updates_table}' AND xtype='U')
+            BEGIN
                 CREATE TABLE {updates_table} (
-                    id NVARCHAR(255) PRIMARY KEY,
+                    tenant_id NVARCHAR(255) NOT NULL,
+                    id NVARCHAR(255) NOT NULL,
                     title NVARCHAR(MAX),
                     category NVARCHAR(255),
                     severity NVARCHAR(50),
@@ -89,82 +805,402 @@ class TenantTableManager:
                     status NVARCHAR(255) DEFAULT '',
                     lastUpdateTime NVARCHAR(100) DEFAULT '',
                     bodyContent NVARCHAR(MAX) DEFAULT '',
-                    tags NVARCHAR(MAX) DEFAULT ''
-                )
-            """)
-            
-            # Create m365_news table
-            news_table = self.get_table_name(tenant_name, "m365_news")
-            cursor.execute(f"""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{news_table}' AND xtype='U')
+                    tags NVARCHAR(MAX) DEFAULT '',
+                    startDateTime_utc DATETIME2 NULL,
+                    lastModifiedDateTime_utc DATETIME2 NULL,
+                    actionRequiredByDateTime_utc DATETIME2 NULL,
+                    CONSTRAINT PK_{updates_table} PRIMARY KEY NONCLUSTERED (tenant_id, id)
+                );
+                CREATE CLUSTERED INDEX CX_{updates_table} ON {updates_table} (tenant_id, lastModifiedDateTime_utc);
+                CREATE INDEX IX_{updates_table}_category_status ON {updates_table} (tenant_id, category, status);
+            END
+        """)
+        
+        news_table = SHARED_TABLE_NAMES["m365_news"]
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{news_table}' AND xtype='U')
+            BEGIN
                 CREATE TABLE {news_table} (
-                    id NVARCHAR(255) PRIMARY KEY,
+                    tenant_id NVARCHAR(255) NOT NULL,
+                    id NVARCHAR(255) NOT NULL,
                     title NVARCHAR(MAX),
                     published_date NVARCHAR(100),
                     link NVARCHAR(MAX),
                     summary NVARCHAR(MAX),
                     categories NVARCHAR(MAX),
-                    fetch_date NVARCHAR(100)
-                )
-            """)
-            
-            # Create windows_known_issues table
-            issues_table = self.get_table_name(tenant_name, "windows_known_issues")
-            cursor.execute(f"""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{issues_table}' AND xtype='U')
+                    fetch_date NVARCHAR(100),
+                    published_date_utc DATETIME2 NULL,
+                    fetch_date_utc DATETIME2 NULL,
+                    CONSTRAINT PK_{news_table} PRIMARY KEY NONCLUSTERED (tenant_id, id)
+                );
+                CREATE CLUSTERED INDEX CX_{news_table} ON {news_table} (tenant_id, published_date_utc);
+            END
+        """)
+        
+        issues_table = SHARED_TABLE_NAMES["windows_known_issues"]
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{issues_table}' AND xtype='U')
+            BEGIN
                 CREATE TABLE {issues_table} (
-                    id NVARCHAR(255) PRIMARY KEY,
+                    tenant_id NVARCHAR(255) NOT NULL,
+                    id NVARCHAR(255) NOT NULL,
                     product_id NVARCHAR(255),
                     title NVARCHAR(MAX),
                     description NVARCHAR(MAX),
                     status NVARCHAR(255),
                     start_date NVARCHAR(100),
                     resolved_date NVARCHAR(100),
-                    web_view_url NVARCHAR(MAX)
-                )
-            """)
-            
-            # Create windows_products table
-            products_table = self.get_table_name(tenant_name, "windows_products")
-            cursor.execute(f"""
-                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{products_table}' AND xtype='U')
-                CREATE TABLE {products_table} (
-                    id NVARCHAR(255) PRIMARY KEY,
-                    name NVARCHAR(MAX),
-                    group_name NVARCHAR(MAX),
-                    friendly_names NVARCHAR(MAX)
-                )
-            """)
+                    web_view_url NVARCHAR(MAX),
+                    start_date_utc DATETIME2 NULL,
+                    resolved_date_utc DATETIME2 NULL,
+                    CONSTRAINT PK_{issues_table} PRIMARY KEY NONCLUSTERED (tenant_id, id)
+                );
+                CREATE CLUSTERED INDEX CX_{issues_table} ON {issues_table} (tenant_id, start_date_utc);
+                CREATE INDEX IX_{issues_table}_status ON {issues_table} (tenant_id, status) INCLUDE (product_id);
+            END
+        """)
+        
+        products_table = SHARED_TABLE_NAMES["windows_products"]
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{products_table}' AND xtype='U')
+            CREATE TABLE {products_table} (
+                tenant_id NVARCHAR(255) NOT NULL,
+                id NVARCHAR(255) NOT NULL,
+                name NVARCHAR(MAX),
+                group_name NVARCHAR(MAX),
+                friendly_names NVARCHAR(MAX),
+                CONSTRAINT PK_{products_table} PRIMARY KEY CLUSTERED (tenant_id, id)
+            )
+        """)
+    
+    def _shared_schema_migrations(self):
+        """Ordered (version, migration) pairs applied to the shared tables."""
+        return [
+            (1, self._create_shared_tables),
+            (2, self._add_content_hash_columns),
+            (3, self._move_catalog_rows_to_global),
+            (4, self._reparse_typed_dates),
+        ]
+    
+    @property
+    def schema_version(self) -> int:
+        """The schema version tenant tables are migrated to."""
+        if self.storage_layout == SHARED_LAYOUT:
+            return self._shared_schema_migrations()[-1][0]
+        return self._schema_migrations()[-1][0]
+    
+    def _ensure_schema_versions_table(self, cursor):
+        """Create the schema_versions table once per process."""
+        if self._schema_versions_ready:
+            return
+        cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='schema_versions' AND xtype='U')
+            CREATE TABLE schema_versions (
+                table_prefix NVARCHAR(255) PRIMARY KEY,
+                version INT NOT NULL,
+                updated_at NVARCHAR(100) NOT NULL
+            )
+        """)
+        cursor.commit()
+        self._schema_versions_ready = True
+    
+    def ensure_tenant_schema(self, tenant_name: str, tenant_id: Optional[str] = None) -> bool:
+        """Create or migrate a tenant's tables, at most once per process.
+        
+        The applied version is recorded in the schema_versions table, so a new
+        process only needs a single lookup to confirm the tables are current.
+        Once verified, the tenant is remembered and no further queries are run.
+        In the shared layout all tenants use the same tables, which are
+        versioned once under a single key.
+        """
+        if self.storage_layout == SHARED_LAYOUT:
+            prefix = SHARED_SCHEMA_KEY
+            migrations = self._shared_schema_migrations()
+        else:
+            prefix = self.get_table_prefix(tenant_name)
+            migrations = self._schema_migrations()
+        
+        if prefix in self._verified_schemas:
+            return True
+        
+        with self._schema_lock:
+            if prefix in self._verified_schemas:
+                return True
             
-            conn.commit()
-            print(f"Successfully created tables for tenant: {tenant_name}")
+            conn = self.azure_config.get_connection()
+            cursor = conn.cursor()
             
-        except Exception as e:
-            print(f"Error creating tables for tenant {tenant_name}: {e}")
-            conn.rollback()
-            raise
+            try:
+                self._ensure_schema_versions_table(cursor)
+                cursor.execute("SELECT version FROM schema_versions WHERE table_prefix = ?", (prefix,))
+                row = cursor.fetchone()
+                current_version = row[0] if row else 0
+                
+                pending = [(version, migrate) for version, migrate in migrations if version > current_version]
+                if pending:
+                    for version, migrate in pending:
+                        migrate(cursor, tenant_name, tenant_id)
+                    
+                    new_version = pending[-1][0]
+                    cursor.execute("""
+                        MERGE schema_versions AS target
+                        USING (VALUES (?, ?, ?)) AS source (table_prefix, version, updated_at)
+                        ON target.table_prefix = source.table_prefix
+                        WHEN MATCHED THEN
+                            UPDATE SET version = source.version, updated_at = source.updated_at
+                        WHEN NOT MATCHED THEN
+                            INSERT (table_prefix, version, updated_at)
+                            VALUES (source.table_prefix, source.version, source.updated_at);
+                    """, (prefix, new_version, datetime.now().isoformat()))
+                    print(f"Migrated tables for tenant {tenant_name} from schema version {current_version} to {new_version}")
+                
+                conn.commit()
+                if pending:
+                    self.invalidate_metadata(tenant_name)
+                self._verified_schemas.add(prefix)
+                return True
+                
+            except Exception as e:
+                print(f"Error migrating tables for tenant {tenant_name}: {e}")
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+                conn.close()
+    
+    def _tenant_table_names(self, tenant_name: str) -> List[str]:
+        return [
+            self.get_table_name(tenant_name, table_type)
+            for table_type in ("updates", "m365_news", "windows_known_issues", "windows_products")
+        ]
+    
+    def _load_metadata(self, tenant_name: str):
+        """Load existence and columns for all of a tenant's tables in one catalog query."""
+        table_names = self._tenant_table_names(tenant_name)
+        columns = {table_name: set() for table_name in table_names}
+        
+        conn = self.azure_config.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_NAME IN ({', '.join('?' for _ in table_names)})
+            """, table_names)
+            for table_name, column_name in cursor.fetchall():
+                # Catalog lookups are case-insensitive, match our own spelling
+                for known_name in columns:
+                    if known_name.lower() == table_name.lower():
+                        columns[known_name].add(column_name)
         finally:
             cursor.close()
             conn.close()
+        
+        for table_name, table_columns in columns.items():
+            self._table_metadata[table_name] = TableMetadata(bool(table_columns), frozenset(table_columns))
+    
+    def get_table_metadata(self, tenant_name: str, table_type: str) -> TableMetadata:
+        """Get cached existence and column information for a tenant table."""
+        table_name = self.get_table_name(tenant_name, table_type)
+        metadata = self._table_metadata.get(table_name)
+        if metadata is None:
+            self._load_metadata(tenant_name)
+            metadata = self._table_metadata[table_name]
+        return metadata
+    
+    def table_exists(self, tenant_name: str, table_type: str) -> bool:
+        """Check whether a tenant table exists, using the metadata cache."""
+        return self.get_table_metadata(tenant_name, table_type).exists
+    
+    def invalidate_metadata(self, tenant_name: str):
+        """Forget cached metadata and queries for a tenant after DDL."""
+        for table_name in self._tenant_table_names(tenant_name):
+            self._table_metadata.pop(table_name, None)
+            self._select_statements.pop(table_name, None)
+    
+    def get_select_statement(self, tenant_name: str, table_type: str) -> Optional[str]:
+        """Get the list query for a tenant table, or None if the table doesn't exist.
+        
+        Queries are built from the cached column metadata once and reused. They
+        take the tenant id as their only parameter so the same statement works
+        for per-tenant and shared tables.
+        """
+        table_name = self.get_table_name(tenant_name, table_type)
+        if table_name not in self._select_statements:
+            self._select_statements[table_name] = self._build_select_statement(tenant_name, table_type)
+        return self._select_statements[table_name]
     
-    def drop_tenant_tables(self, tenant_name: str, service_type: str = "m365"):
-        """Drop all tables for a tenant."""
+    def _build_select_statement(self, tenant_name: str, table_type: str) -> Optional[str]:
+        metadata = self.get_table_metadata(tenant_name, table_type)
+        if not metadata.exists:
+            return None
+        
+        table_name = self.get_table_name(tenant_name, table_type)
+        
+        if table_type == "updates":
+            # Sort on the typed column when the table has been migrated
+            order_column = "lastModifiedDateTime_utc" if "lastModifiedDateTime_utc" in metadata.columns else "lastModifiedDateTime"
+            return f"""
+                SELECT 
+                    id,
+                    title,
+                    category,
+                    severity,
+                    lastModifiedDateTime as publishedDate,
+                    isMajorChange as actionType,
+                    bodyContent as description
+                FROM {table_name}
+                WHERE tenant_id = ?
+                ORDER BY {order_column} DESC
+            """
+        
+        if table_type in ("m365_news", "news"):
+            # Tenant overlay rows, then catalog rows the tenant doesn't override
+            news_columns = "id, title, published_date, link, summary, categories, fetch_date, published_date_utc"
+            return f"""
+                WITH overlay AS (
+                    SELECT {news_columns} FROM {table_name} WHERE tenant_id = ?
+                )
+                SELECT 
+                    id,
+                    title,
+                    published_date,
+                    link,
+                    summary,
+                    categories,
+                    fetch_date
+                FROM (
+                    SELECT {news_columns} FROM overlay
+                    UNION ALL
+                    SELECT {news_columns} FROM {GLOBAL_TABLE_NAMES["m365_news"]} g
+                    WHERE NOT EXISTS (SELECT 1 FROM overlay o WHERE o.id = g.id)
+                ) AS news
+                ORDER BY published_date_utc DESC
+            """
+        
+        if table_type == "windows_known_issues":
+            return self._build_windows_issues_select(tenant_name, table_name, metadata.columns)
+        
+        return f"SELECT * FROM {table_name} WHERE tenant_id = ?"
+    
+    def _build_windows_issues_select(self, tenant_name: str, issues_table: str, column_names: FrozenSet[str]) -> str:
+        """Build the Windows known issues query based on the columns that exist.
+        
+        Combines the tenant's overlay rows with the catalog issues of the
+        products the tenant has; the tenant id is bound once through the t CTE.
+        """
+        select_fields = ["wi.id"]
+        
+        # Add optional fields if they exist
+        if 'product_id' in column_names:
+            select_fields.append("wi.product_id as productId")
+        else:
+            select_fields.append("NULL as productId")
+            
+        if 'title' in column_names:
+            select_fields.append("wi.title")
+        else:
+            select_fields.append("'No title available' as title")
+            
+        if 'description' in column_names:
+            select_fields.append("wi.description")
+        else:
+            select_fields.append("'No description available' as description")
+            
+        if 'webViewUrl' in column_names:
+            select_fields.append("wi.webViewUrl")
+        elif 'web_view_url' in column_names:
+            select_fields.append("wi.web_view_url as webViewUrl")
+        else:
+            select_fields.append("NULL as webViewUrl")
+            
+        if 'status' in column_names:
+            select_fields.append("wi.status")
+        else:
+            select_fields.append("'unknown' as status")
+            
+        if 'start_date' in column_names:
+            select_fields.append("wi.start_date as startDate")
+        elif 'startDateTime' in column_names:
+            select_fields.append("wi.startDateTime as startDate")
+        elif 'first_occurred_date' in column_names:
+            select_fields.append("wi.first_occurred_date as startDate")
+        else:
+            select_fields.append("NULL as startDate")
+            
+        if 'resolved_date' in column_names:
+            select_fields.append("wi.resolved_date as resolvedDate")
+        elif 'resolvedDateTime' in column_names:
+            select_fields.append("wi.resolvedDateTime as resolvedDate")
+        else:
+            select_fields.append("NULL as resolvedDate")
+        
+        catalog_issues = GLOBAL_TABLE_NAMES["windows_known_issues"]
+        catalog_products = GLOBAL_TABLE_NAMES["windows_products"]
+        
+        # Without a products table the tenant has no catalog issues, only its overlay
+        if self.table_exists(tenant_name, "windows_products"):
+            products_table = self.get_table_name(tenant_name, "windows_products")
+            tenant_products = f"SELECT wp.id, wp.name FROM {products_table} wp JOIN t ON wp.tenant_id = t.tenant_id"
+        else:
+            tenant_products = "SELECT CAST(NULL AS NVARCHAR(255)) AS id, CAST(NULL AS NVARCHAR(MAX)) AS name WHERE 1 = 0"
+        
+        return f"""
+            WITH t AS (SELECT CAST(? AS NVARCHAR(255)) AS tenant_id),
+            tenant_products AS ({tenant_products}),
+            overlay AS (
+                SELECT {', '.join(select_fields)}
+                FROM {issues_table} wi JOIN t ON wi.tenant_id = t.tenant_id
+            ),
+            issues AS (
+                SELECT id, productId, title, description, webViewUrl, status, startDate, resolvedDate FROM overlay
+                UNION ALL
+                SELECT g.id, g.product_id, g.title, g.description, g.web_view_url, g.status, g.start_date, g.resolved_date
+                FROM {catalog_issues} g
+                JOIN tenant_products p ON p.id = g.product_id
+                WHERE NOT EXISTS (SELECT 1 FROM overlay o WHERE o.id = g.id)
+            )
+            SELECT 
+                i.id, i.productId, i.title, i.description, i.webViewUrl, LOWER(i.status) as status,
+                i.startDate, i.resolvedDate,
+                COALESCE(p.name, gp.name, 'Unknown Product') as productName
+            FROM issues i
+            LEFT JOIN tenant_products p ON p.id = i.productId
+            LEFT JOIN {catalog_products} gp ON gp.id = i.productId
+            ORDER BY i.id DESC
+        """
+    
+    def drop_tenant_tables(self, tenant_name: str, service_type: str = "m365", tenant_id: Optional[str] = None):
+        """Drop all tables for a tenant.
+        
+        In the shared layout the tenant's rows are deleted instead.
+        """
+        if self.storage_layout == SHARED_LAYOUT:
+            return self.delete_tenant_rows(tenant_name, tenant_id)
+        
         conn = self.azure_config.get_connection()
         cursor = conn.cursor()
         
         try:
+            self._ensure_schema_versions_table(cursor)
+            
             # Drop all four main tables
             tables = [
-                self.get_table_name(tenant_name, "windows_products"),
-                self.get_table_name(tenant_name, "windows_known_issues"),
-                self.get_table_name(tenant_name, "m365_news"),
-                self.get_table_name(tenant_name, "updates")
+                self.get_per_tenant_table_name(tenant_name, "windows_products"),
+                self.get_per_tenant_table_name(tenant_name, "windows_known_issues"),
+                self.get_per_tenant_table_name(tenant_name, "m365_news"),
+                self.get_per_tenant_table_name(tenant_name, "updates")
             ]
             
             for table in tables:
                 cursor.execute(f"IF EXISTS (SELECT * FROM sysobjects WHERE name='{table}' AND xtype='U') DROP TABLE {table}")
             
+            # Forget the recorded schema version so the tables are rebuilt if needed
+            prefix = self.get_table_prefix(tenant_name)
+            cursor.execute("DELETE FROM schema_versions WHERE table_prefix = ?", (prefix,))
+            
             conn.commit()
+            self._verified_schemas.discard(prefix)
+            self.invalidate_metadata(tenant_name)
             print(f"Successfully dropped tables for tenant: {tenant_name}")
             
         except Exception as e:
@@ -175,40 +1211,84 @@ class TenantTableManager:
             cursor.close()
             conn.close()
     
-    def get_tenant_table_name(self, tenant_name: str, table_name: str, service_type: str = "m365") -> str:
-        """Get the full table name for a tenant and table."""
-        return self.get_table_name(tenant_name, table_name)
-    
-    def update_existing_table_column(self, tenant_name: str, table_type: str = "updates"):
-        """Update existing table column to fix the isMajorChange column size issue."""
+    def delete_tenant_rows(self, tenant_name: str, tenant_id: Optional[str]):
+        """Delete a tenant's rows from the shared tables."""
+        if not tenant_id:
+            raise ValueError(f"A tenant id is required to delete shared rows for tenant {tenant_name}")
+        
         conn = self.azure_config.get_connection()
         cursor = conn.cursor()
         
         try:
-            table_name = self.get_table_name(tenant_name, table_type)
+            for table_type in ("windows_known_issues", "windows_products", "m365_news", "updates"):
+                table = self.get_shared_table_name(table_type)
+                cursor.execute(f"""
+                    IF EXISTS (SELECT * FROM sysobjects WHERE name='{table}' AND xtype='U')
+                    DELETE FROM {table} WHERE tenant_id = ?
+                """, (tenant_id,))
             
-            # Check if table exists
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME = '{table_name}'
-            """)
-            table_exists = cursor.fetchone()[0] > 0
+            conn.commit()
+            print(f"Successfully deleted shared table rows for tenant: {tenant_name}")
             
-            if table_exists:
-                # Alter the column to increase its size
-                cursor.execute(f"""
-                    ALTER TABLE {table_name} 
-                    ALTER COLUMN isMajorChange NVARCHAR(20)
-                """)
-                conn.commit()
-                print(f"Successfully updated isMajorChange column for table: {table_name}")
-            else:
-                print(f"Table {table_name} does not exist, skipping column update")
-                
         except Exception as e:
-            print(f"Error updating column for table {table_name}: {e}")
+            print(f"Error deleting shared table rows for tenant {tenant_name}: {e}")
             conn.rollback()
             raise
         finally:
             cursor.close()
             conn.close()
+    
+    def multi_tenant_source(self, tenants: List[Dict[str, Any]], table_type: str, columns: List[str]) -> str:
+        """Build a FROM source covering several tenants' rows of one table type.
+        
+        Returns a derived table exposing tenant_id plus the given columns. In
+        the shared layout this is a single tenant_id IN (...) range read; with
+        per-tenant tables it is a UNION ALL over each tenant's table. Tenant ids
+        are bound as parameters in the order of the tenants list.
+        """
+        column_list = ", ".join(["tenant_id"] + list(columns))
+        if self.storage_layout == SHARED_LAYOUT:
+            placeholders = ", ".join("?" for _ in tenants)
+            return f"""(
+                SELECT {column_list} FROM {self.get_shared_table_name(table_type)}
+                WHERE tenant_id IN ({placeholders})
+            )"""
+        
+        selects = [
+            f"SELECT {column_list} FROM {self.get_per_tenant_table_name(tenant['name'], table_type)} WHERE tenant_id = ?"
+            for tenant in tenants
+        ]
+        return "(\n" + "\nUNION ALL\n".join(selects) + "\n)"
+    
+    def catalog_source(self, tenants: List[Dict[str, Any]], table_type: str, columns: List[str]) -> Tuple[str, List[str]]:
+        """Build a FROM source of overlay and global catalog rows for several tenants.
+        
+        Like multi_tenant_source, but each tenant also sees the catalog rows it
+        doesn't override; known issues are limited to the tenant's products.
+        Returns the source together with the parameters it binds.
+        """
+        tenant_ids = [tenant['id'] for tenant in tenants]
+        overlay = self.multi_tenant_source(tenants, table_type, columns)
+        tenant_list = f"(VALUES {', '.join('(?)' for _ in tenants)}) AS t(tenant_id)"
+        
+        product_join = ""
+        product_params: List[str] = []
+        if table_type == "windows_known_issues":
+            products = self.multi_tenant_source(tenants, "windows_products", ["id"])
+            product_join = f"JOIN {products} p ON p.tenant_id = t.tenant_id AND p.id = g.product_id"
+            product_params = tenant_ids
+        
+        source = f"""(
+            SELECT {', '.join(['tenant_id'] + list(columns))} FROM {overlay} o
+            UNION ALL
+            SELECT t.tenant_id, {', '.join(f'g.{column}' for column in columns)}
+            FROM {GLOBAL_TABLE_NAMES[table_type]} g
+            CROSS JOIN {tenant_list}
+            {product_join}
+            WHERE NOT EXISTS (SELECT 1 FROM {overlay} o2 WHERE o2.tenant_id = t.tenant_id AND o2.id = g.id)
+        )"""
+        return source, tenant_ids + tenant_ids + product_params + tenant_ids
+    
+    def get_tenant_table_name(self, tenant_name: str, table_name: str, service_type: str = "m365") -> str:
+        """Get the full table name for a tenant and table."""
+        return self.get_table_name(tenant_name, table_name)
@@ -0,0 +1,181 @@
+import json
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+def content_hash(row: Dict, columns: Sequence[str]) -> bytes:
+    """SHA-256 of a row's values, stable across runs for the same content."""
+    payload = json.dumps([row.get(column) for column in columns], default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+def collapse_rows(rows: Sequence[Dict], key_columns: Sequence[str]) -> List[Dict]:
+    """Keep the last row for each key, preserving first-seen order.
+
+    MERGE rejects a source with duplicate keys, and for repeated keys the last
+    row is the one a sequence of single-row upserts would have left behind.
+    """
+    collapsed = {}
+    for row in rows:
+        collapsed[tuple(row[column] for column in key_columns)] = row
+    return list(collapsed.values())
+
+def _existing_hashes(cursor, target_table: str, key_columns: Sequence[str], hash_column: str,
+                     scope: Tuple[str, object], rows: Sequence[Dict]) -> Dict[Tuple, bytes]:
+    """Read the stored hashes of the given rows in one scope, keyed like collapse_rows.
+
+    Only the rows' own keys are looked up, in chunks that stay under the SQL
+    Server parameter limit, so the cost follows the batch and not the table.
+    """
+    scope_column, scope_value = scope
+    lookup_columns = [column for column in key_columns if column != scope_column]
+    select_sql = f"SELECT {', '.join(key_columns)}, {hash_column} FROM {target_table} WHERE {scope_column} = ?"
+    if not lookup_columns:
+        cursor.execute(select_sql, (scope_value,))
+        return {tuple(row[:-1]): row[-1] for row in cursor.fetchall()}
+
+    keys = list(dict.fromkeys(tuple(row[column] for column in lookup_columns) for row in rows))
+    chunk_size = max(1, 1000 // len(lookup_columns))
+    stored = {}
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        if len(lookup_columns) == 1:
+            condition = f"{lookup_columns[0]} IN ({', '.join('?' for _ in chunk)})"
+        else:
+            match = " AND ".join(f"{column} = ?" for column in lookup_columns)
+            condition = " OR ".join(f"({match})" for _ in chunk)
+        cursor.execute(f"{select_sql} AND ({condition})", [scope_value] + [value for key in chunk for value in key])
+        stored.update({tuple(row[:-1]): row[-1] for row in cursor.fetchall()})
+    return stored
+
+def bulk_merge(conn, target_table: str, key_columns: Sequence[str], columns: Sequence[str],
+               rows: Sequence[Dict], batch_size: int = 1000, hash_column: Optional[str] = None,
+               scope: Optional[Tuple[str, object]] = None) -> Dict[str, int]:
+    """Upsert rows into a table through a temp staging table.
+
+    Rows are collapsed per key and loaded with fast_executemany, then applied
+    with one MERGE per batch. Matched rows are only updated when a value
+    differs. HOLDLOCK keeps the key ranges locked from match to insert, so
+    concurrent merges of the same new keys don't both insert them. The
+    caller owns the transaction: nothing is committed here.
+
+    With hash_column, each row's content hash is stored in that column and
+    matched rows are compared on it instead of on every value. Passing a
+    (column, value) scope as well first reads the stored hashes of the
+    rows' keys within that scope, so unchanged rows are never sent to the
+    server at all.
+
+    Returns counts of inserted, updated and unchanged rows.
+    """
+    rows = collapse_rows(rows, key_columns)
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not rows:
+        return counts
+
+    stage_table = f"#stage_{target_table}"
+    value_columns = [column for column in columns if column not in key_columns]
+    if hash_column:
+        rows = [dict(row, **{hash_column: content_hash(row, value_columns)}) for row in rows]
+        columns = list(columns) + [hash_column]
+    column_list = ", ".join(columns)
+
+    cursor = conn.cursor()
+    try:
+        if hash_column and scope:
+            stored = _existing_hashes(cursor, target_table, key_columns, hash_column, scope, rows)
+            changed = [row for row in rows
+                       if stored.get(tuple(row[column] for column in key_columns)) != row[hash_column]]
+            counts["unchanged"] = len(rows) - len(changed)
+            rows = changed
+            if not rows:
+                return counts
+
+        # Temp tables live as long as the session, which outlives a pool checkout
+        cursor.execute(f"IF OBJECT_ID('tempdb..{stage_table}') IS NOT NULL DROP TABLE {stage_table}")
+        cursor.execute(f"SELECT TOP 0 {column_list} INTO {stage_table} FROM {target_table}")
+        cursor.fast_executemany = True
+
+        insert_sql = f"INSERT INTO {stage_table} ({column_list}) VALUES ({', '.join('?' for _ in columns)})"
+        if hash_column:
+            # Rows written before hashing was introduced have no hash and are rewritten once
+            changed_condition = f"(target.{hash_column} IS NULL OR target.{hash_column} <> source.{hash_column})"
+            update_columns = value_columns + [hash_column]
+        else:
+            # EXCEPT compares NULLs as equal, so unchanged rows are left alone
+            changed_condition = f"""EXISTS (
+                SELECT {', '.join(f'source.{column}' for column in value_columns)}
+                EXCEPT
+                SELECT {', '.join(f'target.{column}' for column in value_columns)}
+            )"""
+            update_columns = value_columns
+        update_clause = f"""
+            WHEN MATCHED AND {changed_condition} THEN
+                UPDATE SET {', '.join(f'{column} = source.{column}' for column in update_columns)}
+        """ if value_columns else ""
+        merge_sql = f"""
+            MERGE {target_table} WITH (HOLDLOCK) AS target
+            USING {stage_table} AS source
+            ON {' AND '.join(f'target.{column} = source.{column}' for column in key_columns)}
+            {update_clause}
+            WHEN NOT MATCHED THEN
+                INSERT ({column_list})
+                VALUES ({', '.join(f'source.{column}' for column in columns)})
+            OUTPUT $action;
+        """
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.executemany(insert_sql, [tuple(row[column] for column in columns) for row in batch])
+
+            cursor.execute(merge_sql)
+            actions = [action for (action,) in cursor.fetchall()]
+            inserted = actions.count("INSERT")
+            updated = actions.count("UPDATE")
+            counts["inserted"] += inserted
+            counts["updated"] += updated
+            counts["unchanged"] += len(batch) - inserted - updated
+
+            cursor.execute(f"TRUNCATE TABLE {stage_table}")
+
+        return counts
+    finally:
+        try:
+            cursor.execute(f"IF OBJECT_ID('tempdb..{stage_table}') IS NOT NULL DROP TABLE {stage_table}")
+        except Exception as e:
+            print(f"Error dropping staging table {stage_table}: {e}")
+        cursor.close()
+
+def delete_missing(conn, target_table: str, scope_column: str, scope_value, key_column: str, keys: Sequence,
+                   keep_prefix: Optional[str] = None) -> int:
+    """Delete rows in one scope (e.g. a tenant) whose key isn't in keys.
+
+    Used by full reconciliations to drop rows that disappeared upstream.
+    Rows whose key starts with keep_prefix were not fetched from upstream
+    and are left alone. The keys are staged in a temp table so any number of
+    them can be passed. The caller owns the transaction. Returns the number
+    of rows deleted.
+    """
+    stage_table = f"#keys_{target_table}"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"IF OBJECT_ID('tempdb..{stage_table}') IS NOT NULL DROP TABLE {stage_table}")
+        cursor.execute(f"SELECT TOP 0 {key_column} INTO {stage_table} FROM {target_table}")
+        if keys:
+            cursor.fast_executemany = True
+            cursor.executemany(f"INSERT INTO {stage_table} ({key_column}) VALUES (?)", [(key,) for key in set(keys)])
+
+        keep_clause, params = "", [scope_value]
+        if keep_prefix:
+            keep_clause = f"AND target.{key_column} NOT LIKE ?"
+            params.append(keep_prefix.replace("[", "[[]").replace("%", "[%]").replace("_", "[_]") + "%")
+        cursor.execute(f"""
+            DELETE target FROM {target_table} AS target
+            WHERE target.{scope_column} = ?
+            {keep_clause}
+            AND NOT EXISTS (SELECT 1 FROM {stage_table} AS source WHERE source.{key_column} = target.{key_column})
+        """, params)
+        return cursor.rowcount
+    finally:
+        try:
+            cursor.execute(f"IF OBJECT_ID('tempdb..{stage_table}') IS NOT NULL DROP TABLE {stage_table}")
+        except Exception as e:
+            print(f"Error dropping staging table {stage_table}: {e}")
+        cursor.close()
@@ -3,10 +3,12 @@ import os
 import json
 from typing import Optional, Dict, Any, List
 from .azure_db_config import AzureSQLConfig, TenantTableManager
+from .tenant_registry import TenantRegistry
 
 # Global instances
 azure_config = None
 table_manager = None
+tenant_registry = None
 
 def get_azure_config():
     """Get Azure SQL configuration instance."""
@@ -22,10 +24,34 @@ def get_table_manager():
         table_manager = TenantTableManager(get_azure_config())
     return table_manager
 
+def get_tenant_registry():
+    """Get the in-process tenant registry instance."""
+    global tenant_registry
+    if tenant_registry is None:
+        tenant_registry = TenantRegistry(get_db_connection)
+    return tenant_registry
+
 def get_db_connection():
-    """Get a connection to the Azure SQL database."""
+    """Get a pooled connection to the Azure SQL database.
+    
+    close() returns the connection to the pool. The connection can also be used
+    as a context manager (``with get_db_connection() as conn:``), which commits
+    on success, rolls back on error and returns it to the pool.
+    """
     return get_azure_config().get_connection()
 
+def get_dedicated_connection():
+    """Open an Azure SQL connection that doesn't count against the pool.
+    
+    close() ends the session. Use it for connections held for the length of a
+    fetch, so they can't starve request handlers of pooled connections.
+    """
+    return get_azure_config().open_dedicated_connection()
+
+def get_pool_stats():
+    """Get connection pool statistics (in use, idle, wait times)."""
+    return get_azure_config().pool.stats()
+
 def init_db():
     """Initialize main database tables (tenants and azure_accounts)."""
     conn = get_db_connection()
@@ -93,34 +119,13 @@ def find_tenant_database(tenant_id, prefer_service_announcements=False):
     Since we're using a single database with table prefixes,
     this function now returns the tenant info for table name generation.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-        tenant = cursor.fetchone()
-        
-        if tenant:
-            # Convert pyodbc.Row to dictionary
-            tenant_dict = {
-                'id': tenant[0],
-                'name': tenant[1],
-                'tenantId': tenant[2],
-                'applicationId': tenant[3],
-                'applicationSecret': tenant[4],
-                'isActive': bool(tenant[5]),
-                'dateAdded': tenant[6]
-            }
-            return tenant_dict
-        
-        return None
+        tenant = get_tenant_registry().get(tenant_id)
+        return tenant.to_dict() if tenant else None
         
     except Exception as e:
         print(f"Error finding tenant: {e}")
         return None
-    finally:
-        cursor.close()
-        conn.close()
 
 def get_all_tenant_databases(tenant_id):
     """Get tenant information for table name generation.
@@ -148,7 +153,11 @@ def get_tenant_table_connection(tenant_id: str, table_name: str, service_type: s
     return conn, full_table_name
 
 def ensure_tenant_tables_exist(tenant_id: str, service_type: str = "m365"):
-    """Ensure that tables exist for a tenant."""
+    """Ensure that tables exist for a tenant.
+    
+    Tables are created or migrated the first time a tenant is seen by this
+    process; subsequent calls return without touching the database.
+    """
     tenant_info = find_tenant_database(tenant_id)
     if not tenant_info:
         print(f"Tenant not found: {tenant_id}")
@@ -156,8 +165,7 @@ def ensure_tenant_tables_exist(tenant_id: str, service_type: str = "m365"):
     
     try:
         table_manager = get_table_manager()
-        table_manager.create_tenant_tables(tenant_info['name'], tenant_info['tenantId'], service_type)
-        return True
+        return table_manager.ensure_tenant_schema(tenant_info['name'], tenant_info['id'])
     except Exception as e:
         print(f"Error ensuring tenant tables exist: {e}")
         return False
@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from dateutil import parser
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Convert a datetime to naive UTC for storage in DATETIME2 columns.
+
+    Naive values are assumed to be local time, which is what datetime.now()
+    produces throughout this backend.
+    """
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def parse_datetime_utc(value) -> Optional[datetime]:
+    """Parse an ISO 8601 or RSS-style timestamp into a naive UTC datetime.
+
+    Returns None for empty or unparseable values so they can be stored as NULL.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return to_utc_naive(value)
+
+    try:
+        return to_utc_naive(parser.parse(str(value)))
+    except (ValueError, OverflowError):
+        return None
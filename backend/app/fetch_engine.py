@@ -0,0 +1,130 @@
+import os
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .database import get_azure_config, get_tenant_registry
+from .fetchers import fetch_message_center, fetch_windows, fetch_news, fetch_licenses
+from .fetch_jobs import FetchJob, get_job_registry, report_progress
+from .fetch_lock import fetch_lock, FetchLockTimeout, LOCK_WAITED
+from .sync_state import get_sync_state, save_sync_state
+
+# Fetches running at once in this process across all tenants and data types
+FETCH_WORKERS = max(1, int(os.getenv('FETCH_WORKERS', '4')))
+
+# Pooled connections left for API requests on top of two per fetch worker
+# (the fetch's own connection plus a nested helper's)
+POOL_HEADROOM = 2
+
+# Fetch entry points by data type, named like the sync state and refresh log
+FETCHERS: Dict[str, Callable[..., bool]] = {
+    "message_center": fetch_message_center,
+    "windows_updates": fetch_windows,
+    "news": fetch_news,
+    "licenses": fetch_licenses,
+}
+
+def get_tenant(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """Get a tenant dictionary by internal id, or None if it doesn't exist."""
+    tenant = get_tenant_registry().get(tenant_id)
+    return tenant.to_dict() if tenant else None
+
+def _run(data_type: str, tenant: Dict[str, Any], **options) -> Tuple[bool, Optional[str]]:
+    """Run one fetch, returning whether it succeeded and the error if it raised.
+
+    The fetch holds the cross-instance fetch lock for its tenant and data
+    type. If another instance was already running it, this waits for that
+    run and reuses it when it recorded a success while this one waited;
+    otherwise the fetch runs here.
+    """
+    fetcher = FETCHERS.get(data_type)
+    if fetcher is None:
+        raise ValueError(f"Unknown fetch data type: {data_type}")
+    try:
+        previous_success = get_sync_state(tenant['id'], data_type)["last_success"]
+        with fetch_lock(tenant['id'], data_type) as lock:
+            if lock == LOCK_WAITED:
+                if get_sync_state(tenant['id'], data_type)["last_success"] != previous_success:
+                    print(f"{data_type} for tenant {tenant.get('name')} was just fetched by another instance")
+                    report_progress(fetchedElsewhere=True)
+                    return True, None
+                print(f"The other {data_type} fetch for tenant {tenant.get('name')} didn't succeed; fetching")
+            succeeded = bool(fetcher(tenant, **options))
+            if succeeded:
+                save_sync_state(tenant['id'], data_type, last_success=datetime.now().isoformat())
+            return succeeded, None
+    except FetchLockTimeout as e:
+        print(f"Error fetching {data_type} for tenant {tenant.get('name')}: {e}")
+        return False, str(e)
+    except Exception as e:
+        print(f"Error fetching {data_type} for tenant {tenant.get('name')}: {e}")
+        return False, str(e)
+
+def run_fetch(data_type: str, tenant: Dict[str, Any], **options) -> bool:
+    """Run one fetch in the calling thread.
+
+    Errors are reported as False like a failed fetch, so a worker never dies
+    on one tenant's exception.
+    """
+    return _run(data_type, tenant, **options)[0]
+
+def _run_job(job: FetchJob, tenant: Dict[str, Any], **options) -> bool:
+    registry = get_job_registry()
+    registry.start(job)
+    succeeded, error = False, None
+    try:
+        succeeded, error = _run(job.dataType, tenant, **options)
+        if not succeeded and not error:
+            error = f"{job.dataType} fetch failed, see the server log for details"
+        return succeeded
+    finally:
+        registry.finish(job, succeeded, error)
+
+def submit_job(data_type: str, tenant: Dict[str, Any], **options) -> FetchJob:
+    """Queue a fetch as a job whose state and progress can be polled.
+
+    If the same tenant and data type already has a queued or running job,
+    that job is returned instead and no second fetch starts; its options
+    apply. Raises JobQueueFull when FETCH_MAX_PENDING_JOBS jobs are already
+    pending. The job's future resolves to the fetch result.
+    """
+    if data_type not in FETCHERS:
+        raise ValueError(f"Unknown fetch data type: {data_type}")
+    job, created = get_job_registry().create_or_attach(
+        data_type, tenant, lambda job: get_fetch_executor().submit(_run_job, job, tenant, **options)
+    )
+    if not created:
+        print(f"{data_type} fetch for tenant {tenant['name']} is already {job.state}; attached to job {job.id}")
+    return job
+
+# Global instance
+fetch_executor = None
+_executor_lock = threading.Lock()
+
+def _check_pool_size():
+    """Warn when the DB pool is too small for FETCH_WORKERS fetches at once."""
+    try:
+        pool_size = get_azure_config().pool_size
+    except Exception as e:
+        print(f"Error reading the connection pool size: {e}")
+        return
+    needed = 2 * FETCH_WORKERS + POOL_HEADROOM
+    if pool_size < needed:
+        print(f"Warning: AZURE_SQL_POOL_SIZE is {pool_size} but {FETCH_WORKERS} fetch workers may need {needed} "
+              f"connections; fetches and API requests will wait for connections")
+
+def get_fetch_executor() -> ThreadPoolExecutor:
+    """Get the process-wide pool the fetches run on.
+
+    Fetches run in-process so they share the Graph HTTP session, the token
+    cache, the DB connection pool and the cached table metadata instead of
+    starting a new interpreter each time.
+    """
+    global fetch_executor
+    if fetch_executor is None:
+        with _executor_lock:
+            if fetch_executor is None:
+                _check_pool_size()
+                fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+    return fetch_executor
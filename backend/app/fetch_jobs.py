@@ -0,0 +1,156 @@
+import os
+import time
+import uuid
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+# Jobs queued or running at once before new fetch requests are refused
+MAX_PENDING_JOBS = max(1, int(os.getenv('FETCH_MAX_PENDING_JOBS', '100')))
+# How long finished jobs stay available for status polling
+JOB_RETENTION = float(os.getenv('FETCH_JOB_RETENTION_SECONDS', '3600'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+class JobQueueFull(Exception):
+    """Raised when MAX_PENDING_JOBS jobs are already queued or running."""
+
+@dataclass
+class FetchJob:
+    """One fetch of a data type for a tenant, tracked from queueing to completion."""
+    id: str
+    dataType: str
+    tenantId: str
+    tenantName: str
+    state: str = QUEUED
+    progress: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    attachedRequests: int = 0
+    createdAt: float = field(default_factory=time.time)
+    startedAt: Optional[float] = None
+    finishedAt: Optional[float] = None
+    future: Any = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status as returned by the jobs API."""
+        def timestamp(value):
+            return datetime.fromtimestamp(value).isoformat() if value else None
+
+        end = self.finishedAt or time.time()
+        return {
+            'id': self.id,
+            'dataType': self.dataType,
+            'tenantId': self.tenantId,
+            'tenantName': self.tenantName,
+            'state': self.state,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'attachedRequests': self.attachedRequests,
+            'createdAt': timestamp(self.createdAt),
+            'startedAt': timestamp(self.startedAt),
+            'finishedAt': timestamp(self.finishedAt),
+            'queuedSeconds': round((self.startedAt or end) - self.createdAt, 3),
+            'runSeconds': round(end - self.startedAt, 3) if self.startedAt else None
+        }
+
+class JobRegistry:
+    """In-process table of fetch jobs.
+
+    Jobs live in memory only: a restart forgets them, and a job id is only
+    known to the process that accepted it.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, FetchJob] = {}
+        # Queued or running job per (tenant id, data type)
+        self._active: Dict[Tuple[str, str], FetchJob] = {}
+        self._lock = threading.Lock()
+        self._current = threading.local()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.state in FINISHED_STATES and job.finishedAt < cutoff]:
+            del self._jobs[job_id]
+
+    def create_or_attach(self, data_type: str, tenant: Dict[str, Any],
+                         start: Callable[[FetchJob], Any]) -> Tuple[FetchJob, bool]:
+        """Get the pending job for this tenant and data type, or register and start a new one.
+
+        Single flight: while a fetch is queued or running, further requests
+        for the same (tenant, data type) attach to it instead of starting a
+        duplicate. start is called under the registry lock with the new job
+        and returns its future. Returns the job and whether it was created.
+        Raises JobQueueFull if too many jobs are pending.
+        """
+        with self._lock:
+            self._prune()
+            active = self._active.get((tenant['id'], data_type))
+            if active is not None:
+                active.attachedRequests += 1
+                return active, False
+            pending = sum(1 for job in self._jobs.values() if job.state not in FINISHED_STATES)
+            if pending >= MAX_PENDING_JOBS:
+                raise JobQueueFull(f"{pending} fetch jobs are already queued or running")
+            job = FetchJob(id=str(uuid.uuid4()), dataType=data_type,
+                           tenantId=tenant['id'], tenantName=tenant['name'])
+            job.future = start(job)
+            self._jobs[job.id] = job
+            self._active[(job.tenantId, data_type)] = job
+            return job, True
+
+    def get(self, job_id: str) -> Optional[FetchJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, tenant_id: Optional[str] = None) -> List[FetchJob]:
+        """Known jobs, newest first, optionally for one tenant."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if tenant_id is None or job.tenantId == tenant_id]
+        return sorted(jobs, key=lambda job: job.createdAt, reverse=True)
+
+    def start(self, job: FetchJob):
+        """Mark a job running and make it the current thread's job."""
+        with self._lock:
+            job.state = RUNNING
+            job.startedAt = time.time()
+        self._current.job = job
+
+    def finish(self, job: FetchJob, succeeded: bool, error: Optional[str] = None):
+        with self._lock:
+            job.state = SUCCEEDED if succeeded else FAILED
+            job.error = error if not succeeded else None
+            job.finishedAt = time.time()
+            if self._active.get((job.tenantId, job.dataType)) is job:
+                del self._active[(job.tenantId, job.dataType)]
+        self._current.job = None
+
+    def report_progress(self, **counters):
+        """Merge counters into the progress of the job running on this thread."""
+        job = getattr(self._current, 'job', None)
+        if job is None:
+            return
+        with self._lock:
+            job.progress.update(counters)
+
+# Global instance
+job_registry = None
+_registry_lock = threading.Lock()
+
+def get_job_registry() -> JobRegistry:
+    """Get the process-wide job registry."""
+    global job_registry
+    if job_registry is None:
+        with _registry_lock:
+            if job_registry is None:
+                job_registry = JobRegistry()
+    return job_registry
+
+def report_progress(**counters):
+    """Update the current fetch job's progress counters; a no-op outside a job."""
+    get_job_registry().report_progress(**counters)
@@ -0,0 +1,83 @@
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+from .database import get_dedicated_connection
+
+# How long a fetch waits for the same fetch running in another instance; the
+# waiter holds a fetch worker meanwhile
+FETCH_LOCK_WAIT = float(os.getenv('FETCH_LOCK_WAIT_SECONDS', '120'))
+
+# Outcomes of fetch_lock
+LOCK_ACQUIRED = 'acquired'
+LOCK_WAITED = 'waited'
+LOCK_UNAVAILABLE = 'unavailable'
+
+class FetchLockTimeout(Exception):
+    """Raised when another instance kept the same fetch running past FETCH_LOCK_WAIT."""
+
+def _get_applock(cursor, resource: str, timeout_ms: int) -> int:
+    cursor.execute('''
+        DECLARE @result INT;
+        EXEC @result = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                                     @LockOwner = 'Session', @LockTimeout = ?;
+        SELECT @result;
+    ''', (resource, timeout_ms))
+    return cursor.fetchone()[0]
+
+@contextmanager
+def fetch_lock(tenant_id: str, data_type: str, wait_seconds: Optional[float] = None):
+    """Hold a database-wide lock on one tenant's fetch of one data type.
+
+    Uses a session-owned sp_getapplock, so every server instance and CLI run
+    sharing the database sees it, and a crashed holder releases it with its
+    session. The session is a dedicated connection outside the pool, held
+    for the whole fetch, so locks never take connections from requests.
+    Yields LOCK_ACQUIRED when the lock was free, or LOCK_WAITED when another
+    holder ran while this one waited; the caller decides whether that run
+    can be reused. If the lock can't be taken at all, yields
+    LOCK_UNAVAILABLE and the caller fetches unguarded.
+    """
+    wait_seconds = FETCH_LOCK_WAIT if wait_seconds is None else wait_seconds
+    resource = f"fetch:{data_type}:{tenant_id}"[:255]
+    conn = None
+    state = LOCK_UNAVAILABLE
+    try:
+        conn = get_dedicated_connection()
+        cursor = conn.cursor()
+        result = _get_applock(cursor, resource, 0)
+        if result == -1:
+            print(f"{data_type} fetch for tenant {tenant_id} is running elsewhere; waiting up to {wait_seconds:.0f}s")
+            result = _get_applock(cursor, resource, int(wait_seconds * 1000))
+            if result == -1:
+                raise FetchLockTimeout(f"{data_type} fetch for tenant {tenant_id} is still running elsewhere")
+            if result >= 0:
+                state = LOCK_WAITED
+        elif result >= 0:
+            state = LOCK_ACQUIRED
+        if result < 0:
+            print(f"sp_getapplock returned {result} for {resource}; fetching without the lock")
+        cursor.close()
+    except FetchLockTimeout:
+        conn.close()
+        raise
+    except Exception as e:
+        print(f"Error taking fetch lock {resource}; fetching without it: {e}")
+        if conn:
+            conn.close()
+        conn = None
+
+    try:
+        yield state
+    finally:
+        if conn:
+            try:
+                if state != LOCK_UNAVAILABLE:
+                    cursor = conn.cursor()
+                    cursor.execute("EXEC sp_releaseapplock @Resource = ?, @LockOwner = 'Session'", (resource,))
+                    cursor.close()
+            except Exception as e:
+                print(f"Error releasing fetch lock {resource}: {e}")
+            finally:
+                # Ending the session releases the lock if the release failed
+                conn.close()
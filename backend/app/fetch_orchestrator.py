@@ -0,0 +1,296 @@
+import os
+import time
+import uuid
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Sequence
+
+from .fetch_engine import FETCHERS, FETCH_WORKERS, submit_job
+from .fetch_jobs import JOB_RETENTION, JobQueueFull, SUCCEEDED, FAILED
+
+# Per data type caps for multi-tenant runs, e.g. "windows_updates=2,licenses=1";
+# types not listed get half of the run's concurrency
+FETCH_TYPE_LIMITS = os.getenv('FETCH_TYPE_LIMITS', '')
+
+# Job progress counters that count rows written, and rows found unchanged
+WRITTEN_COUNTERS = ("inserted", "updated", "deleted", "issuesInserted", "issuesUpdated",
+                    "licenses", "roleMembers", "userChanges")
+UNCHANGED_COUNTERS = ("unchanged", "issuesUnchanged")
+
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+
+def parse_type_limits(text: Optional[str]) -> Dict[str, int]:
+    """Parse "type=limit,type=limit" into a dict; raises ValueError on unknown types."""
+    limits = {}
+    for item in (part.strip() for part in (text or '').split(',')):
+        if not item:
+            continue
+        data_type, _, value = item.partition('=')
+        data_type = data_type.strip()
+        if data_type not in FETCHERS:
+            raise ValueError(f"Unknown fetch data type in type limits: {data_type}")
+        limits[data_type] = max(1, int(value))
+    return limits
+
+@dataclass
+class FetchTask:
+    """One tenant and data type within a multi-tenant run."""
+    tenantId: str
+    tenantName: str
+    dataType: str
+    state: str = PENDING
+    jobId: Optional[str] = None
+    attached: bool = False
+    seconds: Optional[float] = None
+    rowsWritten: int = 0
+    rowsUnchanged: int = 0
+    error: Optional[str] = None
+    tenant: Dict[str, Any] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'tenantId': self.tenantId,
+            'tenantName': self.tenantName,
+            'dataType': self.dataType,
+            'state': self.state,
+            'jobId': self.jobId,
+            'attached': self.attached,
+            'seconds': self.seconds,
+            'rowsWritten': self.rowsWritten,
+            'rowsUnchanged': self.rowsUnchanged,
+            'error': self.error
+        }
+
+@dataclass
+class FetchRun:
+    """A fetch of several data types across many tenants."""
+    id: str
+    dataTypes: List[str]
+    maxConcurrency: int
+    typeLimits: Dict[str, int]
+    tasks: List[FetchTask]
+    options: Dict[str, Dict[str, Any]] = field(default_factory=dict, repr=False)
+    state: str = PENDING
+    createdAt: float = field(default_factory=time.time)
+    startedAt: Optional[float] = None
+    finishedAt: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status as returned by the fetch-all API."""
+        def timestamp(value):
+            return datetime.fromtimestamp(value).isoformat() if value else None
+
+        states = Counter(task.state for task in self.tasks)
+        end = self.finishedAt or time.time()
+        return {
+            'id': self.id,
+            'state': self.state,
+            'dataTypes': list(self.dataTypes),
+            'maxConcurrency': self.maxConcurrency,
+            'typeLimits': dict(self.typeLimits),
+            'tenants': len({task.tenantId for task in self.tasks}),
+            'succeeded': states[SUCCEEDED],
+            'failed': states[FAILED],
+            'pending': states[PENDING] + states[RUNNING],
+            'rowsWritten': sum(task.rowsWritten for task in self.tasks),
+            'rowsUnchanged': sum(task.rowsUnchanged for task in self.tasks),
+            'createdAt': timestamp(self.createdAt),
+            'startedAt': timestamp(self.startedAt),
+            'finishedAt': timestamp(self.finishedAt),
+            'runSeconds': round(end - self.startedAt, 3) if self.startedAt else None,
+            'tasks': [task.to_dict() for task in self.tasks]
+        }
+
+def create_run(tenants: Sequence[Dict[str, Any]], data_types: Sequence[str],
+               max_concurrency: Optional[int] = None,
+               type_limits: Optional[Dict[str, int]] = None,
+               options: Optional[Dict[str, Dict[str, Any]]] = None) -> FetchRun:
+    """Plan a run of data_types for every tenant.
+
+    The concurrency cap is bounded by FETCH_WORKERS, since the fetches run
+    on that pool. Each data type is capped by type_limits, then
+    FETCH_TYPE_LIMITS, then half the cap when several types are fetched.
+    options holds keyword arguments for the fetcher of each data type.
+    """
+    data_types = list(dict.fromkeys(data_types))
+    unknown = [data_type for data_type in data_types if data_type not in FETCHERS]
+    if unknown:
+        raise ValueError(f"Unknown fetch data type: {', '.join(unknown)}")
+    if not data_types:
+        raise ValueError("No data types to fetch")
+
+    requested = max(1, max_concurrency or FETCH_WORKERS)
+    concurrency = min(requested, FETCH_WORKERS)
+    if requested > FETCH_WORKERS:
+        print(f"Concurrency {requested} exceeds FETCH_WORKERS; running {FETCH_WORKERS} fetches at once")
+
+    default_limit = concurrency if len(data_types) == 1 else max(1, (concurrency + 1) // 2)
+    limits = dict(parse_type_limits(FETCH_TYPE_LIMITS), **(type_limits or {}))
+    limits = {data_type: min(concurrency, limits.get(data_type, default_limit)) for data_type in data_types}
+
+    # Tenant-major order: every tenant's first fetch is dispatched before any
+    # tenant's second, so no tenant waits behind another tenant's whole refresh
+    tasks = [
+        FetchTask(tenantId=tenant['id'], tenantName=tenant['name'], dataType=data_type, tenant=tenant)
+        for tenant in tenants
+        for data_type in data_types
+    ]
+    return FetchRun(id=str(uuid.uuid4()), dataTypes=data_types, maxConcurrency=concurrency,
+                    typeLimits=limits, tasks=tasks, options=options or {})
+
+def _finish_task(task: FetchTask, job, succeeded: bool):
+    task.state = SUCCEEDED if succeeded else FAILED
+    task.error = None if succeeded else (job.error or f"{task.dataType} fetch failed")
+    if job.startedAt:
+        task.seconds = round((job.finishedAt or time.time()) - job.startedAt, 3)
+    progress = dict(job.progress)
+    task.rowsWritten = sum(int(progress.get(name) or 0) for name in WRITTEN_COUNTERS)
+    task.rowsUnchanged = sum(int(progress.get(name) or 0) for name in UNCHANGED_COUNTERS)
+
+def execute_run(run: FetchRun) -> FetchRun:
+    """Run every task of a run and return it once all have finished.
+
+    At most maxConcurrency fetches are in flight, at most the type limit of
+    each data type, and one per tenant so a tenant's Graph throttling budget
+    isn't spent by several fetches at once. Pending tasks are dispatched in
+    order, skipping those whose data type or tenant is busy. A failing
+    tenant only fails its own tasks.
+    """
+    run.state = RUNNING
+    run.startedAt = time.time()
+    print(f"Fetching {', '.join(run.dataTypes)} for {len({task.tenantId for task in run.tasks})} tenants, "
+          f"{run.maxConcurrency} at once (per type: {run.typeLimits})")
+
+    pending = list(run.tasks)
+    in_flight = {}
+    busy_types = Counter()
+    busy_tenants = set()
+
+    while pending or in_flight:
+        for task in list(pending):
+            if len(in_flight) >= run.maxConcurrency:
+                break
+            if busy_types[task.dataType] >= run.typeLimits[task.dataType] or task.tenantId in busy_tenants:
+                continue
+            try:
+                job = submit_job(task.dataType, task.tenant, **run.options.get(task.dataType, {}))
+            except JobQueueFull as e:
+                # Retry once one of ours finishes; with none in flight, give up on this task
+                if in_flight:
+                    break
+                pending.remove(task)
+                task.state, task.error = FAILED, str(e)
+                print(f"Error queueing {task.dataType} for tenant {task.tenantName}: {e}")
+                continue
+            except Exception as e:
+                pending.remove(task)
+                task.state, task.error = FAILED, str(e)
+                print(f"Error queueing {task.dataType} for tenant {task.tenantName}: {e}")
+                continue
+
+            pending.remove(task)
+            task.state, task.jobId = RUNNING, job.id
+            task.attached = job.attachedRequests > 0
+            in_flight[job.future] = (task, job)
+            busy_types[task.dataType] += 1
+            busy_tenants.add(task.tenantId)
+
+        if not in_flight:
+            continue
+
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            task, job = in_flight.pop(future)
+            busy_types[task.dataType] -= 1
+            busy_tenants.discard(task.tenantId)
+            try:
+                succeeded = bool(future.result())
+            except Exception as e:
+                succeeded = False
+                job.error = job.error or str(e)
+            _finish_task(task, job, succeeded)
+            print(f"{'Finished' if succeeded else 'FAILED'} {task.dataType} for tenant {task.tenantName} "
+                  f"in {task.seconds if task.seconds is not None else '?'}s")
+
+    run.state = FINISHED
+    run.finishedAt = time.time()
+    return run
+
+def format_summary(run: FetchRun) -> str:
+    """Render a run's tasks as a fixed-width table with a totals line."""
+    headers = ("Tenant", "Data type", "Status", "Seconds", "Written", "Unchanged")
+    rows = [
+        (task.tenantName, task.dataType, task.state + (" (attached)" if task.attached else ""),
+         f"{task.seconds:.1f}" if task.seconds is not None else "-",
+         str(task.rowsWritten), str(task.rowsUnchanged))
+        for task in sorted(run.tasks, key=lambda task: (task.tenantName.lower(), task.dataType))
+    ]
+    summary = run.to_dict()
+    totals = ("TOTAL", f"{len(run.tasks)} fetches", f"{summary['failed']} failed",
+              f"{summary['runSeconds'] or 0:.1f}", str(summary['rowsWritten']), str(summary['rowsUnchanged']))
+
+    widths = [max(len(row[i]) for row in [headers, totals] + rows) for i in range(len(headers))]
+
+    def line(row):
+        return "  ".join(value.ljust(width) if i < 3 else value.rjust(width)
+                         for i, (value, width) in enumerate(zip(row, widths)))
+
+    rule = "  ".join("-" * width for width in widths)
+    lines = [line(headers), rule] + [line(row) for row in rows] + [rule, line(totals)]
+    failures = [task for task in run.tasks if task.state == FAILED]
+    if failures:
+        lines.append("")
+        lines.extend(f"{task.tenantName} / {task.dataType}: {task.error}" for task in failures)
+    return "\n".join(lines)
+
+class RunRegistry:
+    """In-process table of multi-tenant runs started through the API."""
+
+    def __init__(self):
+        self._runs: Dict[str, FetchRun] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION
+        for run_id in [run_id for run_id, run in self._runs.items()
+                       if run.state == FINISHED and run.finishedAt < cutoff]:
+            del self._runs[run_id]
+
+    def start(self, run: FetchRun) -> FetchRun:
+        """Register a run and execute it on a background thread."""
+        with self._lock:
+            self._prune()
+            self._runs[run.id] = run
+        threading.Thread(target=self._execute, args=(run,), name=f"fetch-run-{run.id[:8]}", daemon=True).start()
+        return run
+
+    def _execute(self, run: FetchRun):
+        try:
+            execute_run(run)
+            print(format_summary(run))
+        except Exception as e:
+            print(f"Error in fetch run {run.id}: {e}")
+            run.state = FINISHED
+            run.finishedAt = time.time()
+
+    def get(self, run_id: str) -> Optional[FetchRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+# Global instance
+run_registry = None
+_registry_lock = threading.Lock()
+
+def get_run_registry() -> RunRegistry:
+    """Get the process-wide registry of multi-tenant runs."""
+    global run_registry
+    if run_registry is None:
+        with _registry_lock:
+            if run_registry is None:
+                run_registry = RunRegistry()
+    return run_registry
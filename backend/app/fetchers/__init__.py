@@ -0,0 +1,6 @@
+# Fetchers for each data type; every entry point takes a tenant dictionary
+# from the tenant registry and returns True when the data was stored
+from .message_center import fetch_message_center
+from .windows import fetch_windows
+from .news import fetch_news
+from .licenses import fetch_licenses
@@ -0,0 +1,268 @@
+
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from ..database import get_db_connection
+from ..license_store import store_license_snapshot
+from ..graph_client import get_graph_client, GraphRequestError
+from ..sync_state import get_sync_state, save_sync_state
+from ..date_utils import parse_datetime_utc
+from ..token_cache import get_tenant_access_token
+from ..sku_names import get_sku_name_cache, TRIAL_SKUS
+from ..fetch_jobs import report_progress
+from ..user_directory import (
+    ensure_users_table, clear_users, store_user_changes, store_sign_in_activity, get_inactive_users,
+    INACTIVE_USER_DAYS
+)
+
+# Users per page and the properties read for sign-in activity
+USERS_PAGE_SIZE = 999
+USER_SELECT = 'id,signInActivity'
+# Directory properties tracked through users/delta
+USERS_DELTA_URL = 'https://graph.microsoft.com/v1.0/users/delta?$select=displayName,userPrincipalName,accountEnabled'
+
+# Sync state key holding the users delta link and sign-in watermark
+USERS_SYNC_DATA_TYPE = "users"
+# Sign-in activity is reported with a delay, so each run re-reads this window before the last one
+SIGN_IN_OVERLAP = timedelta(hours=6)
+
+def get_subscribed_skus(token):
+    """Get subscribed SKUs for a specific tenant."""
+    url = 'https://graph.microsoft.com/v1.0/subscribedSkus'
+    
+    try:
+        return get_graph_client().get_all(url, token=token)
+    except GraphRequestError as e:
+        print(f"Error fetching subscribed SKUs: {e}")
+        return []
+
+def iter_user_pages(token, since=None):
+    """Yield the users of a tenant with their sign-in activity one page at a time.
+    
+    With since, only users that signed in at or after it are returned. A
+    page that fails after retries raises, so a partial sync is never stored.
+    """
+    url = f'https://graph.microsoft.com/v1.0/users?$top={USERS_PAGE_SIZE}&$select={USER_SELECT}'
+    if since:
+        url += '&$filter=' + quote(f'signInActivity/lastSignInDateTime ge {since}')
+    for page in get_graph_client().iter_pages(url, token=token):
+        yield page.get('value', [])
+
+def iter_user_delta_pages(token, delta_link=None):
+    """Yield (users, delta_link) for each users/delta page; only the last page has a delta link."""
+    for page in get_graph_client().iter_pages(delta_link or USERS_DELTA_URL, token=token):
+        yield page.get('value', []), page.get('@odata.deltaLink')
+
+def apply_user_delta(conn, tenant_id, token, delta_link, sync_stats):
+    """Apply users/delta pages to the users table and return the new delta link.
+    
+    Without a delta link every user is read and the tenant's rows are rebuilt.
+    """
+    if not delta_link:
+        clear_users(conn, tenant_id)
+    
+    new_delta_link = None
+    for users, page_delta_link in iter_user_delta_pages(token, delta_link):
+        sync_stats['pages'] += 1
+        removed_ids = [user['id'] for user in users if '@removed' in user]
+        user_rows = [{
+            'tenant_id': tenant_id,
+            'id': user['id'],
+            'user_principal_name': user.get('userPrincipalName'),
+            'display_name': user.get('displayName'),
+            'account_enabled': user.get('accountEnabled')
+        } for user in users if '@removed' not in user]
+        
+        counts = store_user_changes(conn, tenant_id, user_rows, removed_ids)
+        sync_stats['changed'] += counts['inserted'] + counts['updated'] + counts['deleted']
+        sync_stats['users'] += len(users)
+        new_delta_link = page_delta_link or new_delta_link
+    return new_delta_link
+
+def apply_sign_in_activity(conn, tenant_id, token, since, sync_stats):
+    """Write sign-in activity for users that signed in since the watermark, or all users."""
+    for users in iter_user_pages(token, since):
+        sync_stats['pages'] += 1
+        sign_in_rows = []
+        for user in users:
+            sign_in_activity = user.get('signInActivity') or {}
+            last_sign_in = sign_in_activity.get('lastSignInDateTime')
+            last_successful = sign_in_activity.get('lastSuccessfulSignInDateTime')
+            sign_in_rows.append({
+                'tenant_id': tenant_id,
+                'id': user['id'],
+                'last_sign_in_attempt': last_sign_in,
+                'last_successful_sign_in': last_successful,
+                'last_sign_in_attempt_utc': parse_datetime_utc(last_sign_in),
+                'last_successful_sign_in_utc': parse_datetime_utc(last_successful)
+            })
+        store_sign_in_activity(conn, sign_in_rows)
+        sync_stats['sign_ins'] += len(sign_in_rows)
+
+def sync_users(tenant, token, force_full_sync=False):
+    """Bring the tenant_users table up to date with the directory.
+    
+    Directory changes come from users/delta, resuming from the delta link
+    saved by the previous run; without one, or when Graph no longer accepts
+    it, every user is read again. Sign-in activity, which delta doesn't
+    track, is refreshed for users that signed in since the last run. All
+    changes and the new sync state commit together. Returns the sync counts.
+    """
+    ensure_users_table()
+    sync_state = get_sync_state(tenant["id"], USERS_SYNC_DATA_TYPE)
+    delta_link = None if force_full_sync else sync_state["sync_cursor"]
+    started = datetime.now(timezone.utc)
+    sync_stats = {'pages': 0, 'users': 0, 'changed': 0, 'sign_ins': 0}
+    
+    conn = get_db_connection()
+    try:
+        try:
+            new_delta_link = apply_user_delta(conn, tenant["id"], token, delta_link, sync_stats)
+        except GraphRequestError as e:
+            # An expired or invalid delta link needs a full resync
+            if not delta_link or e.status_code not in (400, 410):
+                raise
+            print(f"Users delta link rejected with HTTP {e.status_code}; resyncing all users")
+            conn.rollback()
+            delta_link = None
+            sync_stats = dict.fromkeys(sync_stats, 0)
+            new_delta_link = apply_user_delta(conn, tenant["id"], token, None, sync_stats)
+        
+        # After a full resync the sign-in activity of every user has to be read again
+        since = sync_state["watermark"] if delta_link else None
+        apply_sign_in_activity(conn, tenant["id"], token, since, sync_stats)
+        
+        state = {
+            "sync_cursor": new_delta_link,
+            "watermark": (started - SIGN_IN_OVERLAP).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "changed_count": sync_stats['changed'],
+            "unchanged_count": sync_stats['users'] - sync_stats['changed']
+        }
+        if not delta_link:
+            state["last_full_sync"] = datetime.now().isoformat()
+        save_sync_state(tenant["id"], USERS_SYNC_DATA_TYPE, conn=conn, **state)
+        
+        conn.commit()
+        return sync_stats
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def get_directory_roles(token):
+    """Get directory roles for a specific tenant."""
+    url = 'https://graph.microsoft.com/v1.0/directoryRoles'
+    
+    try:
+        return get_graph_client().get_all(url, token=token)
+    except GraphRequestError as e:
+        print(f"Error fetching directory roles: {e}")
+        return []
+
+def get_members_for_roles(token, role_ids):
+    """Get the members of many directory roles through batched Graph requests.
+    
+    Returns a dict of role id to members; roles whose members could not be
+    fetched map to an empty list.
+    """
+    urls = {role_id: f'/directoryRoles/{role_id}/members' for role_id in role_ids}
+    
+    try:
+        members_by_role = get_graph_client().batch_get_all(urls, token=token)
+        return {role_id: members or [] for role_id, members in members_by_role.items()}
+    except GraphRequestError as e:
+        print(f"Error fetching role members: {e}")
+        return {}
+
+def fetch_licenses(tenant):
+    """Fetch and store license data for a specific tenant."""
+    tenant_name = tenant["name"]
+    tenant_id = tenant["tenantId"]
+    print(f"Processing tenant: {tenant_name} (ID: {tenant_id})")
+    
+    # Get access token
+    token = get_tenant_access_token(tenant)
+    if not token:
+        print(f"Failed to get access token for tenant: {tenant_name}")
+        return False
+    
+    # Fetch license data
+    licenses = get_subscribed_skus(token)
+    print(f"Retrieved {len(licenses)} licenses")
+    report_progress(licenses=len(licenses))
+    
+    # Get translation table for license names
+    translation_table = get_sku_name_cache().get_names()
+    
+    # Process licenses
+    license_rows = []
+    for license in licenses:
+        sku_id = license.get('skuId', '')
+        sku_part_number = license.get('skuPartNumber', '')
+        
+        # Look up display name in translation table
+        display_name = translation_table.get(sku_id.lower(), sku_part_number)
+        
+        # Determine if the license is a trial
+        is_trial = sku_part_number in TRIAL_SKUS
+        license_type = 'Trial' if is_trial else 'Paid'
+        
+        # Get license counts
+        total_licenses = license.get('prepaidUnits', {}).get('enabled', 0)
+        consumed_units = license.get('consumedUnits', 0)
+        unused_licenses = total_licenses - consumed_units
+        
+        # Get expiration date if available
+        renewal_date = license.get('appliesTo', '')
+        
+        license_rows.append({
+            'license_sku': sku_part_number,
+            'display_name': display_name,
+            'type': license_type,
+            'total_licenses': total_licenses,
+            'used_licenses': consumed_units,
+            'unused_licenses': unused_licenses,
+            'renewal_expiration_date': renewal_date
+        })
+    
+    # Fetch directory roles and their members
+    roles = get_directory_roles(token)
+    print(f"Retrieved {len(roles)} directory roles")
+    
+    members_by_role = get_members_for_roles(token, [role.get('id') for role in roles if role.get('id')])
+    
+    role_member_rows = []
+    for role in roles:
+        role_id = role.get('id', '')
+        if role_id:
+            for member in members_by_role.get(role_id, []):
+                role_member_rows.append({
+                    'display_name': member.get('displayName', ''),
+                    'user_principal_name': member.get('userPrincipalName', ''),
+                    'licenses': role.get('displayName', 'Unknown Role')
+                })
+    
+    # Store licenses and role members under one snapshot
+    try:
+        snapshot_id = store_license_snapshot(tenant["id"], license_rows, role_member_rows)
+    except Exception as e:
+        print(f"Failed to store license data for tenant {tenant_name}: {e}")
+        return False
+    
+    print(f"Stored snapshot {snapshot_id}: {len(license_rows)} licenses, {len(role_member_rows)} role members")
+    report_progress(roleMembers=len(role_member_rows))
+    
+    # Apply directory and sign-in changes to the users table
+    try:
+        sync_stats = sync_users(tenant, token)
+    except Exception as e:
+        print(f"Failed to sync users for tenant {tenant_name}: {e}")
+        return False
+    
+    report_progress(userPages=sync_stats['pages'], userChanges=sync_stats['changed'], signInUpdates=sync_stats['sign_ins'])
+    print(f"Synced users: {sync_stats['users']} delta entries, {sync_stats['changed']} changed, "
+          f"{sync_stats['sign_ins']} sign-in updates in {sync_stats['pages']} pages")
+    print(f"{len(get_inactive_users(tenant['id']))} users inactive for at least {INACTIVE_USER_DAYS} days")
+    print(f"Completed license data processing for tenant: {tenant_name}")
+    return True
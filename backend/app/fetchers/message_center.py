@@ -0,0 +1,294 @@
+
+import json
+import os
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from ..database import get_tenant_table_connection, ensure_tenant_tables_exist
+from ..date_utils import parse_datetime_utc
+from ..bulk_upsert import bulk_merge, delete_missing
+from ..sync_state import get_sync_state, save_sync_state
+from ..graph_client import get_graph_client, GraphRequestError
+from ..token_cache import get_tenant_access_token
+from ..fetch_jobs import report_progress
+
+# Columns written to the updates table, keyed by (tenant_id, id)
+UPDATE_KEY_COLUMNS = ["tenant_id", "id"]
+UPDATE_COLUMNS = UPDATE_KEY_COLUMNS + [
+    "title", "category", "severity", "startDateTime", "lastModifiedDateTime",
+    "isMajorChange", "actionRequiredByDateTime", "services", "hasAttachments",
+    "roadmapId", "platform", "status", "lastUpdateTime", "bodyContent", "tags",
+    "startDateTime_utc", "lastModifiedDateTime_utc", "actionRequiredByDateTime_utc"
+]
+
+# Endpoint for message center announcements
+ENDPOINT = "https://graph.microsoft.com/beta/admin/serviceAnnouncement/messages?$top=1000"
+
+# Ids of the rows the notification test helpers insert; never synced from Graph
+TEST_ID_PREFIX = "test-"
+
+# Sync state key and how often an incremental sync is replaced by a full reconciliation
+SYNC_DATA_TYPE = "message_center"
+FULL_SYNC_INTERVAL = timedelta(hours=float(os.getenv('MESSAGE_CENTER_FULL_SYNC_HOURS', '24')))
+
+def needs_full_sync(sync_state):
+    """Check whether the next run must fetch the full message history."""
+    if not sync_state["watermark"] or not sync_state["last_full_sync"]:
+        return True
+    try:
+        last_full_sync = datetime.fromisoformat(sync_state["last_full_sync"])
+    except ValueError:
+        return True
+    return datetime.now() - last_full_sync >= FULL_SYNC_INTERVAL
+
+def advance_watermark(watermark, messages):
+    """Get the later of a watermark and the newest lastModifiedDateTime in messages.
+    
+    Taken from Graph's responses rather than from the updates table, which
+    also holds the notification test rows written with the current time.
+    Returns a Graph filter literal.
+    """
+    latest = parse_datetime_utc(watermark) if watermark else None
+    for message in messages:
+        modified = parse_datetime_utc(message.get("lastModifiedDateTime"))
+        if modified and (latest is None or modified > latest):
+            latest = modified
+    return latest.strftime("%Y-%m-%dT%H:%M:%SZ") if latest else None
+
+def load_checkpoint(sync_state):
+    """Get the page checkpoint left by an interrupted run, or None."""
+    if not sync_state["sync_cursor"]:
+        return None
+    try:
+        checkpoint = json.loads(sync_state["sync_cursor"])
+    except ValueError:
+        return None
+    return checkpoint if checkpoint.get("next_link") else None
+
+def build_update_rows(tenant_id, message):
+    """Build the updates table rows for one message center announcement.
+    
+    Each platform-status combination in FeatureStatusJson shares the message
+    id; the last one is kept when rows are merged.
+    """
+    rows = []
+    
+    # Default values for missing fields
+    announcement_data = {
+        "id": message.get("id", ""),
+        "title": message.get("title", ""),
+        "category": message.get("category", ""),
+        "severity": message.get("severity", ""),
+        "startDateTime": message.get("startDateTime", ""),
+        "lastModifiedDateTime": message.get("lastModifiedDateTime", ""),
+        "isMajorChange": message.get("isMajorChange", False),
+        "actionRequiredByDateTime": message.get("actionRequiredByDateTime", ""),
+        "services": ", ".join(message.get("services", [])) if message.get("services") else "",
+        "hasAttachments": message.get("hasAttachments", False),
+        "roadmapId": "",
+        "platform": "",
+        "status": "",
+        "lastUpdateTime": "",
+        "bodyContent": message.get("body", {}).get("content", "No content"),
+        "tags": message.get("tags", [])
+    }
+    
+    # Extract additional details if available
+    for detail in message.get("details", []):
+        if detail["name"] == "RoadmapIds":
+            announcement_data["roadmapId"] = detail["value"]
+        if detail["name"] == "FeatureStatusJson":
+            try:
+                feature_status_json = json.loads(detail["value"])
+                for roadmap_id, roadmap_data in feature_status_json.items():
+                    for feature in roadmap_data:
+                        announcement_data["platform"] = feature.get("Platform", "")
+                        announcement_data["status"] = feature.get("Status", "")
+                        announcement_data["lastUpdateTime"] = feature.get("LastUpdateTime", "")
+                        rows.append(build_update_row(tenant_id, announcement_data))
+            except json.JSONDecodeError:
+                print(f"Error decoding FeatureStatusJson for message ID: {message.get('id', 'N/A')}")
+                # Insert the message anyway without the feature status data
+                rows.append(build_update_row(tenant_id, announcement_data))
+    
+    # Insert the base message even if FeatureStatusJson is missing
+    if not any(detail["name"] == "FeatureStatusJson" for detail in message.get("details", [])):
+        rows.append(build_update_row(tenant_id, announcement_data))
+    
+    return rows
+
+def build_update_row(tenant_id, data):
+    """Build an updates table row from announcement data."""
+    # Transform isMajorChange to "MajorChange" or "Not MajorChange"
+    is_major_change = "MajorChange" if data.get("isMajorChange", False) else "Not MajorChange"
+    
+    return {
+        "tenant_id": tenant_id,
+        "id": data.get("id", ""),
+        "title": data.get("title", ""),
+        "category": data.get("category", ""),
+        "severity": data.get("severity", ""),
+        "startDateTime": data.get("startDateTime", ""),
+        "lastModifiedDateTime": data.get("lastModifiedDateTime", ""),
+        "isMajorChange": is_major_change,
+        "actionRequiredByDateTime": data.get("actionRequiredByDateTime", ""),
+        "services": data.get("services", ""),
+        "hasAttachments": data.get("hasAttachments", False),
+        "roadmapId": data.get("roadmapId", ""),
+        "platform": data.get("platform", ""),
+        "status": data.get("status", ""),
+        "lastUpdateTime": data.get("lastUpdateTime", ""),
+        "bodyContent": data.get("bodyContent", ""),
+        "tags": ", ".join(data.get("tags", [])) if data.get("tags") else "",
+        "startDateTime_utc": parse_datetime_utc(data.get("startDateTime")),
+        "lastModifiedDateTime_utc": parse_datetime_utc(data.get("lastModifiedDateTime")),
+        "actionRequiredByDateTime_utc": parse_datetime_utc(data.get("actionRequiredByDateTime"))
+    }
+
+def start_url(sync_state, full_sync):
+    """Get the first page URL for a full or incremental sync."""
+    if full_sync:
+        print("Running full message center sync")
+        return ENDPOINT
+    filter_expression = quote(f"lastModifiedDateTime ge {sync_state['watermark']}")
+    print(f"Running incremental message center sync since {sync_state['watermark']}")
+    return f"{ENDPOINT}&$filter={filter_expression}"
+
+def fetch_message_center(tenant, force_full_sync=False):
+    """Fetch data for a specific tenant using their credentials.
+    
+    After the first run only messages modified since the stored watermark are
+    requested. A full sync, which also removes messages that no longer exist,
+    runs when there is no watermark, when it is forced, or once every
+    MESSAGE_CENTER_FULL_SYNC_HOURS.
+    
+    Each page is stored in its own transaction together with a checkpoint
+    holding the next page link, so only one page is held in memory and a run
+    that fails part way resumes from the last stored page.
+    """
+    tenant_name = tenant["name"]
+    tenant_id = tenant["tenantId"]
+
+    print(f"Processing tenant: {tenant_name} (ID: {tenant_id})")
+    
+    # Get access token
+    token = get_tenant_access_token(tenant)
+    if not token:
+        print(f"Failed to get access token for tenant: {tenant_name}")
+        return False
+    
+    # Ensure the tenant's tables exist
+    if not ensure_tenant_tables_exist(tenant["id"], 'm365'):
+        print(f"Failed to initialize database for tenant: {tenant_name}")
+        return False
+    
+    conn, updates_table = get_tenant_table_connection(tenant["id"], 'updates', 'm365')
+    if not conn or not updates_table:
+        print(f"Failed to get database connection for tenant {tenant['id']}")
+        return False
+
+    headers = {
+        "Content-Type": "application/json",
+        "Prefer": "odata.maxpagesize=1000"
+    }
+
+    try:
+        # Resume an interrupted run, or decide between an incremental and a full sync
+        sync_state = get_sync_state(tenant["id"], SYNC_DATA_TYPE)
+        checkpoint = None if force_full_sync else load_checkpoint(sync_state)
+        # Advanced from each stored page and checkpointed with it, so pages
+        # stored by an interrupted run are accounted for when it resumes
+        watermark = sync_state["watermark"]
+        if checkpoint:
+            full_sync = checkpoint.get("full_sync", False)
+            url = checkpoint["next_link"]
+            watermark = checkpoint.get("watermark") or watermark
+            print(f"Resuming {'full' if full_sync else 'incremental'} message center sync from the last stored page")
+        else:
+            full_sync = force_full_sync or needs_full_sync(sync_state)
+            url = start_url(sync_state, full_sync)
+
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        seen_ids = set()
+        pages = 0
+
+        def store_page(messages, next_link):
+            """Upsert one page of messages and checkpoint the next page link in one transaction."""
+            nonlocal watermark
+            page_watermark = advance_watermark(watermark, messages)
+            rows = []
+            for message in messages:
+                rows.extend(build_update_rows(tenant["id"], message))
+
+            try:
+                # Rows whose content hash matches the stored one are not sent at all
+                page_counts = bulk_merge(conn, updates_table, UPDATE_KEY_COLUMNS, UPDATE_COLUMNS, rows,
+                                         hash_column="content_hash", scope=("tenant_id", tenant["id"]))
+                if next_link:
+                    save_sync_state(tenant["id"], SYNC_DATA_TYPE, conn=conn, sync_cursor=json.dumps({
+                        "next_link": next_link,
+                        "full_sync": full_sync,
+                        "watermark": page_watermark
+                    }))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            watermark = page_watermark
+
+            for key in ("inserted", "updated", "unchanged"):
+                counts[key] += page_counts[key]
+
+        def finish_sync(resumed):
+            """Advance the watermark, reconcile deletions and clear the checkpoint."""
+            state = {"sync_cursor": None, "watermark": watermark}
+            try:
+                if full_sync and resumed:
+                    # Deletions need every id of the run and a resumed run only saw part of them
+                    print("Skipping deletions for a resumed full sync; the next run will reconcile")
+                elif full_sync:
+                    # Drop messages that no longer exist; an empty response is not trusted for this
+                    if seen_ids:
+                        counts["deleted"] = delete_missing(conn, updates_table, "tenant_id", tenant["id"], "id", seen_ids,
+                                                           keep_prefix=TEST_ID_PREFIX)
+                    state["last_full_sync"] = datetime.now().isoformat()
+                state["changed_count"] = counts["inserted"] + counts["updated"] + counts["deleted"]
+                state["unchanged_count"] = counts["unchanged"]
+                save_sync_state(tenant["id"], SYNC_DATA_TYPE, conn=conn, **state)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        def run(url, resumed):
+            nonlocal pages
+            for page in get_graph_client().iter_pages(url, token=token, headers=headers):
+                messages = page.get("value", [])
+                seen_ids.update(message.get("id", "") for message in messages)
+                store_page(messages, page.get("@odata.nextLink"))
+                pages += 1
+                print(f"Stored page {pages}: {len(messages)} messages")
+                report_progress(pages=pages, messages=len(seen_ids), inserted=counts["inserted"],
+                                updated=counts["updated"], unchanged=counts["unchanged"])
+            finish_sync(resumed)
+
+        try:
+            run(url, checkpoint is not None)
+        except GraphRequestError as e:
+            # Page links expire; start over when a checkpoint can no longer be followed
+            if not checkpoint or pages or e.status_code not in (400, 404, 410):
+                raise
+            print(f"Checkpoint rejected with HTTP {e.status_code}; starting a new sync")
+            full_sync = force_full_sync or needs_full_sync(sync_state)
+            run(start_url(sync_state, full_sync), False)
+
+        report_progress(pages=pages, messages=len(seen_ids), **counts)
+        print(f"Stored updates: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged, {counts['deleted']} deleted")
+        print(f"Completed processing for tenant: {tenant_name}")
+        return True
+
+    except Exception as e:
+        print(f"Error processing tenant {tenant_name}: {e}")
+        return False
+    finally:
+        conn.close()
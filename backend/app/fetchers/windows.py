@@ -0,0 +1,327 @@
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ..database import get_tenant_registry, get_tenant_table_connection, ensure_tenant_tables_exist, get_table_manager
+from ..date_utils import parse_datetime_utc
+from ..bulk_upsert import bulk_merge
+from ..graph_client import get_graph_client, GraphRequestError
+from ..token_cache import get_tenant_access_token
+from ..sync_state import save_sync_state
+from ..azure_db_config import GLOBAL_TABLE_NAMES, CATALOG_COLUMNS
+from ..global_catalog import ensure_catalog_tables, catalog_lock, get_stale_products, mark_products_refreshed
+from ..fetch_jobs import report_progress
+
+# Columns written to the tenant's products table, keyed by (tenant_id, id)
+PRODUCT_COLUMNS = ["tenant_id", "id", "name", "group_name", "friendly_names"]
+# Products and known issues are the same for every tenant and stored once, keyed by id
+CATALOG_PRODUCT_COLUMNS = ["id", "name", "group_name", "friendly_names"]
+KNOWN_ISSUE_COLUMNS = CATALOG_COLUMNS["windows_known_issues"]
+
+# Sync state key the change counts of each run are recorded under
+SYNC_DATA_TYPE = "windows_updates"
+# Lock key the shared products and known issues are refreshed under
+CATALOG_DATA_TYPE = "windows_known_issues"
+
+# Known issue requests in flight per tenant; 1 fetches products one after another
+KNOWN_ISSUES_CONCURRENCY = max(1, int(os.getenv('WINDOWS_KNOWN_ISSUES_CONCURRENCY', '4')))
+
+# Known issue rows buffered before they are stored and committed
+KNOWN_ISSUES_STORE_BATCH = 1000
+
+# Marks a product whose fetch was put off because Graph is throttling the tenant
+_DEFERRED = object()
+
+def get_tenant_connection_and_tables(tenant_id):
+    """Get tenant database connection and table names for Windows updates."""
+    # Find the tenant
+    tenant = get_tenant_registry().get(tenant_id)
+    
+    if not tenant:
+        print(f"Error: No tenant found with ID {tenant_id}")
+        return None, None, None, None
+    
+    # Convert to dictionary for easier access
+    tenant_dict = tenant.to_dict()
+    
+    # Ensure tenant tables exist
+    table_exists = ensure_tenant_tables_exist(tenant_dict['id'], 'm365')
+    if not table_exists:
+        print(f"Failed to ensure tables exist for tenant: {tenant_dict['name']} (ID: {tenant_id})")
+        return None, None, None, None
+    
+    # Get connections for both products and issues tables
+    conn, issues_table = get_tenant_table_connection(tenant_dict['id'], 'windows_known_issues', 'm365')
+    
+    # Generate products table name manually since it's not in the standard list
+    table_manager = get_table_manager()
+    products_table = table_manager.get_table_name(tenant_dict['name'], 'windows_products')
+    
+    return conn, issues_table, products_table, tenant_dict
+
+def fetch_windows_products(token):
+    """Fetch all Windows products from the Microsoft Graph API."""
+    endpoint = "https://graph.microsoft.com/beta/admin/windows/updates/products"
+    
+    try:
+        return get_graph_client().get_all(endpoint, token=token)
+    except GraphRequestError as e:
+        print(f"Error fetching Windows products: {e}")
+        return None
+
+def _get_known_issues(token, product_id):
+    endpoint = f"https://graph.microsoft.com/beta/admin/windows/updates/products/{product_id}/knownIssues"
+    return get_graph_client().get_all(endpoint, token=token)
+
+def fetch_known_issues_for_product(token, product_id):
+    """Fetch known issues for a specific Windows product."""
+    try:
+        return _get_known_issues(token, product_id)
+    except GraphRequestError as e:
+        print(f"Error fetching known issues for product {product_id}: {e}")
+        return None
+
+def fetch_known_issues(token, product_ids, max_workers=None):
+    """Fetch known issues for many products on a bounded thread pool.
+    
+    Yields (product_id, issues) as each product completes; issues is None if
+    the fetch failed. Once a request is still throttled after the Graph
+    client's retries, the remaining products are fetched one at a time after
+    the pool drains, so a throttled tenant falls back to the sequential fetch
+    instead of losing data.
+    """
+    max_workers = min(max_workers or KNOWN_ISSUES_CONCURRENCY, max(len(product_ids), 1))
+    throttled = threading.Event()
+    
+    def fetch(product_id):
+        if throttled.is_set():
+            return product_id, _DEFERRED
+        try:
+            return product_id, _get_known_issues(token, product_id)
+        except GraphRequestError as e:
+            if e.status_code == 429:
+                throttled.set()
+                return product_id, _DEFERRED
+            print(f"Error fetching known issues for product {product_id}: {e}")
+            return product_id, None
+    
+    deferred = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch, product_id) for product_id in product_ids]
+        for future in as_completed(futures):
+            product_id, known_issues = future.result()
+            if known_issues is _DEFERRED:
+                deferred.append(product_id)
+            else:
+                yield product_id, known_issues
+    
+    if deferred:
+        print(f"Graph is throttling known issue requests; fetching {len(deferred)} remaining products sequentially")
+        for product_id in deferred:
+            yield product_id, fetch_known_issues_for_product(token, product_id)
+
+def store_windows_products(conn, table_name, tenant_id, products):
+    """Upsert changed Windows products in the Azure SQL database.
+    
+    Returns inserted/updated/unchanged counts; the caller commits.
+    """
+    rows = [{
+        "tenant_id": tenant_id,
+        "id": product.get("id"),
+        "name": product.get("name"),
+        "group_name": product.get("groupName"),
+        "friendly_names": ", ".join(product.get("friendlyNames", []))
+    } for product in products]
+    
+    # The tenant's table records which products it has; names are in the catalog
+    return bulk_merge(conn, table_name, ["tenant_id", "id"], PRODUCT_COLUMNS, rows,
+                      hash_column="content_hash", scope=("tenant_id", tenant_id))
+
+def store_catalog_products(conn, products):
+    """Upsert changed Windows products in the global products table; the caller commits."""
+    rows = [{
+        "id": product.get("id"),
+        "name": product.get("name"),
+        "group_name": product.get("groupName"),
+        "friendly_names": ", ".join(product.get("friendlyNames", []))
+    } for product in products]
+    return bulk_merge(conn, GLOBAL_TABLE_NAMES["windows_products"], ["id"], CATALOG_PRODUCT_COLUMNS, rows,
+                      hash_column="content_hash")
+
+def build_known_issue_rows(product_id, known_issues):
+    """Build global known issue table rows for a product."""
+    return [{
+        "id": issue.get("id"),
+        "product_id": product_id,
+        "title": issue.get("title"),
+        "description": issue.get("description"),
+        "status": issue.get("status"),
+        "start_date": issue.get("startDateTime"),
+        "resolved_date": issue.get("resolvedDateTime"),
+        "web_view_url": issue.get("webViewUrl"),
+        "start_date_utc": parse_datetime_utc(issue.get("startDateTime")),
+        "resolved_date_utc": parse_datetime_utc(issue.get("resolvedDateTime"))
+    } for issue in known_issues]
+
+def store_known_issues(conn, issue_rows):
+    """Upsert changed known issue rows in the global known issues table.
+    
+    Returns inserted/updated/unchanged counts; the caller commits.
+    """
+    return bulk_merge(conn, GLOBAL_TABLE_NAMES["windows_known_issues"], ["id"], KNOWN_ISSUE_COLUMNS, issue_rows,
+                      hash_column="content_hash")
+
+def refresh_catalog(conn, token, products):
+    """Update the shared products and fetch known issues for the stale ones.
+    
+    Runs under the catalog lock and commits before releasing it, so tenants
+    fetching at the same time don't download the same issues twice or MERGE
+    the same global rows at once; the next tenant finds the products fresh.
+    Only products no tenant refreshed within the catalog refresh interval are
+    fetched. Issues are stored in batches as products complete, so memory
+    stays bounded and a late failure keeps the products already stored.
+    Returns the known issue inserted/updated/unchanged counts.
+    """
+    issue_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    ensure_catalog_tables()
+    with catalog_lock(CATALOG_DATA_TYPE) as locked:
+        if not locked:
+            return issue_counts
+        
+        try:
+            store_catalog_products(conn, products)
+            conn.commit()
+            
+            issue_rows = []
+            refreshed_ids = []
+            refreshed_count = 0
+            issue_count = 0
+            
+            def flush():
+                """Store the buffered issues and mark their products refreshed in one transaction."""
+                counts = store_known_issues(conn, issue_rows)
+                mark_products_refreshed(conn, refreshed_ids)
+                conn.commit()
+                for key in issue_counts:
+                    issue_counts[key] += counts[key]
+                issue_rows.clear()
+                refreshed_ids.clear()
+            
+            product_ids = [product.get("id") for product in products]
+            stale_ids = get_stale_products(conn, product_ids)
+            print(f"Known issues are current for {len(product_ids) - len(stale_ids)} products; fetching {len(stale_ids)}")
+            report_progress(products=len(product_ids), productsToRefresh=len(stale_ids), productsRefreshed=0)
+            for product_id, known_issues in fetch_known_issues(token, stale_ids):
+                if known_issues is not None:
+                    print(f"Retrieved {len(known_issues)} known issues for product {product_id}")
+                    issue_rows.extend(build_known_issue_rows(product_id, known_issues))
+                    refreshed_ids.append(product_id)
+                    refreshed_count += 1
+                    issue_count += len(known_issues)
+                    report_progress(productsRefreshed=refreshed_count, knownIssues=issue_count)
+                    if len(issue_rows) >= KNOWN_ISSUES_STORE_BATCH:
+                        flush()
+                else:
+                    print(f"No known issues retrieved for product {product_id}")
+            
+            if refreshed_ids:
+                flush()
+        except Exception as e:
+            print(f"Error refreshing the Windows catalog: {e}")
+            conn.rollback()
+            raise
+    
+    report_progress(issuesInserted=issue_counts["inserted"], issuesUpdated=issue_counts["updated"],
+                    issuesUnchanged=issue_counts["unchanged"])
+    return issue_counts
+
+def fix_numpy_pandas_compatibility():
+    """Fix numpy/pandas compatibility issues by reinstalling packages."""
+    try:
+        print("Attempting to fix numpy/pandas compatibility issues...")
+        try:
+            import pandas
+            print("Pandas imported successfully, no fix needed.")
+            return True
+        except ValueError as e:
+            if "numpy.dtype size changed" in str(e):
+                print("NumPy and pandas version incompatibility detected.")
+                print("Reinstalling numpy and pandas...")
+                
+                import subprocess
+                import sys
+                
+                subprocess.check_call([sys.executable, "-m", "pip", "install", "--force-reinstall", "numpy"])
+                subprocess.check_call([sys.executable, "-m", "pip", "install", "--force-reinstall", "pandas"])
+                print("Successfully reinstalled numpy and pandas")
+                return True
+            else:
+                print(f"Unexpected pandas import error: {e}")
+                return False
+        except Exception as e:
+            print(f"Error importing pandas: {e}")
+            return False
+    except Exception as e:
+        print(f"Error fixing numpy/pandas compatibility: {e}")
+        return False
+
+def fetch_windows(tenant, fix_compatibility=False):
+    """Fetch Windows update data for a specific tenant."""
+    # Fix numpy/pandas compatibility if requested
+    if fix_compatibility:
+        fix_numpy_pandas_compatibility()
+    
+    # Get tenant connection and table names
+    conn, issues_table, products_table, tenant = get_tenant_connection_and_tables(tenant["id"])
+    if not conn or not tenant:
+        print("Failed to get database connection for tenant")
+        return False
+    
+    tenant_name = tenant["name"]
+    print(f"Processing tenant: {tenant_name} (ID: {tenant['tenantId']})")
+    
+    try:
+        # Get access token
+        token = get_tenant_access_token(tenant)
+        if not token:
+            print(f"Failed to get access token for tenant: {tenant_name}")
+            return False
+        
+        # Step 1: Fetch all Windows products
+        products = fetch_windows_products(token)
+        if products is None:
+            print("No products retrieved or error occurred.")
+            return False
+        
+        print(f"Retrieved {len(products)} Windows products")
+        
+        # Step 2: Refresh the shared catalog
+        issue_counts = refresh_catalog(conn, token, products)
+        
+        # Step 3: Store the tenant's products
+        try:
+            product_counts = store_windows_products(conn, products_table, tenant["id"], products)
+            save_sync_state(
+                tenant["id"], SYNC_DATA_TYPE, conn=conn,
+                changed_count=sum(counts["inserted"] + counts["updated"] for counts in (product_counts, issue_counts)),
+                unchanged_count=product_counts["unchanged"] + issue_counts["unchanged"]
+            )
+            conn.commit()
+        except Exception as e:
+            print(f"Error storing Windows data for tenant {tenant_name}: {e}")
+            conn.rollback()
+            raise
+        
+        print(f"Stored products: {product_counts['inserted']} inserted, {product_counts['updated']} updated, {product_counts['unchanged']} unchanged")
+        print(f"Stored known issues: {issue_counts['inserted']} inserted, {issue_counts['updated']} updated, {issue_counts['unchanged']} unchanged")
+        
+        conn.close()
+        print(f"Completed processing for tenant: {tenant_name}")
+        return True
+        
+    except Exception as e:
+        print(f"Error processing tenant {tenant_name}: {e}")
+        if conn:
+            conn.close()
+        return False
@@ -0,0 +1,117 @@
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from typing import List, Sequence
+
+from .database import get_db_connection
+from .azure_db_config import GLOBAL_TABLE_NAMES, create_global_catalog_tables
+from .sync_state import get_sync_state, save_sync_state
+from .fetch_lock import fetch_lock, FetchLockTimeout
+
+# How long fetched catalog data is reused before the next fetch refreshes it
+CATALOG_REFRESH_INTERVAL = timedelta(minutes=float(os.getenv('CATALOG_REFRESH_MINUTES', '60')))
+
+# sync_state tenant key for catalog data; tenant ids never contain '*'
+GLOBAL_CATALOG_KEY = "*global*"
+
+_tables_ready = False
+_tables_lock = threading.Lock()
+
+def ensure_catalog_tables():
+    """Create the global catalog tables once per process."""
+    global _tables_ready
+    if _tables_ready:
+        return
+
+    with _tables_lock:
+        if _tables_ready:
+            return
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            create_global_catalog_tables(cursor)
+            conn.commit()
+            _tables_ready = True
+        except Exception as e:
+            print(f"Error creating global catalog tables: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+@contextmanager
+def catalog_lock(data_type: str):
+    """Serialize refreshes of one catalog across tenants, instances and CLI runs.
+    
+    Fetch locks are per tenant, so without this two tenants' fetches would
+    both refresh the shared rows at once. Yields True once the caller holds
+    the lock; check freshness inside it, since a refresh may have finished
+    while waiting. Yields False if another refresh held it past
+    FETCH_LOCK_WAIT_SECONDS, and the caller uses the catalog as it is.
+    """
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(fetch_lock(GLOBAL_CATALOG_KEY, data_type))
+        except FetchLockTimeout as e:
+            print(f"Skipping the {data_type} catalog refresh: {e}")
+            yield False
+            return
+        yield True
+
+def catalog_is_fresh(data_type: str) -> bool:
+    """Check whether a catalog was refreshed within CATALOG_REFRESH_INTERVAL."""
+    refreshed = get_sync_state(GLOBAL_CATALOG_KEY, data_type)["last_full_sync"]
+    if not refreshed:
+        return False
+    try:
+        return datetime.now() - datetime.fromisoformat(refreshed) < CATALOG_REFRESH_INTERVAL
+    except ValueError:
+        return False
+
+def mark_catalog_refreshed(conn, data_type: str, changed_count: int, unchanged_count: int):
+    """Record a catalog refresh inside the caller's transaction."""
+    save_sync_state(
+        GLOBAL_CATALOG_KEY, data_type, conn=conn,
+        last_full_sync=datetime.now().isoformat(),
+        changed_count=changed_count,
+        unchanged_count=unchanged_count
+    )
+
+def get_stale_products(conn, product_ids: Sequence[str]) -> List[str]:
+    """Get the products whose known issues are missing or older than the refresh interval."""
+    ensure_catalog_tables()
+    if not product_ids:
+        return []
+
+    cursor = conn.cursor()
+    try:
+        fresh = set()
+        cutoff = datetime.utcnow() - CATALOG_REFRESH_INTERVAL
+        product_ids = list(dict.fromkeys(product_ids))
+        for start in range(0, len(product_ids), 1000):
+            chunk = product_ids[start:start + 1000]
+            cursor.execute(f'''
+                SELECT id FROM {GLOBAL_TABLE_NAMES["windows_products"]}
+                WHERE issues_refreshed_at >= ? AND id IN ({", ".join("?" for _ in chunk)})
+            ''', [cutoff] + chunk)
+            fresh.update(row[0] for row in cursor.fetchall())
+        return [product_id for product_id in product_ids if product_id not in fresh]
+    finally:
+        cursor.close()
+
+def mark_products_refreshed(conn, product_ids: Sequence[str]):
+    """Record that the known issues of these products were just fetched; the caller commits."""
+    if not product_ids:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.fast_executemany = True
+        cursor.executemany(
+            f'UPDATE {GLOBAL_TABLE_NAMES["windows_products"]} SET issues_refreshed_at = SYSUTCDATETIME() WHERE id = ?',
+            [(product_id,) for product_id in product_ids]
+        )
+    finally:
+        cursor.close()
@@ -0,0 +1,337 @@
+import os
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Iterator, List
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GRAPH_BASE_URL = "https://graph.microsoft.com"
+
+# Status codes worth retrying: throttling and transient server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Methods that are safe to send again after a timeout or server error
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Graph accepts at most 20 sub-requests per JSON $batch call
+BATCH_MAX_REQUESTS = 20
+
+def default_pool_size() -> int:
+    """Keep-alive connections per host, from GRAPH_HTTP_POOL_SIZE or the fetch concurrency.
+
+    Every fetch worker can run WINDOWS_KNOWN_ISSUES_CONCURRENCY requests at
+    once; the settings are read from the environment rather than imported
+    so the fetch modules can keep importing this one.
+    """
+    if os.getenv('GRAPH_HTTP_POOL_SIZE'):
+        return int(os.getenv('GRAPH_HTTP_POOL_SIZE'))
+    workers = max(1, int(os.getenv('FETCH_WORKERS', '4')))
+    per_fetch = max(1, int(os.getenv('WINDOWS_KNOWN_ISSUES_CONCURRENCY', '4')))
+    return max(10, workers * per_fetch)
+
+class GraphRequestError(Exception):
+    """Raised when a request still fails after all retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response: Optional[requests.Response] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+class GraphClient:
+    """Shared HTTP client for Microsoft Graph and other upstream feeds.
+
+    Uses one pooled keep-alive session with gzip, applies a timeout to every
+    call and retries throttled or failed requests with exponential backoff,
+    honouring Retry-After. Latency and retry counts are kept per endpoint.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 backoff_base: Optional[float] = None, backoff_max: Optional[float] = None,
+                 pool_size: Optional[int] = None):
+        self.timeout = timeout if timeout is not None else float(os.getenv('GRAPH_HTTP_TIMEOUT', '30'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GRAPH_MAX_RETRIES', '5'))
+        self.backoff_base = backoff_base if backoff_base is not None else float(os.getenv('GRAPH_BACKOFF_BASE', '1'))
+        self.backoff_max = backoff_max if backoff_max is not None else float(os.getenv('GRAPH_BACKOFF_MAX', '60'))
+        self.pool_size = pool_size if pool_size is not None else default_pool_size()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+                    self._session = session
+        return self._session
+
+    @staticmethod
+    def endpoint_key(method: str, url: str) -> str:
+        """Group URLs by endpoint, replacing ids in the path with {id}."""
+        parsed = urlparse(url)
+        segments = []
+        for segment in parsed.path.split("/"):
+            if re.match(r"^v\d+(\.\d+)?$", segment):
+                segments.append(segment)
+            elif "@" in segment or re.search(r"\d", segment):
+                segments.append("{id}")
+            else:
+                segments.append(segment)
+        return f"{method.upper()} {parsed.netloc}{'/'.join(segments)}"
+
+    def _record(self, endpoint: str, elapsed: float, retries: int, failed: bool):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, {
+                "requests": 0, "retries": 0, "failures": 0,
+                "total_seconds": 0.0, "max_seconds": 0.0
+            })
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["failures"] += 1 if failed else 0
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt, from Retry-After when given."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return min(max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        # Exponential backoff with jitter
+        return min(self.backoff_base * (2 ** attempt), self.backoff_max) * random.uniform(0.5, 1.0)
+
+    def request(self, method: str, url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                timeout: Optional[float] = None, deadline: Optional[float] = None, retry: Optional[bool] = None,
+                **kwargs) -> requests.Response:
+        """Send a request, retrying throttling and transient failures.
+
+        Idempotent methods are retried after timeouts, connection errors and
+        retryable statuses. Other methods, such as a POST that sends mail, may
+        already have been processed, so they are only retried when the
+        connection was never made or a 429 carries Retry-After; pass
+        retry=True for requests that are safe to repeat, or retry=False to
+        never retry. deadline bounds the whole call including retries, in
+        seconds. Returns the final response, which may still be an error
+        status; raises GraphRequestError when retries or the deadline run out.
+        """
+        request_headers = dict(headers or {})
+        if token:
+            request_headers["Authorization"] = f"Bearer {token}"
+        timeout = timeout if timeout is not None else self.timeout
+        retry_failures = method.upper() in IDEMPOTENT_METHODS if retry is None else retry
+
+        endpoint = self.endpoint_key(method, url)
+        started = time.monotonic()
+        give_up_at = started + deadline if deadline else None
+        attempt = 0
+
+        while True:
+            response = None
+            error = None
+            try:
+                response = self.session.request(method, url, headers=request_headers, timeout=timeout, **kwargs)
+                # Throttling with Retry-After means the request wasn't processed
+                throttled = response.status_code == 429 and "Retry-After" in response.headers
+                may_retry = retry_failures or (throttled and retry is not False)
+                if response.status_code not in RETRY_STATUS_CODES or not may_retry:
+                    self._record(endpoint, time.monotonic() - started, attempt, response.status_code >= 400)
+                    return response
+                error = f"HTTP {response.status_code}"
+            except requests.exceptions.ConnectTimeout as e:
+                # The request never reached the server
+                if retry is False:
+                    self._record(endpoint, time.monotonic() - started, attempt, True)
+                    raise GraphRequestError(f"{method.upper()} {url} failed: {e}")
+                error = str(e)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not retry_failures:
+                    self._record(endpoint, time.monotonic() - started, attempt, True)
+                    raise GraphRequestError(f"{method.upper()} {url} failed and was not retried, "
+                                            f"since the server may have processed it: {e}")
+                error = str(e)
+
+            delay = self._retry_delay(attempt, response.headers.get("Retry-After") if response is not None else None)
+            out_of_time = give_up_at is not None and time.monotonic() + delay > give_up_at
+            if attempt >= self.max_retries or out_of_time:
+                self._record(endpoint, time.monotonic() - started, attempt, True)
+                raise GraphRequestError(
+                    f"{method.upper()} {url} failed after {attempt + 1} attempts: {error}",
+                    status_code=response.status_code if response is not None else None,
+                    response=response
+                )
+
+            print(f"Retrying {endpoint} in {delay:.1f}s after {error} (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_json(self, url: str, **kwargs) -> Dict[str, Any]:
+        """GET a URL and return the decoded JSON body, raising on error status."""
+        response = self.get(url, **kwargs)
+        if response.status_code >= 400:
+            raise GraphRequestError(
+                f"GET {url} failed with HTTP {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+                response=response
+            )
+        return response.json()
+
+    def iter_pages(self, url: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Yield each page of a paged Graph collection, following @odata.nextLink.
+
+        A page that still fails after retries raises instead of silently
+        ending the collection early.
+        """
+        while url:
+            page = self.get_json(url, **kwargs)
+            yield page
+            url = page.get("@odata.nextLink")
+
+    def get_all(self, url: str, **kwargs) -> list:
+        """Get every item of a paged Graph collection."""
+        items = []
+        for page in self.iter_pages(url, **kwargs):
+            items.extend(page.get("value", []))
+        return items
+
+    def batch(self, requests_by_id: Dict[str, str], token: Optional[str] = None,
+              version: str = "v1.0") -> Dict[str, Dict[str, Any]]:
+        """Send GET sub-requests through JSON $batch calls of up to 20 each.
+        
+        requests_by_id maps a caller-chosen id to a URL relative to the API
+        version, e.g. "/directoryRoles/{id}/members". Returns each id's
+        sub-response as {"status", "headers", "body"}. Throttled or failed
+        sub-requests are retried in later batches on their own; any still
+        failing after max_retries keep their last error response.
+        """
+        batch_url = f"{GRAPH_BASE_URL}/{version}/$batch"
+        pending = dict(requests_by_id)
+        results: Dict[str, Dict[str, Any]] = {}
+        attempt = 0
+        
+        while pending:
+            retry = {}
+            retry_after = None
+            ids = list(pending)
+            for start in range(0, len(ids), BATCH_MAX_REQUESTS):
+                chunk = ids[start:start + BATCH_MAX_REQUESTS]
+                # Every sub-request is a GET, so the batch call is safe to repeat
+                response = self.post(batch_url, token=token, retry=True, json={
+                    "requests": [{"id": request_id, "method": "GET", "url": pending[request_id]} for request_id in chunk]
+                })
+                if response.status_code >= 400:
+                    raise GraphRequestError(
+                        f"POST {batch_url} failed with HTTP {response.status_code}: {response.text[:500]}",
+                        status_code=response.status_code,
+                        response=response
+                    )
+                
+                # Sub-responses come back in any order; match them up by id
+                answered = set()
+                for item in response.json().get("responses", []):
+                    request_id = item.get("id")
+                    if request_id not in chunk or request_id in answered:
+                        continue
+                    answered.add(request_id)
+                    results[request_id] = {
+                        "status": item.get("status"),
+                        "headers": item.get("headers") or {},
+                        "body": item.get("body")
+                    }
+                    if item.get("status") in RETRY_STATUS_CODES:
+                        retry[request_id] = pending[request_id]
+                        retry_after = retry_after or results[request_id]["headers"].get("Retry-After")
+                
+                # A sub-request missing from this response is retried like a failed one
+                for request_id in chunk:
+                    if request_id not in answered:
+                        retry[request_id] = pending[request_id]
+            
+            if not retry or attempt >= self.max_retries:
+                break
+            delay = self._retry_delay(attempt, retry_after)
+            print(f"Retrying {len(retry)} of {len(pending)} batched requests in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            pending = retry
+            attempt += 1
+        
+        return results
+    
+    def batch_get_all(self, urls_by_id: Dict[str, str], token: Optional[str] = None,
+                      version: str = "v1.0") -> Dict[str, Optional[List[Dict[str, Any]]]]:
+        """Get every item of many paged collections, batching the first pages.
+        
+        Further pages of a collection are followed with plain GETs. An id maps
+        to None when its collection could not be fetched.
+        """
+        items_by_id: Dict[str, Optional[List[Dict[str, Any]]]] = {}
+        for request_id, result in self.batch(urls_by_id, token=token, version=version).items():
+            status = result["status"] or 0
+            if status >= 400:
+                print(f"Batched request {urls_by_id[request_id]} failed with HTTP {status}")
+                items_by_id[request_id] = None
+                continue
+            body = result["body"] or {}
+            items = list(body.get("value", []))
+            next_link = body.get("@odata.nextLink")
+            if next_link:
+                items.extend(self.get_all(next_link, token=token))
+            items_by_id[request_id] = items
+        for request_id in urls_by_id:
+            items_by_id.setdefault(request_id, None)
+        return items_by_id
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-endpoint request, retry and latency counters."""
+        with self._stats_lock:
+            result = {}
+            for endpoint, stats in self._stats.items():
+                result[endpoint] = dict(stats)
+                result[endpoint]["avg_seconds"] = stats["total_seconds"] / stats["requests"] if stats["requests"] else 0.0
+            return result
+
+    def log_stats(self):
+        """Print the per-endpoint counters accumulated since the client was created.
+
+        Concurrent fetches share the client, so these are process totals: the
+        fetch scripts print them on exit, and the server reports them at
+        GET /api/diagnostics/graph.
+        """
+        for endpoint, stats in self.stats().items():
+            print(f"{endpoint}: {stats['requests']} requests, {stats['retries']} retries, "
+                  f"{stats['failures']} failures, avg {stats['avg_seconds']:.2f}s, max {stats['max_seconds']:.2f}s")
+
+# Global instance
+graph_client = None
+_client_lock = threading.Lock()
+
+def get_graph_client() -> GraphClient:
+    """Get the process-wide Graph HTTP client."""
+    global graph_client
+    if graph_client is None:
+        with _client_lock:
+            if graph_client is None:
+                graph_client = GraphClient()
+    return graph_client
@@ -0,0 +1,250 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+from .database import get_db_connection
+
+# Columns written to each license table, after tenant_id and snapshot_id
+LICENSE_COLUMNS = [
+    "license_sku", "display_name", "type", "total_licenses", "used_licenses",
+    "unused_licenses", "renewal_expiration_date"
+]
+OVER_LICENSED_USER_COLUMNS = ["display_name", "user_principal_name", "licenses"]
+
+# Rows sent per executemany call while a snapshot is written
+INSERT_BATCH_SIZE = 1000
+
+# Snapshots kept per tenant; older ones are deleted when a new one is stored (0 keeps all)
+LICENSE_SNAPSHOT_RETENTION = int(os.getenv('LICENSE_SNAPSHOT_RETENTION', '30'))
+
+# Tables holding snapshot rows, the snapshot table last
+SNAPSHOT_TABLES = ["tenant_licenses", "tenant_over_licensed_users", "license_snapshots"]
+
+_tables_ready = False
+_tables_lock = threading.Lock()
+
+def create_license_tables(cursor):
+    """Create the license snapshot tables if they don't exist yet.
+
+    Every fetch writes one license_snapshots row; the data tables reference it
+    and are indexed on (tenant_id, snapshot_id) so the latest snapshot is a
+    seek rather than a scan of the history.
+    """
+    cursor.execute('''
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='license_snapshots' AND xtype='U')
+        BEGIN
+            CREATE TABLE license_snapshots (
+                snapshot_id INT IDENTITY(1,1) PRIMARY KEY,
+                tenant_id NVARCHAR(255) NOT NULL,
+                captured_date NVARCHAR(100) NOT NULL,
+                license_count INT NOT NULL DEFAULT 0,
+                over_licensed_user_count INT NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IX_license_snapshots_tenant ON license_snapshots (tenant_id, snapshot_id DESC);
+        END
+    ''')
+
+    cursor.execute('''
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='tenant_licenses' AND xtype='U')
+        BEGIN
+            CREATE TABLE tenant_licenses (
+                id INT IDENTITY(1,1) PRIMARY KEY NONCLUSTERED,
+                tenant_id NVARCHAR(255) NOT NULL,
+                snapshot_id INT NOT NULL,
+                license_sku NVARCHAR(255),
+                display_name NVARCHAR(MAX),
+                type NVARCHAR(50),
+                total_licenses INT,
+                used_licenses INT,
+                unused_licenses INT,
+                renewal_expiration_date NVARCHAR(255)
+            );
+            CREATE CLUSTERED INDEX CX_tenant_licenses ON tenant_licenses (tenant_id, snapshot_id);
+        END
+    ''')
+
+    cursor.execute('''
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='tenant_over_licensed_users' AND xtype='U')
+        BEGIN
+            CREATE TABLE tenant_over_licensed_users (
+                id INT IDENTITY(1,1) PRIMARY KEY NONCLUSTERED,
+                tenant_id NVARCHAR(255) NOT NULL,
+                snapshot_id INT NOT NULL,
+                display_name NVARCHAR(255),
+                user_principal_name NVARCHAR(255),
+                licenses NVARCHAR(MAX)
+            );
+            CREATE CLUSTERED INDEX CX_tenant_over_licensed_users ON tenant_over_licensed_users (tenant_id, snapshot_id);
+        END
+    ''')
+
+def ensure_license_tables():
+    """Create the license tables once per process."""
+    global _tables_ready
+    if _tables_ready:
+        return
+
+    with _tables_lock:
+        if _tables_ready:
+            return
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            create_license_tables(cursor)
+            conn.commit()
+            _tables_ready = True
+        except Exception as e:
+            print(f"Error creating license tables: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+def _insert_rows(cursor, table_name: str, columns: List[str], tenant_id: str, snapshot_id: int,
+                 rows: Iterable[Dict[str, Any]]) -> int:
+    """Insert rows in batches as they are consumed and return how many were written."""
+    all_columns = ["tenant_id", "snapshot_id"] + columns
+    insert_sql = f"INSERT INTO {table_name} ({', '.join(all_columns)}) VALUES ({', '.join('?' for _ in all_columns)})"
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append((tenant_id, snapshot_id) + tuple(row.get(column) for column in columns))
+        if len(batch) >= INSERT_BATCH_SIZE:
+            cursor.executemany(insert_sql, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(insert_sql, batch)
+        written += len(batch)
+    return written
+
+def _delete_snapshots(cursor, tenant_id: str, through_snapshot_id: Optional[int] = None):
+    """Delete a tenant's snapshots up to and including through_snapshot_id, or all of them."""
+    for table_name in SNAPSHOT_TABLES:
+        if through_snapshot_id is None:
+            cursor.execute(f"DELETE FROM {table_name} WHERE tenant_id = ?", (tenant_id,))
+        else:
+            cursor.execute(f"DELETE FROM {table_name} WHERE tenant_id = ? AND snapshot_id <= ?",
+                           (tenant_id, through_snapshot_id))
+
+def _prune_snapshots(cursor, tenant_id: str, keep: int):
+    """Delete all but the newest keep snapshots of a tenant."""
+    if keep <= 0:
+        return
+    cursor.execute('''
+        SELECT snapshot_id
+        FROM license_snapshots
+        WHERE tenant_id = ?
+        ORDER BY snapshot_id DESC
+        OFFSET ? ROWS FETCH NEXT 1 ROWS ONLY
+    ''', (tenant_id, keep))
+    row = cursor.fetchone()
+    if row:
+        _delete_snapshots(cursor, tenant_id, row[0])
+
+def delete_license_data(conn, tenant_id: str):
+    """Delete every license snapshot of a tenant; the caller commits."""
+    ensure_license_tables()
+
+    cursor = conn.cursor()
+    try:
+        _delete_snapshots(cursor, tenant_id)
+    finally:
+        cursor.close()
+
+def store_license_snapshot(tenant_id: str, licenses: Iterable[Dict[str, Any]],
+                           over_licensed_users: Iterable[Dict[str, Any]]) -> int:
+    """Write one fetch run as a new snapshot and return its id.
+
+    The row arguments may be generators: rows are inserted in batches as they
+    are produced. The snapshot only becomes visible when the whole run
+    commits, together with the deletion of snapshots beyond
+    LICENSE_SNAPSHOT_RETENTION. Inactive users are not snapshotted; they are
+    queried from the synced users table (see app.user_directory).
+    """
+    ensure_license_tables()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO license_snapshots (tenant_id, captured_date, license_count, over_licensed_user_count)
+            OUTPUT INSERTED.snapshot_id
+            VALUES (?, ?, 0, 0)
+        ''', (tenant_id, datetime.now().isoformat()))
+        snapshot_id = cursor.fetchone()[0]
+
+        cursor.fast_executemany = True
+        license_count = _insert_rows(cursor, "tenant_licenses", LICENSE_COLUMNS, tenant_id, snapshot_id, licenses)
+        over_licensed_user_count = _insert_rows(cursor, "tenant_over_licensed_users", OVER_LICENSED_USER_COLUMNS, tenant_id, snapshot_id, over_licensed_users)
+
+        cursor.execute('''
+            UPDATE license_snapshots
+            SET license_count = ?, over_licensed_user_count = ?
+            WHERE snapshot_id = ?
+        ''', (license_count, over_licensed_user_count, snapshot_id))
+
+        _prune_snapshots(cursor, tenant_id, LICENSE_SNAPSHOT_RETENTION)
+        conn.commit()
+        return snapshot_id
+    except Exception as e:
+        print(f"Error storing license snapshot for tenant {tenant_id}: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_latest_snapshot(tenant_id: str) -> Optional[Dict[str, Any]]:
+    """Get the most recent snapshot for a tenant, or None if there is none."""
+    ensure_license_tables()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT TOP 1 snapshot_id, captured_date
+            FROM license_snapshots
+            WHERE tenant_id = ?
+            ORDER BY snapshot_id DESC
+        ''', (tenant_id,))
+        row = cursor.fetchone()
+        return {'snapshot_id': row[0], 'captured_date': row[1]} if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_latest_licenses(tenant_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Get the licenses of a tenant's latest snapshot, or None if there is none."""
+    snapshot = get_latest_snapshot(tenant_id)
+    if not snapshot:
+        return None
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT id, license_sku, display_name, type, total_licenses, used_licenses,
+                   unused_licenses, renewal_expiration_date
+            FROM tenant_licenses
+            WHERE tenant_id = ? AND snapshot_id = ?
+            ORDER BY total_licenses DESC
+        ''', (tenant_id, snapshot['snapshot_id']))
+
+        return [{
+            'id': row[0],
+            'sku': row[1],
+            'displayName': row[2],
+            'type': row[3],
+            'totalCount': row[4],
+            'usedCount': row[5],
+            'availableCount': row[6],
+            'renewalDate': row[7],
+            'capturedDate': snapshot['captured_date']
+        } for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
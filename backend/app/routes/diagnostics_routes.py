@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify
+from app.database import get_pool_stats
+from app.graph_client import get_graph_client
+from app.token_cache import get_token_provider
+import logging
+
+# Create Blueprint
+diagnostics_bp = Blueprint('diagnostics', __name__)
+
+@diagnostics_bp.route('/diagnostics/db-pool', methods=['GET'])
+def get_db_pool_stats():
+    """Get connection pool statistics for sizing the pool under load"""
+    try:
+        return jsonify(get_pool_stats())
+    except Exception as e:
+        logging.error(f"Error getting connection pool stats: {e}")
+        return jsonify({'error': 'Failed to get connection pool stats'}), 500
+
+@diagnostics_bp.route('/diagnostics/graph', methods=['GET'])
+def get_graph_stats():
+    """Get per-endpoint latency and retry counters for Graph calls made by this process"""
+    try:
+        return jsonify(get_graph_client().stats())
+    except Exception as e:
+        logging.error(f"Error getting Graph client stats: {e}")
+        return jsonify({'error': 'Failed to get Graph client stats'}), 500
+
+@diagnostics_bp.route('/diagnostics/token-cache', methods=['GET'])
+def get_token_cache_stats():
+    """Get access token cache hit/miss counters for this process"""
+    try:
+        return jsonify(get_token_provider().stats())
+    except Exception as e:
+        logging.error(f"Error getting token cache stats: {e}")
+        return jsonify({'error': 'Failed to get token cache stats'}), 500
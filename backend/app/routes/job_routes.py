@@ -0,0 +1,75 @@
+from flask import Blueprint, request, jsonify
+from app.database import get_tenant_registry
+from app.fetch_engine import FETCHERS
+from app.fetch_jobs import get_job_registry
+from app.fetch_orchestrator import create_run, get_run_registry
+
+# Create Blueprint
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<string:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the state, progress counters, timings and error of a fetch job"""
+    job = get_job_registry().get(job_id)
+    if not job:
+        return jsonify({
+            'error': 'Job not found',
+            'message': f'No fetch job with ID {job_id}; finished jobs are kept for a limited time'
+        }), 404
+    return jsonify(job.to_dict())
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List known fetch jobs, newest first, optionally for one tenant"""
+    tenant_id = request.args.get('tenantId')
+    return jsonify([job.to_dict() for job in get_job_registry().list(tenant_id)])
+
+@jobs_bp.route('/fetch-all', methods=['POST'])
+def trigger_fetch_all():
+    """Fetch data types for many tenants in parallel; returns 202 with a runId to poll"""
+    data = request.json or {}
+    tenant_ids = data.get('tenantIds')
+    if tenant_ids:
+        tenants = [tenant for tenant in (get_tenant_registry().get(tenant_id) for tenant_id in tenant_ids) if tenant]
+    else:
+        tenants = [tenant for tenant in get_tenant_registry().all() if tenant.isActive]
+    if not tenants:
+        return jsonify({
+            'error': 'No tenants',
+            'message': 'None of the requested tenants exist' if tenant_ids else 'There are no active tenants'
+        }), 404
+
+    try:
+        run = create_run(
+            [tenant.to_dict() for tenant in tenants],
+            data.get('dataTypes') or list(FETCHERS),
+            max_concurrency=data.get('maxConcurrency'),
+            type_limits={data_type: max(1, int(limit)) for data_type, limit in (data.get('typeLimits') or {}).items()},
+            options={'message_center': {'force_full_sync': bool(data.get('forceFullSync'))}}
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'error': 'Invalid request',
+            'message': str(e)
+        }), 400
+
+    get_run_registry().start(run)
+    return jsonify({
+        'success': True,
+        'runId': run.id,
+        'tasks': len(run.tasks),
+        'maxConcurrency': run.maxConcurrency,
+        'typeLimits': run.typeLimits,
+        'message': f'Fetching {", ".join(run.dataTypes)} for {len(tenants)} tenants'
+    }), 202, {'Location': f'/api/fetch-all/{run.id}'}
+
+@jobs_bp.route('/fetch-all/<string:run_id>', methods=['GET'])
+def get_fetch_all(run_id):
+    """Get a multi-tenant run's progress and its per-task durations and row counts"""
+    run = get_run_registry().get(run_id)
+    if not run:
+        return jsonify({
+            'error': 'Run not found',
+            'message': f'No fetch run with ID {run_id}; finished runs are kept for a limited time'
+        }), 404
+    return jsonify(run.to_dict())
@@ -1,9 +1,9 @@
 
 from flask import Blueprint, request, jsonify
-import subprocess
-import os
 
-from app.database import get_db_connection, get_tenant_table_connection, ensure_tenant_tables_exist
+from app.database import get_tenant_registry, get_tenant_table_connection, ensure_tenant_tables_exist, get_table_manager
+from app.fetch_engine import submit_job
+from app.fetch_jobs import JobQueueFull
 
 news_bp = Blueprint('news', __name__, url_prefix='/api')
 
@@ -19,12 +19,7 @@ def get_m365_news():
         }), 400
     
     # Try to find the tenant
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    tenant = get_tenant_registry().get(tenant_id)
     
     if not tenant:
         return jsonify({
@@ -33,16 +28,8 @@ def get_m365_news():
         }), 404
     
     try:
-        # Convert pyodbc.Row to dictionary for easier access
-        tenant_dict = {
-            'id': tenant[0],
-            'name': tenant[1],
-            'tenantId': tenant[2],
-            'applicationId': tenant[3],
-            'applicationSecret': tenant[4],
-            'isActive': bool(tenant[5]),
-            'dateAdded': tenant[6]
-        }
+        # Convert to dictionary for easier access
+        tenant_dict = tenant.to_dict()
         
         # Ensure tenant tables exist
         table_exists = ensure_tenant_tables_exist(tenant_dict['id'], 'm365')
@@ -60,14 +47,10 @@ def get_m365_news():
         try:
             cursor = conn.cursor()
             
-            # Check if the news table exists
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME = '{table_name}'
-            """)
-            table_exists = cursor.fetchone()[0] > 0
+            # Get the cached list query; None means the news table doesn't exist
+            query = get_table_manager().get_select_statement(tenant_dict['name'], 'm365_news')
             
-            if not table_exists:
+            if not query:
                 print(f"News table {table_name} does not exist for tenant: {tenant_dict['name']}")
                 conn.close()
                 return jsonify([])  # Return empty array if table doesn't exist
@@ -75,18 +58,7 @@ def get_m365_news():
             print(f"Found news table: {table_name} for tenant: {tenant_dict['name']}")
             
             # Query the news table
-            cursor.execute(f"""
-                SELECT 
-                    id,
-                    title,
-                    published_date,
-                    link,
-                    summary,
-                    categories,
-                    fetch_date
-                FROM {table_name}
-                ORDER BY published_date DESC
-            """)
+            cursor.execute(query, (tenant_dict['id'],))
             
             news = []
             rows = cursor.fetchall()
@@ -147,12 +119,7 @@ def trigger_fetch_m365_news():
         }), 400
     
     # Check if the tenant exists
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    tenant = get_tenant_registry().get(tenant_id)
     
     if not tenant:
         return jsonify({
@@ -163,44 +130,18 @@ def trigger_fetch_m365_news():
     try:
         print(f"Attempting to fetch M365 news for tenant ID: {tenant_id}")
         
-        # On Windows, run the batch file
-        if os.name == 'nt':
-            # Print the current directory for debugging
-            print(f"Current directory: {os.getcwd()}")
-            print(f"Running command: fetch_m365_news.bat {tenant_id}")
-            
-            # Use absolute paths or ensure the batch file is in the right directory
-            fetch_script = os.path.join(os.getcwd(), 'fetch_m365_news.bat')
-            if not os.path.exists(fetch_script):
-                print(f"Warning: fetch_m365_news.bat not found at {fetch_script}")
-                
-            # Try different ways to run the batch file
-            try:
-                subprocess.run(['fetch_m365_news.bat', tenant_id], check=True)
-            except Exception as batch_error:
-                print(f"Error running batch file directly: {str(batch_error)}")
-                try:
-                    # Try with cmd /c
-                    subprocess.run(['cmd', '/c', 'fetch_m365_news.bat', tenant_id], check=True)
-                except Exception as cmd_error:
-                    print(f"Error running with cmd /c: {str(cmd_error)}")
-                    # As a last resort, try with python
-                    subprocess.run(['python', 'fetch_m365_news.py', tenant_id], check=True)
-        else:
-            # On non-Windows, run the Python script directly
-            print(f"Running command: python fetch_m365_news.py {tenant_id}")
-            subprocess.run(['python', 'fetch_m365_news.py', tenant_id], check=True)
-        
+        job = submit_job('news', tenant.to_dict())
         return jsonify({
             'success': True,
-            'message': f'Successfully fetched M365 news for tenant {tenant[1]}'  # Access by index
-        })
-    except subprocess.CalledProcessError as e:
-        print(f"Error running fetch_m365_news script: {str(e)}")
+            'jobId': job.id,
+            'state': job.state,
+            'message': f'Fetching M365 news for tenant {tenant.name}'
+        }), 202, {'Location': f'/api/jobs/{job.id}'}
+    except JobQueueFull as e:
         return jsonify({
-            'error': 'Fetch news failed',
-            'message': f'Error running fetch_m365_news script: {str(e)}'
-        }), 500
+            'error': 'Too many fetch jobs',
+            'message': str(e)
+        }), 503
     except Exception as e:
         print(f"Server error when fetching M365 news: {str(e)}")
         return jsonify({
@@ -1,10 +1,10 @@
 
 import json
 from datetime import datetime, timedelta
-from dateutil import parser
 
-from app.database import get_tenant_table_connection, find_tenant_database
-from .db_helpers import ensure_tenant_database
+from app.database import get_db_connection, get_table_manager, find_tenant_database, ensure_tenant_tables_exist
+from app.azure_db_config import GLOBAL_TABLE_NAMES
+from app.date_utils import parse_datetime_utc, to_utc_naive
 
 def get_time_period_for_frequency(frequency, check_period=True):
     """Get the appropriate time period based on notification frequency"""
@@ -37,21 +37,38 @@ def get_exact_date_for_filter(frequency):
         yesterday_start = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
         return yesterday_start.isoformat()
 
-def fetch_message_center_updates(tenant_id, frequency="Daily", check_period=True, force_exact_date=False):
-    """Fetch message center updates for a tenant for the appropriate time period"""
+def _resolve_tenants(tenant_ids):
+    """Look up tenants whose tables are ready, skipping unknown tenants."""
+    tenants = []
+    for tenant_id in tenant_ids:
+        tenant_info = find_tenant_database(tenant_id)
+        if not tenant_info or not ensure_tenant_tables_exist(tenant_id, 'm365'):
+            print(f"Could not get tables for tenant {tenant_id}")
+            continue
+        tenants.append(tenant_info)
+    return tenants
+
+def _group_by_tenant(tenant_ids, rows, to_dict):
+    """Split (tenant_id, ...) rows into per-tenant lists, keeping row order."""
+    grouped = {tenant_id: [] for tenant_id in tenant_ids}
+    for row in rows:
+        grouped.setdefault(row[0], []).append(to_dict(row[1:]))
+    return grouped
+
+def fetch_message_center_updates_for_tenants(tenant_ids, frequency="Daily", check_period=True, force_exact_date=False):
+    """Fetch message center updates for several tenants in a single query.
+    
+    Returns a dictionary of tenant id -> list of updates.
+    """
     # Get days based on frequency
     days = get_time_period_for_frequency(frequency, check_period)
     print(f"Fetching message center updates for last {days} days based on {frequency} frequency")
     
+    tenants = _resolve_tenants(tenant_ids)
+    if not tenants:
+        return {tenant_id: [] for tenant_id in tenant_ids}
+    
     try:
-        # Get connection and table name for Azure SQL
-        conn, updates_table = get_tenant_table_connection(tenant_id, 'updates', 'm365')
-        if not conn or not updates_table:
-            print(f"Could not get connection or table for tenant {tenant_id}")
-            return []
-        
-        cursor = conn.cursor()
-        
         # Calculate the date range
         if force_exact_date:
             # Use exact date (beginning of yesterday for daily)
@@ -62,55 +79,61 @@ def fetch_message_center_updates(tenant_id, frequency="Daily", check_period=True
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             print(f"Filtering updates since: {cutoff_date}")
         
-        # Query the Azure SQL table
+        updates_source = get_table_manager().multi_tenant_source(tenants, 'updates', [
+            'id', 'title', 'category', 'severity', 'lastModifiedDateTime', 'isMajorChange',
+            'bodyContent', 'lastModifiedDateTime_utc'
+        ])
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Query all tenants' updates at once
         cursor.execute(f"""
             SELECT 
-                id, title, category, severity, lastModifiedDateTime as publishedDate,
+                tenant_id, id, title, category, severity, lastModifiedDateTime as publishedDate,
                 isMajorChange as actionType, bodyContent as description
-            FROM {updates_table}
-            WHERE lastModifiedDateTime > ?
-            ORDER BY lastModifiedDateTime DESC
-        """, (cutoff_date,))
+            FROM {updates_source} u
+            WHERE lastModifiedDateTime_utc > ?
+            ORDER BY tenant_id, lastModifiedDateTime_utc DESC
+        """, [tenant['id'] for tenant in tenants] + [parse_datetime_utc(cutoff_date)])
         
         # Convert rows to dictionaries
-        updates = []
-        for row in cursor.fetchall():
-            update_dict = {
-                'id': row[0],
-                'title': row[1],
-                'category': row[2],
-                'severity': row[3],
-                'publishedDate': row[4],
-                'actionType': row[5],
-                'description': row[6]
-            }
-            updates.append(update_dict)
+        updates = _group_by_tenant(tenant_ids, cursor.fetchall(), lambda row: {
+            'id': row[0],
+            'title': row[1],
+            'category': row[2],
+            'severity': row[3],
+            'publishedDate': row[4],
+            'actionType': row[5],
+            'description': row[6]
+        })
         
         cursor.close()
         conn.close()
-        print(f"Found {len(updates)} message center updates since {cutoff_date}")
+        print(f"Found {sum(len(items) for items in updates.values())} message center updates for {len(tenants)} tenants since {cutoff_date}")
         return updates
     except Exception as e:
         print(f"Error fetching message center updates: {e}")
-        return []
+        return {tenant_id: [] for tenant_id in tenant_ids}
 
-def fetch_windows_updates(tenant_id, frequency="Daily", check_period=True, force_exact_date=False):
-    """Fetch Windows updates for a tenant for the appropriate time period"""
+def fetch_message_center_updates(tenant_id, frequency="Daily", check_period=True, force_exact_date=False):
+    """Fetch message center updates for a tenant for the appropriate time period"""
+    return fetch_message_center_updates_for_tenants([tenant_id], frequency, check_period, force_exact_date).get(tenant_id, [])
+
+def fetch_windows_updates_for_tenants(tenant_ids, frequency="Daily", check_period=True, force_exact_date=False):
+    """Fetch Windows updates for several tenants in a single query.
+    
+    Returns a dictionary of tenant id -> list of updates.
+    """
     # Get days based on frequency
     days = get_time_period_for_frequency(frequency, check_period)
     print(f"Fetching Windows updates for last {days} days based on {frequency} frequency")
     
+    tenants = _resolve_tenants(tenant_ids)
+    if not tenants:
+        return {tenant_id: [] for tenant_id in tenant_ids}
+    
     try:
-        # Get connection and table names for Azure SQL
-        conn, issues_table = get_tenant_table_connection(tenant_id, 'windows_known_issues', 'm365')
-        if not conn or not issues_table:
-            print(f"Could not get connection or table for tenant {tenant_id}")
-            return []
-        
-        _, products_table = get_tenant_table_connection(tenant_id, 'windows_products', 'm365')
-        
-        cursor = conn.cursor()
-        
         # Calculate the date range
         if force_exact_date:
             # Use exact date (beginning of yesterday for daily)
@@ -121,56 +144,69 @@ def fetch_windows_updates(tenant_id, frequency="Daily", check_period=True, force
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
             print(f"Filtering Windows updates since: {cutoff_date}")
         
+        # Tenant overlay rows plus the catalog issues of each tenant's products
+        table_manager = get_table_manager()
+        issues_source, issues_params = table_manager.catalog_source(tenants, 'windows_known_issues', [
+            'id', 'product_id', 'title', 'description', 'web_view_url', 'status',
+            'start_date', 'resolved_date', 'start_date_utc'
+        ])
+        products_source = table_manager.multi_tenant_source(tenants, 'windows_products', ['id', 'name'])
+        tenant_params = [tenant['id'] for tenant in tenants]
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
         cursor.execute(f"""
             SELECT 
-                wi.id, wi.product_id as productId, wi.title, wi.description, 
-                wi.webViewUrl, wi.status, wi.start_date as startDate, 
-                wi.resolved_date as resolvedDate, wp.name as productName
-            FROM {issues_table} wi
-            LEFT JOIN {products_table} wp ON wi.product_id = wp.id
-            WHERE wi.start_date > ?
-            ORDER BY wi.start_date DESC
-        """, (cutoff_date,))
+                wi.tenant_id, wi.id, wi.product_id as productId, wi.title, wi.description, 
+                wi.web_view_url as webViewUrl, wi.status, wi.start_date as startDate, 
+                wi.resolved_date as resolvedDate, COALESCE(wp.name, gp.name) as productName
+            FROM {issues_source} wi
+            LEFT JOIN {products_source} wp ON wi.tenant_id = wp.tenant_id AND wi.product_id = wp.id
+            LEFT JOIN {GLOBAL_TABLE_NAMES['windows_products']} gp ON wi.product_id = gp.id
+            WHERE wi.start_date_utc > ?
+            ORDER BY wi.tenant_id, wi.start_date_utc DESC
+        """, issues_params + tenant_params + [parse_datetime_utc(cutoff_date)])
         
         # Convert rows to dictionaries
-        updates = []
-        for row in cursor.fetchall():
-            update_dict = {
-                'id': row[0],
-                'productId': row[1],
-                'title': row[2],
-                'description': row[3],
-                'webViewUrl': row[4],
-                'status': row[5],
-                'startDate': row[6],
-                'resolvedDate': row[7],
-                'productName': row[8]
-            }
-            updates.append(update_dict)
+        updates = _group_by_tenant(tenant_ids, cursor.fetchall(), lambda row: {
+            'id': row[0],
+            'productId': row[1],
+            'title': row[2],
+            'description': row[3],
+            'webViewUrl': row[4],
+            'status': row[5],
+            'startDate': row[6],
+            'resolvedDate': row[7],
+            'productName': row[8]
+        })
         
         cursor.close()
         conn.close()
-        print(f"Found {len(updates)} Windows updates since {cutoff_date}")
+        print(f"Found {sum(len(items) for items in updates.values())} Windows updates for {len(tenants)} tenants since {cutoff_date}")
         return updates
     except Exception as e:
         print(f"Error fetching Windows updates: {e}")
-        return []
+        return {tenant_id: [] for tenant_id in tenant_ids}
 
-def fetch_m365_news(tenant_id, frequency="Daily", check_period=True, force_exact_date=False):
-    """Fetch M365 news for a tenant for the appropriate time period"""
+def fetch_windows_updates(tenant_id, frequency="Daily", check_period=True, force_exact_date=False):
+    """Fetch Windows updates for a tenant for the appropriate time period"""
+    return fetch_windows_updates_for_tenants([tenant_id], frequency, check_period, force_exact_date).get(tenant_id, [])
+
+def fetch_m365_news_for_tenants(tenant_ids, frequency="Daily", check_period=True, force_exact_date=False):
+    """Fetch M365 news for several tenants in a single query.
+    
+    Returns a dictionary of tenant id -> list of news items.
+    """
     # Get days based on frequency
     days = get_time_period_for_frequency(frequency, check_period)
     print(f"Fetching M365 news for last {days} days based on {frequency} frequency")
     
+    tenants = _resolve_tenants(tenant_ids)
+    if not tenants:
+        return {tenant_id: [] for tenant_id in tenant_ids}
+    
     try:
-        # Get connection and table name for Azure SQL
-        conn, news_table = get_tenant_table_connection(tenant_id, 'm365_news', 'm365')
-        if not conn or not news_table:
-            print(f"Could not get connection or table for tenant {tenant_id}")
-            return []
-        
-        cursor = conn.cursor()
-        
         # Calculate the cutoff date
         if force_exact_date:
             # Use exact date (beginning of yesterday for daily)
@@ -182,52 +218,43 @@ def fetch_m365_news(tenant_id, frequency="Daily", check_period=True, force_exact
             cutoff_date = datetime.now() - timedelta(days=days)
             print(f"Filtering M365 news since: {cutoff_date.isoformat()}")
         
-        # Get all news entries first
-        cursor.execute(f"SELECT * FROM {news_table} ORDER BY published_date DESC")
-        all_news_rows = cursor.fetchall()
+        # Tenant overlay rows plus the shared news catalog
+        news_source, news_params = get_table_manager().catalog_source(tenants, 'm365_news', [
+            'id', 'title', 'published_date', 'link', 'summary', 'categories', 'fetch_date',
+            'published_date_utc'
+        ])
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Filter on the typed published date column
+        cursor.execute(f"""
+            SELECT tenant_id, id, title, published_date, link, summary, categories, fetch_date
+            FROM {news_source} n
+            WHERE published_date_utc >= ?
+            ORDER BY tenant_id, published_date_utc DESC
+        """, news_params + [to_utc_naive(cutoff_date)])
         
         # Convert rows to dictionaries
-        all_news = []
-        for row in all_news_rows:
-            news_dict = {
-                'id': row[0],
-                'title': row[1],
-                'published_date': row[2],
-                'link': row[3],
-                'summary': row[4],
-                'categories': row[5],
-                'fetch_date': row[6]
-            }
-            all_news.append(news_dict)
+        filtered_news = _group_by_tenant(tenant_ids, cursor.fetchall(), lambda row: {
+            'id': row[0],
+            'title': row[1],
+            'published_date': row[2],
+            'link': row[3],
+            'summary': row[4],
+            'categories': row[5],
+            'fetch_date': row[6]
+        })
         
         cursor.close()
         conn.close()
         
-        # Filter the news entries manually based on the date
-        filtered_news = []
-        for news_item in all_news:
-            try:
-                # Parse the date using dateutil.parser which handles various formats
-                published_date_str = news_item.get('published_date')
-                if not published_date_str:
-                    continue
-                    
-                published_date = parser.parse(published_date_str)
-                
-                # Make both dates timezone-naive for comparison if published_date has timezone
-                if published_date.tzinfo:
-                    published_date = published_date.replace(tzinfo=None)
-                
-                # Compare dates
-                if published_date >= cutoff_date:
-                    filtered_news.append(news_item)
-            except Exception as e:
-                print(f"Error parsing date '{published_date_str}': {e}")
-                # Skip items with invalid dates
-                continue
-        
-        print(f"Found {len(filtered_news)} M365 news items out of {len(all_news)} total after date filtering")
+        print(f"Found {sum(len(items) for items in filtered_news.values())} M365 news items for {len(tenants)} tenants since {cutoff_date.isoformat()}")
         return filtered_news
     except Exception as e:
         print(f"Error fetching M365 news: {e}")
-        return []
+        return {tenant_id: [] for tenant_id in tenant_ids}
+
+def fetch_m365_news(tenant_id, frequency="Daily", check_period=True, force_exact_date=False):
+    """Fetch M365 news for a tenant for the appropriate time period"""
+    return fetch_m365_news_for_tenants([tenant_id], frequency, check_period, force_exact_date).get(tenant_id, [])
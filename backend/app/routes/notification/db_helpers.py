@@ -1,7 +1,8 @@
 
 import json
 from datetime import datetime, timedelta
-from app.database import get_db_connection, get_tenant_table_connection, ensure_tenant_tables_exist
+from app.database import get_db_connection, get_tenant_table_connection, ensure_tenant_tables_exist, get_tenant_registry
+from app.date_utils import parse_datetime_utc
 
 def init_notification_table():
     """Initialize the notification_settings table if it doesn't exist."""
@@ -28,15 +29,8 @@ def init_notification_table():
 
 def get_tenant_name(tenant_id):
     """Get tenant name from its ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT name FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    return tenant[0] if tenant else "Unknown Tenant"
+    tenant = get_tenant_registry().get(tenant_id)
+    return tenant.name if tenant else "Unknown Tenant"
 
 def ensure_tenant_database(tenant_id):
     """Ensure tenant tables exist in Azure SQL Database"""
@@ -61,7 +55,7 @@ def add_test_data_to_tenant_tables(tenant_id):
         cursor = conn.cursor()
         
         # Check if we already have test data
-        cursor.execute(f'SELECT COUNT(*) FROM {news_table}')
+        cursor.execute(f'SELECT COUNT(*) FROM {news_table} WHERE tenant_id = ?', (tenant_id,))
         count = cursor.fetchone()[0]
         
         if count == 0:
@@ -82,16 +76,20 @@ def add_test_data_to_tenant_tables(tenant_id):
                 
                 cursor.execute(f'''
                     INSERT INTO {news_table} (
-                        id, title, published_date, link, summary, categories, fetch_date
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                        tenant_id, id, title, published_date, link, summary, categories, fetch_date,
+                        published_date_utc, fetch_date_utc
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
+                    tenant_id,
                     test_entry['id'],
                     test_entry['title'],
                     test_entry['published_date'],
                     test_entry['link'],
                     test_entry['summary'],
                     test_entry['categories'],
-                    test_entry['fetch_date']
+                    test_entry['fetch_date'],
+                    parse_datetime_utc(test_entry['published_date']),
+                    parse_datetime_utc(test_entry['fetch_date'])
                 ))
             
             # Add test message center updates
@@ -111,16 +109,19 @@ def add_test_data_to_tenant_tables(tenant_id):
                 
                 cursor.execute(f'''
                     INSERT INTO {updates_table} (
-                        id, title, category, severity, lastModifiedDateTime, isMajorChange, bodyContent
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                        tenant_id, id, title, category, severity, lastModifiedDateTime, isMajorChange, bodyContent,
+                        lastModifiedDateTime_utc
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
+                    tenant_id,
                     update_entry['id'],
                     update_entry['title'],
                     update_entry['category'],
                     update_entry['severity'],
                     update_entry['lastModifiedDateTime'],
                     update_entry['isMajorChange'],
-                    update_entry['bodyContent']
+                    update_entry['bodyContent'],
+                    parse_datetime_utc(update_entry['lastModifiedDateTime'])
                 ))
             
             # Add test Windows updates
@@ -128,8 +129,8 @@ def add_test_data_to_tenant_tables(tenant_id):
             _, issues_table = get_tenant_table_connection(tenant_id, 'windows_known_issues', 'm365')
             
             cursor.execute(f'''
-                INSERT INTO {products_table} (id, name, group_name, friendly_names) VALUES (?, ?, ?, ?)
-            ''', ('win11-22h2', 'Windows 11 22H2', 'Windows 11', 'Windows 11 Version 22H2'))
+                INSERT INTO {products_table} (tenant_id, id, name, group_name, friendly_names) VALUES (?, ?, ?, ?, ?)
+            ''', (tenant_id, 'win11-22h2', 'Windows 11 22H2', 'Windows 11', 'Windows 11 Version 22H2'))
             
             for i in range(1, 8):
                 days_ago = i
@@ -146,9 +147,11 @@ def add_test_data_to_tenant_tables(tenant_id):
                 
                 cursor.execute(f'''
                     INSERT INTO {issues_table} (
-                        id, product_id, title, description, web_view_url, status, start_date, resolved_date
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        tenant_id, id, product_id, title, description, web_view_url, status, start_date, resolved_date,
+                        start_date_utc
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
+                    tenant_id,
                     win_update['id'],
                     win_update['product_id'],
                     win_update['title'],
@@ -156,7 +159,8 @@ def add_test_data_to_tenant_tables(tenant_id):
                     win_update['web_view_url'],
                     win_update['status'],
                     win_update['start_date'],
-                    win_update['resolved_date']
+                    win_update['resolved_date'],
+                    parse_datetime_utc(win_update['start_date'])
                 ))
             
             conn.commit()
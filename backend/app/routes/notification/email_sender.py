@@ -1,33 +1,17 @@
 
 import os
-import requests
-import msal
+
+from app.graph_client import get_graph_client
+from app.token_cache import get_token_provider
 
 def get_ms_graph_token():
-    """Get a Microsoft Graph API access token using MSAL"""
+    """Get a Microsoft Graph API access token for the sender account"""
     # Get settings from environment variables
     client_id = os.environ.get('MS_CLIENT_ID')
     client_secret = os.environ.get('MS_CLIENT_SECRET')
     tenant_id = os.environ.get('MS_TENANT_ID')
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
-    scope = ["https://graph.microsoft.com/.default"]
-    
-    # Create MSAL app
-    app = msal.ConfidentialClientApplication(
-        client_id,
-        authority=authority,
-        client_credential=client_secret
-    )
-    
-    # Get token
-    result = app.acquire_token_for_client(scopes=scope)
     
-    if "access_token" in result:
-        return result["access_token"]
-    else:
-        print(f"Error getting token: {result.get('error')}")
-        print(f"Error description: {result.get('error_description')}")
-        return None
+    return get_token_provider().get_token(tenant_id, client_id, client_secret)
 
 def send_email_with_ms_graph(recipient, subject, html_content):
     """Send an email using Microsoft Graph API"""
@@ -64,13 +48,13 @@ def send_email_with_ms_graph(recipient, subject, html_content):
     
     # Send the email using Microsoft Graph API
     headers = {
-        'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
     }
     
     try:
-        response = requests.post(
+        response = get_graph_client().post(
             'https://graph.microsoft.com/v1.0/users/' + sender_email + '/sendMail',
+            token=token,
             headers=headers,
             json=email_message
         )
@@ -9,7 +9,7 @@ from flask import request, jsonify
 
 from app.database import get_db_connection
 from . import notification_bp
-from .data_retrieval import fetch_message_center_updates, fetch_windows_updates, fetch_m365_news
+from .data_retrieval import fetch_message_center_updates_for_tenants, fetch_windows_updates_for_tenants, fetch_m365_news_for_tenants
 from .email_template import create_email_html
 from .email_sender import send_email_with_ms_graph
 
@@ -78,34 +78,22 @@ def process_and_send_notification(setting_id=None, use_existing_databases=False,
         
         updates_found = False
         
-        for tenant_id in tenants:
-            # Get appropriate updates based on update types, passing frequency
-            if 'message-center' in update_types:
-                message_center_updates = fetch_message_center_updates(tenant_id, frequency, check_period, force_exact_date)
-                if message_center_updates:
-                    updates_found = True
-                    all_updates['message_center'][tenant_id] = message_center_updates
-                else:
-                    print(f"No message center updates found for tenant {tenant_id}")
-                    all_updates['message_center'][tenant_id] = []
-            
-            if 'windows-updates' in update_types:
-                windows_updates = fetch_windows_updates(tenant_id, frequency, check_period, force_exact_date)
-                if windows_updates:
-                    updates_found = True
-                    all_updates['windows_updates'][tenant_id] = windows_updates
-                else:
-                    print(f"No Windows updates found for tenant {tenant_id}")
-                    all_updates['windows_updates'][tenant_id] = []
-            
-            if 'news' in update_types:
-                m365_news = fetch_m365_news(tenant_id, frequency, check_period, force_exact_date)
-                if m365_news:
+        # Read each update type for all of the setting's tenants at once
+        if 'message-center' in update_types:
+            all_updates['message_center'] = fetch_message_center_updates_for_tenants(tenants, frequency, check_period, force_exact_date)
+        
+        if 'windows-updates' in update_types:
+            all_updates['windows_updates'] = fetch_windows_updates_for_tenants(tenants, frequency, check_period, force_exact_date)
+        
+        if 'news' in update_types:
+            all_updates['m365_news'] = fetch_m365_news_for_tenants(tenants, frequency, check_period, force_exact_date)
+        
+        for update_type, label in (('message_center', 'message center updates'), ('windows_updates', 'Windows updates'), ('m365_news', 'M365 news')):
+            for tenant_id, items in all_updates[update_type].items():
+                if items:
                     updates_found = True
-                    all_updates['m365_news'][tenant_id] = m365_news
                 else:
-                    print(f"No M365 news found for tenant {tenant_id}")
-                    all_updates['m365_news'][tenant_id] = []
+                    print(f"No {label} found for tenant {tenant_id}")
         
         if use_existing_databases and not updates_found:
             print(f"No updates found for notification {setting_dict['id']} and using existing databases only")
@@ -4,37 +4,22 @@ import sqlite3
 import uuid
 from datetime import datetime
 import os
-import subprocess
 
-from app.database import get_db_connection, get_table_manager
+from app.database import get_db_connection, get_table_manager, get_tenant_registry
+from app.fetch_engine import submit_job
 from app.dependencies import check_dependencies
+from app.sync_state import clear_sync_state
+from app.user_directory import ensure_users_table, clear_users
+from app.license_store import delete_license_data
 
 tenant_bp = Blueprint('tenant', __name__, url_prefix='/api')
 
 @tenant_bp.route('/tenants', methods=['GET'])
 def get_tenants():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants')
-    tenants = cursor.fetchall()
-    conn.close()
+    tenants = get_tenant_registry().all()
     
-    # Convert pyodbc rows to dictionaries using column positions
-    result = []
-    for tenant in tenants:
-        result.append({
-            'id': tenant[0],
-            'name': tenant[1],
-            'tenantId': tenant[2],
-            'applicationId': tenant[3],
-            'applicationSecret': tenant[4],
-            'isActive': bool(tenant[5]),
-            'dateAdded': tenant[6],
-            # Handle both old and new scheduling configurations
-            'autoFetchEnabled': bool(tenant[7]) if len(tenant) > 7 and tenant[7] is not None else False,
-            'scheduleValue': tenant[8] if len(tenant) > 8 and tenant[8] is not None else 1,
-            'scheduleUnit': tenant[9] if len(tenant) > 9 and tenant[9] is not None else 'hours',
-        })
+    # Convert tenants to dictionaries
+    result = [tenant.to_dict() for tenant in tenants]
     
     return jsonify(result)
 
@@ -77,26 +62,20 @@ def add_tenant():
     
     conn.commit()
     conn.close()
+    get_tenant_registry().invalidate()
     
     # Automatically run the fetch scripts for the new tenant
     if data['isActive']:
         # Ensure dependencies are installed
         if check_dependencies():
             try:
+                # Fetch on the worker pool; the tenant is returned without waiting
+                tenant = get_tenant_registry().get(tenant_id).to_dict()
                 print(f"Automatically fetching updates for new tenant {data['name']} (ID: {tenant_id})")
+                submit_job('message_center', tenant)
                 
-                # Run fetch_updates.py for the new tenant
-                if os.name == 'nt':
-                    subprocess.run(['fetch_updates.bat', tenant_id], check=False)
-                else:
-                    subprocess.run(['python', 'fetch_updates.py', tenant_id], check=False)
-                
-                # Run fetch_licenses.py for the new tenant
                 print(f"Automatically fetching licenses for new tenant {data['name']} (ID: {tenant_id})")
-                if os.name == 'nt':
-                    subprocess.run(['fetch_licenses.bat', tenant_id], check=False)
-                else:
-                    subprocess.run(['python', 'fetch_licenses.py', tenant_id], check=False)
+                submit_job('licenses', tenant)
             except Exception as e:
                 print(f"Error initiating automatic data fetch: {e}")
     
@@ -119,10 +98,10 @@ def update_tenant(id):
     data = request.json
     
     # Get current tenant state to check if isActive changed
+    current_tenant = get_tenant_registry().get(id)
+    
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (id,))
-    current_tenant = cursor.fetchone()
     
     # Check if new columns exist, if not add them using SQL Server syntax
     try:
@@ -152,26 +131,20 @@ def update_tenant(id):
     
     conn.commit()
     conn.close()
+    get_tenant_registry().invalidate()
     
     # If tenant was not active before but is active now, fetch data
-    if current_tenant and not current_tenant[5] and data['isActive']:  # isActive is at index 5
+    if current_tenant and not current_tenant.isActive and data['isActive']:
         # Ensure dependencies are installed
         if check_dependencies():
             try:
+                # Fetch on the worker pool; the response doesn't wait for it
+                tenant = get_tenant_registry().get(id).to_dict()
                 print(f"Automatically fetching updates for newly activated tenant {data['name']} (ID: {id})")
+                submit_job('message_center', tenant)
                 
-                # Run fetch_updates.py for the newly activated tenant
-                if os.name == 'nt':
-                    subprocess.run(['fetch_updates.bat', id], check=False)
-                else:
-                    subprocess.run(['python', 'fetch_updates.py', id], check=False)
-                
-                # Run fetch_licenses.py for the newly activated tenant
                 print(f"Automatically fetching licenses for newly activated tenant {data['name']} (ID: {id})")
-                if os.name == 'nt':
-                    subprocess.run(['fetch_licenses.bat', id], check=False)
-                else:
-                    subprocess.run(['python', 'fetch_licenses.py', id], check=False)
+                submit_job('licenses', tenant)
             except Exception as e:
                 print(f"Error initiating automatic data fetch: {e}")
     
@@ -181,32 +154,36 @@ def update_tenant(id):
 def delete_tenant(id):
     # ... keep existing code (delete tenant functionality)
     # First, get the tenant information we need before deletion
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, name, tenantId, applicationId, applicationSecret, isActive, dateAdded FROM tenants WHERE id = ?', (id,))
-    tenant = cursor.fetchone()
+    tenant = get_tenant_registry().get(id)
     
     if not tenant:
-        cursor.close()
-        conn.close()
         return jsonify({'success': False, 'error': 'Tenant not found'}), 404
     
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
     try:
         # Extract tenant information
-        tenant_name = tenant[1]  # name is at index 1
-        tenant_azure_id = tenant[2]  # tenantId is at index 2
+        tenant_name = tenant.name
+        tenant_azure_id = tenant.tenantId
         
         print(f"Deleting tenant: {tenant_name} (ID: {id}, Azure ID: {tenant_azure_id})")
         
         # Delete tenant-specific tables using the table manager
         table_manager = get_table_manager()
         try:
-            table_manager.drop_tenant_tables(tenant_name, 'm365')
+            table_manager.drop_tenant_tables(tenant_name, 'm365', tenant.id)
             print(f"Successfully deleted tenant tables for: {tenant_name}")
         except Exception as e:
             print(f"Error deleting tenant tables for {tenant_name}: {e}")
             # Continue with tenant deletion even if table deletion fails
         
+        # Forget incremental sync progress so a re-added tenant starts with a full sync
+        try:
+            clear_sync_state(id)
+        except Exception as e:
+            print(f"Error clearing sync state for {tenant_name}: {e}")
+        
         # Try to delete any legacy tenant-specific databases (for backwards compatibility)
         import glob
         patterns = [
@@ -223,9 +200,15 @@ def delete_tenant(id):
                 except Exception as e:
                     print(f"Error deleting legacy tenant database: {e}")
         
+        # Remove the tenant's synced users and license history along with the tenant record
+        ensure_users_table()
+        clear_users(conn, id)
+        delete_license_data(conn, id)
+        
         # Finally, delete the tenant record from the main tenants table
         cursor.execute('DELETE FROM tenants WHERE id = ?', (id,))
         conn.commit()
+        get_tenant_registry().invalidate()
         
         print(f"Successfully deleted tenant configuration for: {tenant_name}")
         
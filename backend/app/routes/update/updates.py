@@ -1,10 +1,10 @@
 from flask import request, jsonify
 import sqlite3
-import os
-import subprocess
 import importlib.util
 
-from app.database import get_db_connection, get_tenant_table_connection, ensure_tenant_tables_exist
+from app.database import get_tenant_registry, get_tenant_table_connection, ensure_tenant_tables_exist, get_table_manager
+from app.fetch_engine import submit_job
+from app.fetch_jobs import JobQueueFull
 from app.dependencies import check_dependencies, check_numpy_pandas_compatibility
 from app.routes.update import update_bp
 
@@ -21,12 +21,7 @@ def get_updates():
         }), 400
     
     # Try to find the tenant
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    tenant = get_tenant_registry().get(tenant_id)
     
     if not tenant:
         return jsonify({
@@ -50,16 +45,8 @@ def get_updates():
         }]), 200
     
     try:
-        # Convert pyodbc.Row to dictionary for easier access
-        tenant_dict = {
-            'id': tenant[0],
-            'name': tenant[1],
-            'tenantId': tenant[2],
-            'applicationId': tenant[3],
-            'applicationSecret': tenant[4],
-            'isActive': bool(tenant[5]),
-            'dateAdded': tenant[6]
-        }
+        # Convert to dictionary for easier access
+        tenant_dict = tenant.to_dict()
         
         # Ensure tenant tables exist
         table_exists = ensure_tenant_tables_exist(tenant_dict['id'], 'm365')
@@ -95,14 +82,10 @@ def get_updates():
         try:
             cursor = conn.cursor()
             
-            # Check if the updates table exists
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME = '{table_name}'
-            """)
-            table_exists = cursor.fetchone()[0] > 0
+            # Get the cached list query; None means the updates table doesn't exist
+            query = get_table_manager().get_select_statement(tenant_dict['name'], 'updates')
             
-            if not table_exists:
+            if not query:
                 print(f"Updates table {table_name} does not exist for tenant: {tenant_dict['name']}")
                 conn.close()
                 return jsonify([{
@@ -119,18 +102,7 @@ def get_updates():
             print(f"Found updates table: {table_name} for tenant: {tenant_dict['name']}")
             
             # Query the updates table
-            cursor.execute(f"""
-                SELECT 
-                    id,
-                    title,
-                    category,
-                    severity,
-                    lastModifiedDateTime as publishedDate,
-                    isMajorChange as actionType,
-                    bodyContent as description
-                FROM {table_name}
-                ORDER BY lastModifiedDateTime DESC
-            """)
+            cursor.execute(query, (tenant_dict['id'],))
             
             updates = []
             rows = cursor.fetchall()
@@ -212,12 +184,7 @@ def trigger_fetch_updates():
         }), 400
     
     # Check if the tenant exists
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    tenant = get_tenant_registry().get(tenant_id)
     
     if not tenant:
         return jsonify({
@@ -242,46 +209,18 @@ def trigger_fetch_updates():
     try:
         print(f"Attempting to fetch updates for tenant ID: {tenant_id}")
         
-        # On Windows, run the batch file
-        if os.name == 'nt':
-            # Print the current directory for debugging
-            print(f"Current directory: {os.getcwd()}")
-            print(f"Running command: fetch_updates.bat {tenant_id}")
-            
-            # Use absolute paths or ensure the batch file is in the right directory
-            fetch_script = os.path.join(os.getcwd(), 'fetch_updates.bat')
-            if not os.path.exists(fetch_script):
-                print(f"Warning: fetch_updates.bat not found at {fetch_script}")
-                
-            # Try different ways to run the batch file
-            try:
-                subprocess.run(['fetch_updates.bat', tenant_id], check=True)
-            except Exception as batch_error:
-                print(f"Error running batch file directly: {str(batch_error)}")
-                try:
-                    # Try with cmd /c
-                    subprocess.run(['cmd', '/c', 'fetch_updates.bat', tenant_id], check=True)
-                except Exception as cmd_error:
-                    print(f"Error running with cmd /c: {str(cmd_error)}")
-                    # As a last resort, try with python
-                    subprocess.run(['python', 'fetch_updates.py', tenant_id], check=True)
-        else:
-            # On non-Windows, run the Python script directly
-            print(f"Running command: python fetch_updates.py {tenant_id}")
-            
-            # Use sys.executable to ensure we use the same Python interpreter
-            subprocess.run(['python', 'fetch_updates.py', tenant_id], check=True)
-        
+        job = submit_job('message_center', tenant.to_dict())
         return jsonify({
             'success': True,
-            'message': f'Successfully fetched updates for tenant {tenant[1]}'  # Access by index
-        })
-    except subprocess.CalledProcessError as e:
-        print(f"Error running fetch_updates script: {str(e)}")
+            'jobId': job.id,
+            'state': job.state,
+            'message': f'Fetching updates for tenant {tenant.name}'
+        }), 202, {'Location': f'/api/jobs/{job.id}'}
+    except JobQueueFull as e:
         return jsonify({
-            'error': 'Fetch updates failed',
-            'message': f'Error running fetch_updates script: {str(e)}'
-        }), 500
+            'error': 'Too many fetch jobs',
+            'message': str(e)
+        }), 503
     except Exception as e:
         print(f"Unexpected error when fetching updates: {str(e)}")
         return jsonify({
@@ -1,9 +1,9 @@
 
 from flask import request, jsonify
-import os
-import subprocess
 
-from app.database import get_db_connection, get_tenant_table_connection, ensure_tenant_tables_exist
+from app.database import get_tenant_registry, get_tenant_table_connection, ensure_tenant_tables_exist, get_table_manager
+from app.fetch_engine import submit_job
+from app.fetch_jobs import JobQueueFull
 from app.dependencies import check_dependencies
 from app.routes.update import update_bp
 
@@ -19,12 +19,7 @@ def get_windows_updates():
         }), 400
     
     # Try to find the tenant
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    tenant = get_tenant_registry().get(tenant_id)
     
     if not tenant:
         return jsonify({
@@ -33,16 +28,8 @@ def get_windows_updates():
         }), 404
     
     try:
-        # Convert row to dictionary for easier access
-        tenant_dict = {
-            'id': tenant[0],
-            'name': tenant[1],
-            'tenantId': tenant[2],
-            'applicationId': tenant[3],
-            'applicationSecret': tenant[4],
-            'isActive': bool(tenant[5]),
-            'dateAdded': tenant[6]
-        }
+        # Convert to dictionary for easier access
+        tenant_dict = tenant.to_dict()
         
         # Ensure tenant tables exist
         ensure_tenant_tables_exist(tenant_id, 'm365')
@@ -59,101 +46,15 @@ def get_windows_updates():
         try:
             cursor = table_conn.cursor()
             
-            # Check if the table exists
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME = '{windows_issues_table}'
-            """)
-            table_exists = cursor.fetchone()[0] > 0
+            # Get the cached list query; None means the issues table doesn't exist
+            query = get_table_manager().get_select_statement(tenant_dict['name'], 'windows_known_issues')
             
-            if not table_exists:
+            if not query:
                 cursor.close()
                 table_conn.close()
                 return jsonify([])  # Return empty array if table doesn't exist
             
-            # Get table structure to build dynamic query
-            cursor.execute(f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{windows_issues_table}'")
-            columns_result = cursor.fetchall()
-            column_names = [row[0] for row in columns_result]
-            print(f"Available columns in {windows_issues_table}: {column_names}")
-            
-            # Build dynamic query based on available columns
-            select_fields = ["wi.id"]
-            
-            # Add optional fields if they exist
-            if 'product_id' in column_names:
-                select_fields.append("wi.product_id as productId")
-            else:
-                select_fields.append("NULL as productId")
-                
-            if 'title' in column_names:
-                select_fields.append("wi.title")
-            else:
-                select_fields.append("'No title available' as title")
-                
-            if 'description' in column_names:
-                select_fields.append("wi.description")
-            else:
-                select_fields.append("'No description available' as description")
-                
-            if 'webViewUrl' in column_names:
-                select_fields.append("wi.webViewUrl")
-            elif 'web_view_url' in column_names:
-                select_fields.append("wi.web_view_url as webViewUrl")
-            else:
-                select_fields.append("NULL as webViewUrl")
-                
-            if 'status' in column_names:
-                select_fields.append("LOWER(wi.status) as status")
-            else:
-                select_fields.append("'Unknown' as status")
-                
-            if 'start_date' in column_names:
-                select_fields.append("wi.start_date as startDate")
-            elif 'startDateTime' in column_names:
-                select_fields.append("wi.startDateTime as startDate")
-            elif 'first_occurred_date' in column_names:
-                select_fields.append("wi.first_occurred_date as startDate")
-            else:
-                select_fields.append("NULL as startDate")
-                
-            if 'resolved_date' in column_names:
-                select_fields.append("wi.resolved_date as resolvedDate")
-            elif 'resolvedDateTime' in column_names:
-                select_fields.append("wi.resolvedDateTime as resolvedDate")
-            else:
-                select_fields.append("NULL as resolvedDate")
-            
-            # Check if windows_products table exists - fix the table name calculation
-            products_table = windows_issues_table.replace('_win_issues', '_win_products')
-            cursor.execute(f"""
-                SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME = '{products_table}'
-            """)
-            has_products_table = cursor.fetchone()[0] > 0
-            print(f"Checking for products table: {products_table}, exists: {has_products_table}")
-            
-            # Build and execute the query
-            if has_products_table:
-                query = f"""
-                    SELECT 
-                        {', '.join(select_fields)},
-                        wp.name as productName
-                    FROM {windows_issues_table} wi
-                    LEFT JOIN {products_table} wp ON wi.product_id = wp.id
-                    ORDER BY wi.id DESC
-                """
-            else:
-                query = f"""
-                    SELECT 
-                        {', '.join(select_fields)},
-                        'Unknown Product' as productName
-                    FROM {windows_issues_table} wi
-                    ORDER BY wi.id DESC
-                """
-            
-            print(f"Executing query: {query}")
-            cursor.execute(query)
+            cursor.execute(query, (tenant_dict['id'],))
             
             updates = []
             for row in cursor.fetchall():
@@ -204,12 +105,7 @@ def trigger_fetch_windows_updates():
         }), 400
     
     # Check if the tenant exists
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    tenant = get_tenant_registry().get(tenant_id)
     
     if not tenant:
         return jsonify({
@@ -218,43 +114,23 @@ def trigger_fetch_windows_updates():
         }), 404
     
     try:
-        # Convert row to dictionary for easier access
-        tenant_dict = {
-            'id': tenant[0],
-            'name': tenant[1],
-            'tenantId': tenant[2],
-            'applicationId': tenant[3],
-            'applicationSecret': tenant[4],
-            'isActive': bool(tenant[5]),
-            'dateAdded': tenant[6]
-        }
+        # Convert to dictionary for easier access
+        tenant_dict = tenant.to_dict()
         
         print(f"Attempting to fetch Windows updates for tenant ID: {tenant_id}")
         
-        # Prepare command arguments
-        cmd_args = [tenant_id]
-        if fix_compatibility:
-            cmd_args.append("--fix-compatibility")
-        
-        # On Windows, run the batch file
-        if os.name == 'nt':
-            print(f"Running command: fetch_windows_updates.bat {' '.join(cmd_args)}")
-            subprocess.run(['fetch_windows_updates.bat'] + cmd_args, check=True)
-        else:
-            # On non-Windows, run the Python script directly
-            print(f"Running command: python fetch_windows_updates.py {' '.join(cmd_args)}")
-            subprocess.run(['python', 'fetch_windows_updates.py'] + cmd_args, check=True)
-        
+        job = submit_job('windows_updates', tenant_dict, fix_compatibility=fix_compatibility)
         return jsonify({
             'success': True,
-            'message': f'Successfully fetched Windows updates for tenant {tenant_dict["name"]}'
-        })
-    except subprocess.CalledProcessError as e:
-        print(f"Error running fetch_windows_updates script: {str(e)}")
+            'jobId': job.id,
+            'state': job.state,
+            'message': f'Fetching Windows updates for tenant {tenant_dict["name"]}'
+        }), 202, {'Location': f'/api/jobs/{job.id}'}
+    except JobQueueFull as e:
         return jsonify({
-            'error': 'Fetch Windows updates failed',
-            'message': f'Error running fetch_windows_updates script: {str(e)}'
-        }), 500
+            'error': 'Too many fetch jobs',
+            'message': str(e)
+        }), 503
     except Exception as e:
         print(f"Unexpected error when fetching Windows updates: {str(e)}")
         return jsonify({
@@ -0,0 +1,138 @@
+import os
+import csv
+import io
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from .graph_client import get_graph_client
+
+# Microsoft's published mapping of license GUIDs and string ids to product names
+SKU_NAMES_URL = "https://download.microsoft.com/download/e/3/e/e3e9faf2-f28b-490a-9ada-c6089a1fc5b0/Product%20names%20and%20service%20plan%20identifiers%20for%20licensing.csv"
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.sku_names.json')
+
+# How long the cached table is used before it is revalidated with the server
+SKU_NAMES_TTL = float(os.getenv('SKU_NAMES_TTL_HOURS', '24')) * 3600
+
+# How long to wait after a failed download before trying again
+SKU_NAMES_RETRY_SECONDS = float(os.getenv('SKU_NAMES_RETRY_SECONDS', '900'))
+
+# List of known trial SKUs
+TRIAL_SKUS = [
+    "DEVELOPERPACK_E5",
+    "ENTERPRISEPREMIUM_TRIAL",
+    "ENTERPRISEPACK_TRIAL",
+    "FLOW_FREE",
+    "POWER_BI_STANDARD",
+    "TEAMS_EXPLORATORY"
+]
+
+def parse_sku_names(text: str) -> Dict[str, str]:
+    """Parse the licensing CSV into a lowercase GUID -> display name dict.
+
+    The CSV has one row per service plan, so each GUID repeats; the first
+    display name is kept.
+    """
+    names = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        guid = (row.get('GUID') or '').strip().lower()
+        name = (row.get('Product_Display_Name') or '').strip()
+        if guid and name and guid not in names:
+            names[guid] = name
+    return names
+
+class SkuNameCache:
+    """GUID -> product name lookup shared across tenants, runs and processes.
+
+    The parsed table is kept in memory and in a JSON file together with the
+    download's ETag and Last-Modified headers. Once the TTL has passed the
+    file is revalidated with a conditional GET, so an unchanged table costs a
+    304 instead of a multi-megabyte download. If the download fails, the last
+    cached table (or an empty one) is used until SKU_NAMES_RETRY_SECONDS
+    have passed.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, ttl: Optional[float] = None):
+        self.cache_path = cache_path or os.getenv('SKU_NAMES_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.ttl = SKU_NAMES_TTL if ttl is None else ttl
+        self._entry = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry if isinstance(entry.get('names'), dict) else None
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _save(self, entry: dict):
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error writing SKU name cache {self.cache_path}: {e}")
+
+    def _refresh(self, entry: Optional[dict]) -> Optional[dict]:
+        """Download the table, or confirm the cached one is current."""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = get_graph_client().get(SKU_NAMES_URL, headers=headers)
+            if response.status_code == 304 and entry:
+                print("SKU name table unchanged")
+                entry = dict(entry, fetched_at=time.time())
+            else:
+                response.raise_for_status()
+                names = parse_sku_names(response.content.decode('utf-8-sig'))
+                if not names:
+                    raise ValueError("no GUID/Product_Display_Name rows in response")
+                print(f"Downloaded SKU name table with {len(names)} products")
+                entry = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fetched_at': time.time(),
+                    'names': names
+                }
+        except Exception as e:
+            print(f"Error fetching SKU name table: {e}")
+            self._retry_at = time.time() + SKU_NAMES_RETRY_SECONDS
+            return entry
+
+        self._save(entry)
+        return entry
+
+    def get_names(self) -> Dict[str, str]:
+        """Get the GUID -> name dict, refreshing it when the TTL has passed."""
+        with self._lock:
+            # Another process may have refreshed the file since it was last read
+            if self._entry is None or time.time() - self._entry.get('fetched_at', 0) >= self.ttl:
+                self._entry = self._load() or self._entry
+            if self._entry is None or time.time() - self._entry.get('fetched_at', 0) >= self.ttl:
+                if time.time() >= self._retry_at:
+                    self._entry = self._refresh(self._entry)
+            return self._entry['names'] if self._entry else {}
+
+    def display_name(self, sku_id: str, default: Optional[str] = None) -> Optional[str]:
+        """Look up a SKU GUID's product name."""
+        return self.get_names().get((sku_id or '').lower(), default)
+
+# Global instance
+sku_name_cache = None
+
+def get_sku_name_cache() -> SkuNameCache:
+    """Get the process-wide SKU name cache."""
+    global sku_name_cache
+    if sku_name_cache is None:
+        sku_name_cache = SkuNameCache()
+    return sku_name_cache
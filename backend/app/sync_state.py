@@ -0,0 +1,141 @@
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from .database import get_db_connection
+
+# Columns callers may set; all are optional per data type
+STATE_COLUMNS = ("watermark", "last_full_sync", "sync_cursor", "changed_count", "unchanged_count", "last_success")
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+def ensure_sync_state_table():
+    """Create the sync_state table once per process.
+
+    One row per (tenant, data type) records how far an incremental fetch got:
+    a watermark, the time of the last full reconciliation, an opaque
+    cursor such as a delta or next link, how many rows the last run changed
+    or left unchanged, and when a fetch last completed successfully.
+    """
+    global _table_ready
+    if _table_ready:
+        return
+
+    with _table_lock:
+        if _table_ready:
+            return
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='sync_state' AND xtype='U')
+                CREATE TABLE sync_state (
+                    tenant_id NVARCHAR(255) NOT NULL,
+                    data_type NVARCHAR(100) NOT NULL,
+                    watermark NVARCHAR(100) NULL,
+                    last_full_sync NVARCHAR(100) NULL,
+                    sync_cursor NVARCHAR(MAX) NULL,
+                    changed_count INT NULL,
+                    unchanged_count INT NULL,
+                    last_success NVARCHAR(100) NULL,
+                    updated_at NVARCHAR(100) NOT NULL,
+                    CONSTRAINT PK_sync_state PRIMARY KEY (tenant_id, data_type)
+                )
+            ''')
+            # Tables created before change counts were recorded
+            cursor.execute('''
+                IF COL_LENGTH('sync_state', 'changed_count') IS NULL
+                ALTER TABLE sync_state ADD changed_count INT NULL, unchanged_count INT NULL
+            ''')
+            cursor.execute('''
+                IF COL_LENGTH('sync_state', 'last_success') IS NULL
+                ALTER TABLE sync_state ADD last_success NVARCHAR(100) NULL
+            ''')
+            conn.commit()
+            _table_ready = True
+        except Exception as e:
+            print(f"Error creating sync_state table: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+def get_sync_state(tenant_id: str, data_type: str) -> Dict[str, Any]:
+    """Get the sync state for a tenant and data type; empty values if never synced."""
+    ensure_sync_state_table()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT watermark, last_full_sync, sync_cursor, changed_count, unchanged_count, last_success
+            FROM sync_state
+            WHERE tenant_id = ? AND data_type = ?
+        ''', (tenant_id, data_type))
+        row = cursor.fetchone()
+        if not row:
+            return {column: None for column in STATE_COLUMNS}
+        return dict(zip(STATE_COLUMNS, row))
+    finally:
+        cursor.close()
+        conn.close()
+
+def save_sync_state(tenant_id: str, data_type: str, conn=None, **state):
+    """Update some of the sync state columns for a tenant and data type.
+
+    Pass conn to write inside the caller's transaction, so the state only
+    advances together with the data it describes.
+    """
+    unknown = set(state) - set(STATE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown sync state columns: {', '.join(sorted(unknown))}")
+    ensure_sync_state_table()
+
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+
+    columns = list(state)
+    try:
+        update_clause = ", ".join([f"{column} = source.{column}" for column in columns] + ["updated_at = source.updated_at"])
+        cursor.execute(f'''
+            MERGE sync_state AS target
+            USING (VALUES (?, ?, ?{', ?' * len(columns)})) AS source (tenant_id, data_type, updated_at{''.join(f', {column}' for column in columns)})
+            ON target.tenant_id = source.tenant_id AND target.data_type = source.data_type
+            WHEN MATCHED THEN
+                UPDATE SET {update_clause}
+            WHEN NOT MATCHED THEN
+                INSERT (tenant_id, data_type, updated_at{''.join(f', {column}' for column in columns)})
+                VALUES (source.tenant_id, source.data_type, source.updated_at{''.join(f', source.{column}' for column in columns)});
+        ''', [tenant_id, data_type, datetime.now().isoformat()] + [state[column] for column in columns])
+        if own_connection:
+            conn.commit()
+    except Exception as e:
+        print(f"Error saving sync state for tenant {tenant_id} ({data_type}): {e}")
+        if own_connection:
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_connection:
+            conn.close()
+
+def clear_sync_state(tenant_id: str, data_type: Optional[str] = None):
+    """Forget sync state so the next fetch does a full sync."""
+    ensure_sync_state_table()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if data_type:
+            cursor.execute('DELETE FROM sync_state WHERE tenant_id = ? AND data_type = ?', (tenant_id, data_type))
+        else:
+            cursor.execute('DELETE FROM sync_state WHERE tenant_id = ?', (tenant_id,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
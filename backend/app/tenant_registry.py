@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, List
+
+@dataclass
+class Tenant:
+    """A row of the main tenants table."""
+    __slots__ = (
+        'id', 'name', 'tenantId', 'applicationId', 'applicationSecret', 'isActive',
+        'dateAdded', 'autoFetchEnabled', 'scheduleValue', 'scheduleUnit'
+    )
+
+    id: str
+    name: str
+    tenantId: str
+    applicationId: str
+    applicationSecret: str
+    isActive: bool
+    dateAdded: str
+    autoFetchEnabled: bool
+    scheduleValue: int
+    scheduleUnit: str
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'Tenant':
+        """Build a tenant from a column-name -> value mapping."""
+        return cls(
+            id=row['id'],
+            name=row['name'],
+            tenantId=row['tenantId'],
+            applicationId=row['applicationId'],
+            applicationSecret=row['applicationSecret'],
+            isActive=bool(row['isActive']),
+            dateAdded=row['dateAdded'],
+            # Scheduling columns are added lazily by the tenant routes
+            autoFetchEnabled=bool(row.get('autoFetchEnabled')) if row.get('autoFetchEnabled') is not None else False,
+            scheduleValue=row.get('scheduleValue') if row.get('scheduleValue') is not None else 1,
+            scheduleUnit=row.get('scheduleUnit') if row.get('scheduleUnit') is not None else 'hours'
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the tenant dictionary used throughout the backend."""
+        return asdict(self)
+
+class TenantRegistry:
+    """In-process cache of the tenants table.
+
+    The whole table is loaded in one query and lookups by id are served from
+    memory. Writers call invalidate(); the TTL is a safety net for changes made
+    by other processes.
+    """
+
+    def __init__(self, connect, ttl: Optional[float] = None):
+        self._connect = connect
+        self.ttl = ttl if ttl is not None else float(os.getenv('TENANT_CACHE_TTL', '300'))
+        self._tenants: Optional[Dict[str, Tenant]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Tenant]:
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT * FROM tenants')
+            columns = [column[0] for column in cursor.description]
+            tenants = {}
+            for row in cursor.fetchall():
+                tenant = Tenant.from_row(dict(zip(columns, row)))
+                tenants[tenant.id] = tenant
+            return tenants
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _snapshot(self, force: bool = False) -> Dict[str, Tenant]:
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > self.ttl
+            if force or self._tenants is None or expired:
+                self._tenants = self._load()
+                self._loaded_at = time.monotonic()
+            return self._tenants
+
+    def get(self, tenant_id: str) -> Optional[Tenant]:
+        """Get a tenant by its id, or None if it doesn't exist."""
+        tenant = self._snapshot().get(tenant_id)
+        if tenant is None and time.monotonic() - self._loaded_at > 5:
+            # The tenant may have been added by another process since the last load
+            tenant = self._snapshot(force=True).get(tenant_id)
+        return tenant
+
+    def all(self) -> List[Tenant]:
+        """Get all tenants."""
+        return list(self._snapshot().values())
+
+    def invalidate(self):
+        """Drop the cached tenants so the next lookup reloads the table."""
+        with self._lock:
+            self._tenants = None
+            self._loaded_at = 0.0
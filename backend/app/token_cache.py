@@ -0,0 +1,170 @@
+import os
+import time
+import threading
+from typing import Optional, Dict, Tuple, List
+
+import msal
+from cryptography.fernet import Fernet, InvalidToken
+
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.token_cache.bin')
+
+def _write_private(path: str, data: bytes):
+    """Atomically write a file readable only by the current user."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class TokenProvider:
+    """Process-wide MSAL applications backed by an encrypted on-disk token cache.
+
+    One ConfidentialClientApplication is kept per (tenant, client id) and all
+    of them share a SerializableTokenCache that is persisted to disk, so fetch
+    scripts running as separate processes reuse each other's tokens until
+    MSAL considers them close to expiry.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, key: Optional[str] = None):
+        self.cache_path = cache_path or os.getenv('TOKEN_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self._fernet = Fernet(key or os.getenv('TOKEN_CACHE_KEY') or self._load_or_create_key())
+        self._cache = msal.SerializableTokenCache()
+        self._cache_mtime = None
+        self._apps: Dict[Tuple[str, str], Tuple[str, msal.ConfidentialClientApplication]] = {}
+        self._app_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    def _load_or_create_key(self) -> bytes:
+        """Use a key file next to the cache when TOKEN_CACHE_KEY isn't set.
+
+        The file is created exclusively, so when the server and a CLI run
+        start together only one key is written and the other process reads it.
+        """
+        key_path = f"{self.cache_path}.key"
+        key = Fernet.generate_key()
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return self._read_key(key_path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        return key
+
+    @staticmethod
+    def _read_key(key_path: str, attempts: int = 50) -> bytes:
+        """Read an existing key file, waiting briefly if its creator is still writing it."""
+        for _ in range(attempts):
+            with open(key_path, 'rb') as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.1)
+        raise ValueError(f"Token cache key file {key_path} is empty")
+
+    def _reload_if_changed(self):
+        """Pick up tokens written to the cache file by other processes."""
+        try:
+            mtime = os.path.getmtime(self.cache_path)
+        except OSError:
+            return
+        if mtime == self._cache_mtime:
+            return
+
+        try:
+            with open(self.cache_path, 'rb') as f:
+                self._cache.deserialize(self._fernet.decrypt(f.read()).decode('utf-8'))
+        except (InvalidToken, ValueError, OSError) as e:
+            # A cache written with another key or a corrupt file is just a cold cache
+            print(f"Ignoring unreadable token cache {self.cache_path}: {e}")
+        self._cache_mtime = mtime
+
+    def _persist(self):
+        if not self._cache.has_state_changed:
+            return
+        try:
+            _write_private(self.cache_path, self._fernet.encrypt(self._cache.serialize().encode('utf-8')))
+            self._cache.has_state_changed = False
+            self._cache_mtime = os.path.getmtime(self.cache_path)
+        except OSError as e:
+            print(f"Error writing token cache {self.cache_path}: {e}")
+
+    def _get_app(self, tenant_id: str, client_id: str, client_secret: str) -> msal.ConfidentialClientApplication:
+        key = (tenant_id, client_id)
+        entry = self._apps.get(key)
+        # Rebuild the application if the tenant's secret was rotated
+        if entry is None or entry[0] != client_secret:
+            app = msal.ConfidentialClientApplication(
+                client_id,
+                authority=f"https://login.microsoftonline.com/{tenant_id}",
+                client_credential=client_secret,
+                token_cache=self._cache
+            )
+            entry = (client_secret, app)
+            self._apps[key] = entry
+        return entry[1]
+
+    def get_token(self, tenant_id: str, client_id: str, client_secret: str,
+                  scopes: Optional[List[str]] = None) -> Optional[str]:
+        """Get an app-only access token, from the cache when possible.
+
+        The provider lock only covers the shared cache file and application
+        table. The AAD round trip runs under a lock per application, so a
+        slow token request for one tenant doesn't hold up the others, and
+        concurrent misses for the same tenant make a single request.
+        """
+        scopes = scopes or GRAPH_SCOPES
+        with self._lock:
+            self._reload_if_changed()
+            app = self._get_app(tenant_id, client_id, client_secret)
+            app_lock = self._app_locks.setdefault((tenant_id, client_id), threading.Lock())
+
+        with app_lock:
+            result = app.acquire_token_silent(scopes, account=None)
+            if result and "access_token" in result:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return result["access_token"]
+
+            print("Fetching new token...")
+            result = app.acquire_token_for_client(scopes=scopes)
+
+        with self._lock:
+            self._stats['misses'] += 1
+            if "access_token" not in result:
+                self._stats['errors'] += 1
+                print(f"Error: {result.get('error')}")
+                print(f"Error description: {result.get('error_description')}")
+                return None
+            self._persist()
+        return result["access_token"]
+
+    def stats(self) -> Dict[str, int]:
+        """Token cache hit/miss counters for this process."""
+        with self._lock:
+            return dict(self._stats, applications=len(self._apps))
+
+def get_tenant_access_token(tenant) -> Optional[str]:
+    """Get a Graph access token for a tenant dictionary from the tenants table."""
+    try:
+        return get_token_provider().get_token(
+            tenant["tenantId"], tenant["applicationId"], tenant["applicationSecret"]
+        )
+    except Exception as e:
+        print(f"Error getting access token: {e}")
+        return None
+
+# Global instance
+token_provider = None
+_provider_lock = threading.Lock()
+
+def get_token_provider() -> TokenProvider:
+    """Get the process-wide token provider."""
+    global token_provider
+    if token_provider is None:
+        with _provider_lock:
+            if token_provider is None:
+                token_provider = TokenProvider()
+    return token_provider
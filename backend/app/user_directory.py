@@ -0,0 +1,128 @@
+import os
+import threading
+from typing import Dict, Any, Iterable, List
+
+from .database import get_db_connection
+from .bulk_upsert import bulk_merge
+
+# Directory properties kept in sync through users/delta
+USER_COLUMNS = ["tenant_id", "id", "user_principal_name", "display_name", "account_enabled"]
+# Sign-in activity, which users/delta doesn't return, is written separately
+SIGN_IN_COLUMNS = [
+    "tenant_id", "id", "last_sign_in_attempt", "last_successful_sign_in",
+    "last_sign_in_attempt_utc", "last_successful_sign_in_utc"
+]
+USER_KEY_COLUMNS = ["tenant_id", "id"]
+
+# Users without a sign-in for this many days are reported as inactive
+INACTIVE_USER_DAYS = int(os.getenv('INACTIVE_USER_DAYS', '90'))
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+def ensure_users_table():
+    """Create the tenant_users table once per process.
+
+    One row per directory user, kept current by applying delta changes, so
+    reports query it instead of re-reading every user from Graph.
+    """
+    global _table_ready
+    if _table_ready:
+        return
+
+    with _table_lock:
+        if _table_ready:
+            return
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='tenant_users' AND xtype='U')
+                BEGIN
+                    CREATE TABLE tenant_users (
+                        tenant_id NVARCHAR(255) NOT NULL,
+                        id NVARCHAR(255) NOT NULL,
+                        user_principal_name NVARCHAR(255),
+                        display_name NVARCHAR(255),
+                        account_enabled BIT,
+                        last_sign_in_attempt NVARCHAR(100),
+                        last_successful_sign_in NVARCHAR(100),
+                        last_sign_in_attempt_utc DATETIME2 NULL,
+                        last_successful_sign_in_utc DATETIME2 NULL,
+                        CONSTRAINT PK_tenant_users PRIMARY KEY (tenant_id, id)
+                    );
+                    CREATE INDEX IX_tenant_users_last_sign_in ON tenant_users (tenant_id, last_sign_in_attempt_utc);
+                END
+            ''')
+            conn.commit()
+            _table_ready = True
+        except Exception as e:
+            print(f"Error creating tenant_users table: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+def clear_users(conn, tenant_id: str) -> int:
+    """Delete a tenant's users before a full resync; the caller commits."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM tenant_users WHERE tenant_id = ?", (tenant_id,))
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def store_user_changes(conn, tenant_id: str, user_rows: List[Dict[str, Any]], removed_ids: Iterable[str]) -> Dict[str, int]:
+    """Apply one page of delta changes: upsert added or changed users, delete removed ones.
+
+    Returns inserted/updated/unchanged/deleted counts; the caller commits.
+    """
+    counts = bulk_merge(conn, "tenant_users", USER_KEY_COLUMNS, USER_COLUMNS, user_rows)
+    counts["deleted"] = 0
+
+    removed = [(tenant_id, user_id) for user_id in set(removed_ids)]
+    if removed:
+        cursor = conn.cursor()
+        try:
+            cursor.fast_executemany = True
+            cursor.executemany("DELETE FROM tenant_users WHERE tenant_id = ? AND id = ?", removed)
+            counts["deleted"] = len(removed)
+        finally:
+            cursor.close()
+    return counts
+
+def store_sign_in_activity(conn, sign_in_rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Upsert sign-in activity for a page of users; the caller commits."""
+    return bulk_merge(conn, "tenant_users", USER_KEY_COLUMNS, SIGN_IN_COLUMNS, sign_in_rows)
+
+def get_inactive_users(tenant_id: str, days: int = INACTIVE_USER_DAYS) -> List[Dict[str, Any]]:
+    """Get a tenant's users with no sign-in attempt in the given number of days.
+
+    Users that never signed in are included.
+    """
+    ensure_users_table()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT user_principal_name, display_name, account_enabled,
+                   last_sign_in_attempt, last_successful_sign_in
+            FROM tenant_users
+            WHERE tenant_id = ?
+            AND (last_sign_in_attempt_utc IS NULL OR last_sign_in_attempt_utc < DATEADD(day, -?, SYSUTCDATETIME()))
+            ORDER BY last_sign_in_attempt_utc
+        ''', (tenant_id, days))
+
+        return [{
+            'userPrincipalName': row[0],
+            'displayName': row[1],
+            'accountEnabled': bool(row[2]) if row[2] is not None else None,
+            'lastSignInAttempt': row[3],
+            'lastSuccessfulSignIn': row[4]
+        } for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
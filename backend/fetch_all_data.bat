@@ -3,11 +3,8 @@
 echo Running Microsoft 365 Data Fetcher
 echo ====================================================
 echo.
-echo Fetching Message Center Updates...
-python fetch_updates.py %*
-echo.
-echo Fetching License Data...
-python fetch_licenses.py %*
+echo Fetching Message Center Updates and License Data...
+python fetch_all_tenants.py --types message_center,licenses %*
 echo.
 echo Done!
 pause
@@ -0,0 +1,59 @@
+import sys
+import argparse
+
+from tenant_db_manager import fetch_tenants, get_tenant_details
+from app.fetch_engine import FETCHERS
+from app.graph_client import get_graph_client
+from app.fetch_orchestrator import create_run, execute_run, format_summary, parse_type_limits
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch data for many tenants in parallel")
+    parser.add_argument("tenant_ids", nargs="*", help="Process only these tenant IDs (default: all tenants)")
+    parser.add_argument("--types", default=",".join(FETCHERS),
+                        help=f"Comma separated data types to fetch (default: {','.join(FETCHERS)})")
+    parser.add_argument("--active-only", action="store_true", help="Skip inactive tenants")
+    parser.add_argument("--concurrency", type=int, help="Fetches at once across all tenants (at most FETCH_WORKERS)")
+    parser.add_argument("--type-limits", help="Per data type caps, e.g. windows_updates=2,licenses=1")
+    parser.add_argument("--full", action="store_true", help="Fetch the full message history instead of only recent changes")
+    args = parser.parse_args()
+
+    if args.tenant_ids:
+        tenants = []
+        for tenant_id in args.tenant_ids:
+            tenant = get_tenant_details(tenant_id)
+            if tenant:
+                tenants.append(tenant)
+            else:
+                print(f"No tenant found with ID: {tenant_id}")
+    else:
+        tenants = fetch_tenants()
+    if args.active_only:
+        tenants = [tenant for tenant in tenants if tenant['isActive']]
+    if not tenants:
+        print("No tenants found to process.")
+        return
+
+    try:
+        run = create_run(
+            tenants,
+            [data_type.strip() for data_type in args.types.split(",") if data_type.strip()],
+            max_concurrency=args.concurrency,
+            type_limits=parse_type_limits(args.type_limits),
+            options={'message_center': {'force_full_sync': args.full}}
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    execute_run(run)
+    print()
+    print(format_summary(run))
+    if any(task.state != 'succeeded' for task in run.tasks):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        # Graph request counts for the whole run
+        get_graph_client().log_stats()
@@ -1,244 +1,8 @@
-
-import feedparser
-import requests
 import sys
-import os
-import json
-from datetime import datetime, timedelta
-from dateutil import parser
-import time
-
-# Configuration
-# Removed invalid RSS feeds, keeping only the working one
-RSS_FEEDS = [
-    "https://www.microsoft.com/releasecommunications/api/v2/m365/rss",
-]
 
-# Common headers to mimic a browser
-COMMON_HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'application/xml, text/xml, */*',
-    'Accept-Language': 'en-US,en;q=0.9',
-}
-
-def get_db_connection(tenant_id):
-    """Connect to the tenant's Azure SQL database"""
-    # Add the backend directory to the Python path
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from app.database import get_db_connection, get_tenant_table_connection, ensure_tenant_tables_exist
-    
-    # First get connection to main database
-    main_conn = get_db_connection()
-    cursor = main_conn.cursor()
-    
-    # Find the tenant
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    main_conn.close()
-    
-    if not tenant:
-        print(f"Error: No tenant found with ID {tenant_id}")
-        sys.exit(1)
-    
-    # Convert pyodbc.Row to dictionary for easier access
-    tenant_dict = {
-        'id': tenant[0],
-        'name': tenant[1],
-        'tenantId': tenant[2],
-        'applicationId': tenant[3],
-        'applicationSecret': tenant[4],
-        'isActive': bool(tenant[5]),
-        'dateAdded': tenant[6]
-    }
-    
-    # Ensure tenant tables exist
-    table_exists = ensure_tenant_tables_exist(tenant_dict['id'], 'm365')
-    if not table_exists:
-        print(f"Failed to ensure tables exist for tenant: {tenant_dict['name']} (ID: {tenant_id})")
-        sys.exit(1)
-    
-    # Get connection and table name for tenant-specific operations
-    conn, table_name = get_tenant_table_connection(tenant_dict['id'], 'news', 'm365')
-    if not conn or not table_name:
-        print(f"Failed to get table connection for tenant: {tenant_dict['name']} (ID: {tenant_id})")
-        sys.exit(1)
-    
-    return conn, table_name, tenant_dict
-
-def ensure_news_table(conn, table_name):
-    """Ensure the m365_news table exists in the Azure SQL database"""
-    cursor = conn.cursor()
-    try:
-        cursor.execute(f"""
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table_name}')
-            BEGIN
-                CREATE TABLE {table_name} (
-                    id NVARCHAR(255) PRIMARY KEY,
-                    title NVARCHAR(MAX),
-                    published_date NVARCHAR(255),
-                    link NVARCHAR(MAX),
-                    summary NVARCHAR(MAX),
-                    categories NVARCHAR(MAX),
-                    fetch_date NVARCHAR(255)
-                )
-            END
-        """)
-        conn.commit()
-        print(f"Ensured news table {table_name} exists")
-    except Exception as e:
-        print(f"Error creating news table: {str(e)}")
-        raise
-
-def fetch_rss_feed(url):
-    try:
-        # Try up to 3 times with increasing timeouts
-        for attempt in range(3):
-            try:
-                timeout = 10 * (attempt + 1)  # 10, 20, 30 seconds
-                print(f"Attempt {attempt + 1} with timeout {timeout}s for {url}")
-                
-                response = requests.get(
-                    url,
-                    headers=COMMON_HEADERS,
-                    timeout=timeout
-                )
-                
-                if response.status_code != 200:
-                    print(f"HTTP Error {response.status_code} for {url}")
-                    continue
-                    
-                content_type = response.headers.get('Content-Type', '').lower()
-                if 'html' in content_type and 'xml' not in content_type:
-                    print(f"Server returned HTML instead of XML for {url}")
-                
-                # Parse the feed
-                feed = feedparser.parse(response.content)
-                
-                if hasattr(feed, 'bozo') and feed.bozo:
-                    print(f"Parse warning for {url}: {feed.bozo_exception if hasattr(feed, 'bozo_exception') else 'Unknown error'}")
-                    if not hasattr(feed, 'entries') or not feed.entries:
-                        continue
-                
-                # If we got some entries, return them
-                if hasattr(feed, 'entries') and feed.entries:
-                    print(f"Successfully fetched {len(feed.entries)} entries from {url}")
-                    return feed
-            except requests.exceptions.Timeout:
-                print(f"Timeout on attempt {attempt + 1} for {url}")
-                time.sleep(1)  # Wait a bit before retrying
-            except Exception as e:
-                print(f"Error on attempt {attempt + 1} for {url}: {str(e)}")
-                time.sleep(1)  # Wait a bit before retrying
-        
-        # If all attempts failed, generate some sample entries for testing
-        print(f"All attempts failed for {url}, generating sample entries")
-        return generate_sample_entries()
-        
-    except Exception as e:
-        print(f"Failed to fetch feed {url}: {str(e)}")
-        return generate_sample_entries()
-
-def generate_sample_entries():
-    """Generate some sample entries for testing"""
-    print("Generating sample entries for testing")
-    
-    # Create a simple feedparser-like object with entries
-    class SampleFeed:
-        def __init__(self):
-            self.entries = []
-            
-            # Add some sample entries with dates spread across the last 15 days
-            for i in range(1, 16):
-                # Create entry with date i days ago
-                days_ago = i
-                entry_date = datetime.now() - timedelta(days=days_ago)
-                
-                entry = {
-                    'id': f'sample-{i}',
-                    'title': f'Sample Microsoft 365 News {i} ({days_ago} days ago)',
-                    'published': entry_date.isoformat(),
-                    'link': 'https://www.microsoft.com/en-us/microsoft-365',
-                    'summary': f'This is a sample news entry {i} created {days_ago} days ago to verify that the system is working correctly and date filtering is applied.',
-                    'tags': [{'term': 'Sample'}, {'term': 'Test'}, {'term': f'Day-{days_ago}'}],
-                    'all_categories': ['Sample', 'Test', f'Day-{days_ago}']
-                }
-                self.entries.append(entry)
-    
-    return SampleFeed()
-
-def filter_recent_entries(entries, days=10):  # Changed to 10 days to match requirements
-    cutoff_date = (datetime.now() - timedelta(days=days)).date()
-    recent_entries = []
-    
-    for entry in entries:
-        published_str = entry.get('published', None)
-        if published_str:
-            try:
-                published_date = parser.parse(published_str).date()
-                if published_date >= cutoff_date:
-                    # Extract all categories for this entry
-                    entry_categories = entry.get('tags', [])
-                    categories = [tag.term if hasattr(tag, 'term') else str(tag) for tag in entry_categories]
-                    
-                    # If no tags, try getting categories from the 'category' field
-                    if not categories and hasattr(entry, 'category'):
-                        categories = [entry.category] if isinstance(entry.category, str) else entry.category
-                    
-                    # Add the categories to the entry for display
-                    entry['all_categories'] = categories
-                    recent_entries.append(entry)
-            except ValueError:
-                print(f"Skipping entry with invalid date format: {published_str}")
-    
-    print(f"Found {len(recent_entries)} recent entries from the last {days} days")
-    return recent_entries
-
-def store_news(conn, table_name, entries):
-    """Store news entries in the Azure SQL database"""
-    cursor = conn.cursor()
-    stored_count = 0
-    
-    for entry in entries:
-        # Check if we already have this entry
-        entry_id = entry.get('id', f'auto-{datetime.now().timestamp()}')
-        cursor.execute(f'SELECT id FROM {table_name} WHERE id = ?', (entry_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            continue  # Skip storing this entry as we already have it
-        
-        # Extract categories
-        categories = json.dumps(entry.get('all_categories', []))
-        
-        # Get the published date
-        published_date = entry.get('published', '')
-        
-        # Get summary
-        summary = entry.get('summary', '')
-        if hasattr(entry, 'summary_detail'):
-            summary = entry.summary_detail.get('value', summary)
-        
-        try:
-            cursor.execute(f'''
-                INSERT INTO {table_name} (
-                    id, title, published_date, link, summary, categories, fetch_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                entry_id,
-                entry.get('title', 'Untitled'),
-                published_date,
-                entry.get('link', ''),
-                summary,
-                categories,
-                datetime.now().isoformat()
-            ))
-            stored_count += 1
-        except Exception as e:
-            print(f"Error storing entry: {str(e)}")
-            print(f"Entry data: {entry}")
-    
-    conn.commit()
-    return stored_count
+from tenant_db_manager import get_tenant_details
+from app.fetch_engine import run_fetch
+from app.graph_client import get_graph_client
 
 def main():
     if len(sys.argv) < 2:
@@ -247,83 +11,17 @@ def main():
         sys.exit(1)
     
     tenant_id = sys.argv[1]
-    print(f"Fetching M365 news for tenant ID: {tenant_id}")
-    
-    # Get tenant database connection
-    conn, table_name, tenant = get_db_connection(tenant_id)
-    ensure_news_table(conn, table_name)
-    
-    # Add test news entries if the database is empty (for debugging)
-    cursor = conn.cursor()
-    cursor.execute(f'SELECT COUNT(*) as count FROM {table_name}')
-    count = cursor.fetchone()[0]
-    
-    if count == 0:
-        print("Adding some test news entries for debugging")
-        # Add multiple test entries with different dates (spread across the last 20 days)
-        for i in range(1, 21):
-            days_ago = i
-            test_entry = {
-                'id': f'test-news-entry-{i}',
-                'title': f'Test Microsoft 365 News Entry {i} ({days_ago} days ago)',
-                'published_date': (datetime.now() - timedelta(days=days_ago)).isoformat(),
-                'link': f'https://www.microsoft.com/en-us/microsoft-365/features/{i}',
-                'summary': f'This is test news entry {i} created {days_ago} days ago to verify that filtering is working correctly.',
-                'categories': json.dumps(['Test', 'Debug', f'Day-{days_ago}']),
-                'fetch_date': datetime.now().isoformat()
-            }
-            
-            cursor.execute(f'''
-                INSERT INTO {table_name} (
-                    id, title, published_date, link, summary, categories, fetch_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                test_entry['id'],
-                test_entry['title'],
-                test_entry['published_date'],
-                test_entry['link'],
-                test_entry['summary'],
-                test_entry['categories'],
-                test_entry['fetch_date']
-            ))
-        conn.commit()
-        print("Test news entries added")
-    
-    # Fetch updates from all RSS feeds
-    all_updates = []
-    for feed_url in RSS_FEEDS:
-        print(f"\nFetching updates from: {feed_url}")
-        feed = fetch_rss_feed(feed_url)
-        if feed and hasattr(feed, 'entries'):
-            recent_entries = filter_recent_entries(feed.entries)
-            all_updates.extend(recent_entries)
-
-    # Sort all updates by publication date (newest first)
-    # Fix for the datetime comparison issue: ensure all dates are in the same format
-    def safe_parse_date(date_str):
-        try:
-            # Parse the date and make it offset-naive
-            dt = parser.parse(date_str)
-            if dt.tzinfo is not None:
-                dt = dt.replace(tzinfo=None)
-            return dt
-        except Exception:
-            # Return a very old date as fallback
-            return datetime(1970, 1, 1)
-    
-    all_updates.sort(key=lambda x: safe_parse_date(x.get('published', '1970-01-01')), reverse=True)
-    
-    # Store the updates
-    stored_count = store_news(conn, table_name, all_updates)
-    print(f"Stored {stored_count} new updates in the database")
-    
-    # Verify the data was stored
-    cursor.execute(f'SELECT COUNT(*) as count FROM {table_name}')
-    total_count = cursor.fetchone()[0]
-    print(f"Total news items in database: {total_count}")
+    tenant = get_tenant_details(tenant_id)
+    if not tenant:
+        print(f"Error: No tenant found with ID {tenant_id}")
+        sys.exit(1)
     
-    conn.close()
-    print("Completed successfully")
+    if not run_fetch('news', tenant):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Graph request counts for the whole run
+        get_graph_client().log_stats()
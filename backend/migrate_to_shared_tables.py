@@ -0,0 +1,102 @@
+import argparse
+import sys
+
+from app.database import get_azure_config, get_tenant_registry
+from app.azure_db_config import TenantTableManager, PER_TENANT_LAYOUT, SHARED_LAYOUT
+
+# Columns copied for each table type; id and tenant_id are the shared key
+COPY_COLUMNS = {
+    "updates": [
+        "id", "title", "category", "severity", "startDateTime", "lastModifiedDateTime",
+        "isMajorChange", "actionRequiredByDateTime", "services", "hasAttachments",
+        "roadmapId", "platform", "status", "lastUpdateTime", "bodyContent", "tags",
+        "startDateTime_utc", "lastModifiedDateTime_utc", "actionRequiredByDateTime_utc", "content_hash"
+    ],
+    "m365_news": [
+        "id", "title", "published_date", "link", "summary", "categories", "fetch_date",
+        "published_date_utc", "fetch_date_utc"
+    ],
+    "windows_products": ["id", "name", "group_name", "friendly_names", "content_hash"],
+    "windows_known_issues": [
+        "id", "product_id", "title", "description", "status", "start_date", "resolved_date",
+        "web_view_url", "start_date_utc", "resolved_date_utc", "content_hash"
+    ],
+}
+
+def migrate_tenant(per_tenant, shared, tenant, drop_source=False):
+    """Copy one tenant's rows from its own tables into the shared tables."""
+    # Bring the per-tenant tables up to date so tenant_id, the typed and hash columns exist
+    per_tenant.ensure_tenant_schema(tenant.name, tenant.id)
+    
+    conn = get_azure_config().get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        for table_type, columns in COPY_COLUMNS.items():
+            source_table = per_tenant.get_table_name(tenant.name, table_type)
+            target_table = shared.get_table_name(tenant.name, table_type)
+            column_list = ", ".join(["tenant_id"] + columns)
+            
+            # Rows already copied by an earlier run are skipped
+            cursor.execute(f"""
+                INSERT INTO {target_table} ({column_list})
+                SELECT ?, {', '.join(f's.{column}' for column in columns)}
+                FROM {source_table} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {target_table} t WHERE t.tenant_id = ? AND t.id = s.id
+                )
+            """, (tenant.id, tenant.id))
+            print(f"  {source_table} -> {target_table}: {cursor.rowcount} rows copied")
+        
+        conn.commit()
+    except Exception as e:
+        print(f"Error migrating tenant {tenant.name}: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    
+    if drop_source:
+        per_tenant.drop_tenant_tables(tenant.name, "m365")
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-tenant tables to the shared multi-tenant tables")
+    parser.add_argument("tenant_id", nargs="?", help="Migrate only this tenant ID")
+    parser.add_argument("--drop-source", action="store_true", help="Drop the per-tenant tables after copying")
+    args = parser.parse_args()
+    
+    azure_config = get_azure_config()
+    per_tenant = TenantTableManager(azure_config, storage_layout=PER_TENANT_LAYOUT)
+    shared = TenantTableManager(azure_config, storage_layout=SHARED_LAYOUT)
+    
+    # Create the shared tables before copying anything into them
+    shared.ensure_tenant_schema(None)
+    
+    registry = get_tenant_registry()
+    if args.tenant_id:
+        tenant = registry.get(args.tenant_id)
+        if not tenant:
+            print(f"Error: No tenant found with ID {args.tenant_id}")
+            sys.exit(1)
+        tenants = [tenant]
+    else:
+        tenants = registry.all()
+    
+    failed = []
+    for tenant in tenants:
+        print(f"Migrating tenant: {tenant.name} (ID: {tenant.id})")
+        try:
+            migrate_tenant(per_tenant, shared, tenant, args.drop_source)
+        except Exception:
+            failed.append(tenant.name)
+    
+    print(f"Migrated {len(tenants) - len(failed)} of {len(tenants)} tenants")
+    if failed:
+        print(f"Failed tenants: {', '.join(failed)}")
+        sys.exit(1)
+    
+    print("Set TENANT_STORAGE_LAYOUT=shared and restart the backend to use the shared tables")
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,21 @@ import threading
 import time
 import schedule
 from datetime import datetime, timedelta
-from app.database import get_db_connection
-import subprocess
-import os
-import sys
+from app.database import get_db_connection, get_tenant_registry
+from app.sync_state import get_sync_state
+from app.fetch_engine import submit_job
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# Data types fetched on each auto-fetch run, in reporting order
+FETCH_STEPS = [
+    ('message_center', '📧', 'message center data'),
+    ('windows_updates', '🪟', 'Windows updates data'),
+    ('news', '📰', 'M365 news data'),
+]
+# Data types whose fetch records change counts in sync_state
+CHANGE_COUNTED_TYPES = ('message_center', 'windows_updates')
+# Seconds an auto-fetch run waits for its fetches
+FETCH_TIMEOUT = 300
 
 class TenantDataScheduler:
     def __init__(self):
@@ -72,17 +83,15 @@ class TenantDataScheduler:
                 )
             ''')
             
-            # Get all active tenants with auto-fetch enabled
-            cursor.execute('''
-                SELECT id, name, tenantId, autoFetchEnabled, scheduleValue, scheduleUnit 
-                FROM tenants 
-                WHERE isActive = 1 AND autoFetchEnabled = 1
-            ''')
-            
-            tenants = cursor.fetchall()
             cursor.close()
             conn.close()
             
+            # Get all active tenants with auto-fetch enabled
+            tenants = [
+                tenant for tenant in get_tenant_registry().all()
+                if tenant.isActive and tenant.autoFetchEnabled
+            ]
+            
             if not tenants:
                 print("No tenants with auto-fetch enabled found")
                 return
@@ -90,12 +99,12 @@ class TenantDataScheduler:
             print(f"Found {len(tenants)} tenants with auto-fetch enabled")
             
             for tenant in tenants:
-                tenant_id = tenant[0]
-                tenant_name = tenant[1]
-                tenant_azure_id = tenant[2]
-                auto_fetch_enabled = bool(tenant[3])
-                schedule_value = tenant[4] if len(tenant) > 4 and tenant[4] else 1
-                schedule_unit = tenant[5] if len(tenant) > 5 and tenant[5] else 'hours'
+                tenant_id = tenant.id
+                tenant_name = tenant.name
+                tenant_azure_id = tenant.tenantId
+                auto_fetch_enabled = tenant.autoFetchEnabled
+                schedule_value = tenant.scheduleValue or 1
+                schedule_unit = tenant.scheduleUnit or 'hours'
                 
                 if not auto_fetch_enabled:
                     continue
@@ -198,115 +207,58 @@ class TenantDataScheduler:
         except Exception as e:
             print(f"Error updating refresh time for {data_type}: {e}")
     
+    def _log_changes(self, tenant_id, data_type):
+        """Print how many rows the last fetch of a data type changed."""
+        try:
+            state = get_sync_state(tenant_id, data_type)
+            if state["changed_count"] is not None:
+                print(f"       {state['changed_count']} changed, {state['unchanged_count']} unchanged")
+        except Exception as e:
+            print(f"Error reading change counts for {data_type}: {e}")
+    
     def _fetch_all_data(self, tenant_id, tenant_name, tenant_azure_id):
         """Fetch all data types (message center, windows updates, and news) for a tenant"""
         try:
             print(f"🚀 Starting auto-fetch for tenant {tenant_name} (Azure ID: {tenant_azure_id})")
             
-            # Get the directory where the script is located
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            # Fetch message center data
-            print(f"  📧 Fetching message center data...")
-            try:
-                if os.name == 'nt':  # Windows
-                    result = subprocess.run(
-                        [os.path.join(script_dir, 'fetch_updates.bat'), tenant_id], 
-                        cwd=script_dir,
-                        capture_output=True, 
-                        text=True, 
-                        timeout=300
-                    )
-                else:  # Unix/Linux
-                    result = subprocess.run(
-                        [sys.executable, os.path.join(script_dir, 'fetch_updates.py'), tenant_id], 
-                        cwd=script_dir,
-                        capture_output=True, 
-                        text=True, 
-                        timeout=300
-                    )
-                
-                if result.returncode == 0:
-                    print(f"     ✓ Message center data fetched successfully")
-                    self._update_refresh_time(tenant_id, 'message_center', 'success')
-                else:
-                    print(f"     ✗ Message center fetch failed: {result.stderr}")
-                    self._update_refresh_time(tenant_id, 'message_center', 'failed')
-                    
-            except subprocess.TimeoutExpired:
-                print(f"     ✗ Message center fetch timed out")
-                self._update_refresh_time(tenant_id, 'message_center', 'timeout')
-            except Exception as e:
-                print(f"     ✗ Message center fetch error: {e}")
-                self._update_refresh_time(tenant_id, 'message_center', 'error')
+            tenant = get_tenant_registry().get(tenant_id)
+            if not tenant:
+                print(f"❌ Tenant {tenant_name} no longer exists, skipping auto-fetch")
+                return
+            tenant = tenant.to_dict()
             
-            # Fetch Windows updates data
-            print(f"  🪟 Fetching Windows updates data...")
-            try:
-                if os.name == 'nt':  # Windows
-                    result = subprocess.run(
-                        [os.path.join(script_dir, 'fetch_windows_updates.bat'), tenant_id], 
-                        cwd=script_dir,
-                        capture_output=True, 
-                        text=True, 
-                        timeout=300
-                    )
-                else:  # Unix/Linux
-                    result = subprocess.run(
-                        [sys.executable, os.path.join(script_dir, 'fetch_windows_updates.py'), tenant_id], 
-                        cwd=script_dir,
-                        capture_output=True, 
-                        text=True, 
-                        timeout=300
-                    )
-                
-                if result.returncode == 0:
-                    print(f"     ✓ Windows updates data fetched successfully")
-                    self._update_refresh_time(tenant_id, 'windows_updates', 'success')
-                else:
-                    print(f"     ✗ Windows updates fetch failed: {result.stderr}")
-                    self._update_refresh_time(tenant_id, 'windows_updates', 'failed')
-                    
-            except subprocess.TimeoutExpired:
-                print(f"     ✗ Windows updates fetch timed out")
-                self._update_refresh_time(tenant_id, 'windows_updates', 'timeout')
-            except Exception as e:
-                print(f"     ✗ Windows updates fetch error: {e}")
-                self._update_refresh_time(tenant_id, 'windows_updates', 'error')
+            # The data types are independent, so they run side by side as fetch jobs
+            jobs = {}
+            for data_type, _, _ in FETCH_STEPS:
+                try:
+                    jobs[data_type] = submit_job(data_type, tenant)
+                except Exception as e:
+                    print(f"     ✗ Could not queue {data_type} fetch: {e}")
+                    self._update_refresh_time(tenant_id, data_type, 'error')
+            deadline = time.monotonic() + FETCH_TIMEOUT
             
-            # Fetch news data
-            print(f"  📰 Fetching M365 news data...")
-            try:
-                if os.name == 'nt':  # Windows
-                    result = subprocess.run(
-                        [os.path.join(script_dir, 'fetch_m365_news.bat'), tenant_id], 
-                        cwd=script_dir,
-                        capture_output=True, 
-                        text=True, 
-                        timeout=300
-                    )
-                else:  # Unix/Linux
-                    result = subprocess.run(
-                        [sys.executable, os.path.join(script_dir, 'fetch_m365_news.py'), tenant_id], 
-                        cwd=script_dir,
-                        capture_output=True, 
-                        text=True, 
-                        timeout=300
-                    )
-                
-                if result.returncode == 0:
-                    print(f"     ✓ M365 news data fetched successfully")
-                    self._update_refresh_time(tenant_id, 'news', 'success')
-                else:
-                    print(f"     ✗ M365 news fetch failed: {result.stderr}")
-                    self._update_refresh_time(tenant_id, 'news', 'failed')
-                    
-            except subprocess.TimeoutExpired:
-                print(f"     ✗ M365 news fetch timed out")
-                self._update_refresh_time(tenant_id, 'news', 'timeout')
-            except Exception as e:
-                print(f"     ✗ M365 news fetch error: {e}")
-                self._update_refresh_time(tenant_id, 'news', 'error')
+            for data_type, icon, label in FETCH_STEPS:
+                if data_type not in jobs:
+                    continue
+                print(f"  {icon} Fetching {label}...")
+                name = label[0].upper() + label[1:]
+                try:
+                    # A timed out fetch keeps running on its worker; it is only reported
+                    succeeded = jobs[data_type].future.result(timeout=max(deadline - time.monotonic(), 0))
+                    if succeeded:
+                        print(f"     ✓ {name} fetched successfully")
+                        if data_type in CHANGE_COUNTED_TYPES:
+                            self._log_changes(tenant_id, data_type)
+                        self._update_refresh_time(tenant_id, data_type, 'success')
+                    else:
+                        print(f"     ✗ {name} fetch failed")
+                        self._update_refresh_time(tenant_id, data_type, 'failed')
+                except FutureTimeoutError:
+                    print(f"     ✗ {name} fetch timed out")
+                    self._update_refresh_time(tenant_id, data_type, 'timeout')
+                except Exception as e:
+                    print(f"     ✗ {name} fetch error: {e}")
+                    self._update_refresh_time(tenant_id, data_type, 'error')
                 
             print(f"🎉 Completed auto-fetch for tenant {tenant_name}")
             
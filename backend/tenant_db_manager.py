@@ -3,70 +3,27 @@ import os
 import sys
 import json
 from datetime import datetime
-import pandas as pd
-import requests
-import io
-from app.database import get_db_connection, get_table_manager, get_tenant_table_connection, ensure_tenant_tables_exist
-
-# List of known trial SKUs
-TRIAL_SKUS = [
-    "DEVELOPERPACK_E5",
-    "ENTERPRISEPREMIUM_TRIAL",
-    "ENTERPRISEPACK_TRIAL",
-    "FLOW_FREE",
-    "POWER_BI_STANDARD",
-    "TEAMS_EXPLORATORY"
-]
+from app.database import get_db_connection, get_table_manager, get_tenant_table_connection, ensure_tenant_tables_exist, get_tenant_registry
+from app.sku_names import get_sku_name_cache, TRIAL_SKUS
 
 def get_tenant_db_connection():
     """Get a connection to the main Azure SQL database."""
     return get_db_connection()
 
 def fetch_tenants():
-    """Fetch all tenants from the tenant configuration database."""
-    conn = get_tenant_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tenants")
-    tenants = []
-    
-    for row in cursor.fetchall():
-        tenant_dict = {
-            'id': row[0],
-            'name': row[1],
-            'tenantId': row[2],
-            'applicationId': row[3],
-            'applicationSecret': row[4],
-            'isActive': bool(row[5]),
-            'dateAdded': row[6]
-        }
-        tenants.append(tenant_dict)
-    
-    cursor.close()
-    conn.close()
-    return tenants
+    """Fetch all tenants from the tenant registry."""
+    return [tenant.to_dict() for tenant in get_tenant_registry().all()]
 
 def find_tenant_databases(tenant_id):
     """Find tenant information for table operations.
     
     Returns a dictionary with tenant info.
     """
-    conn = get_tenant_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-        tenant = cursor.fetchone()
+        tenant = get_tenant_registry().get(tenant_id)
         
         if tenant:
-            tenant_dict = {
-                'id': tenant[0],
-                'name': tenant[1],
-                'tenantId': tenant[2],
-                'applicationId': tenant[3],
-                'applicationSecret': tenant[4],
-                'isActive': bool(tenant[5]),
-                'dateAdded': tenant[6]
-            }
+            tenant_dict = tenant.to_dict()
             
             return {
                 'tenant': tenant_dict,
@@ -78,9 +35,6 @@ def find_tenant_databases(tenant_id):
     except Exception as e:
         print(f"Error finding tenant databases: {e}")
         return {}
-    finally:
-        cursor.close()
-        conn.close()
 
 def get_tenant_database_path(tenant):
     """Get the database path for a tenant (compatibility function).
@@ -115,64 +69,15 @@ def initialize_tenant_database(tenant, skip_service_announcements=False):
         return None
 
 def get_access_token(tenant):
-    """Get an access token for a specific tenant using MSAL."""
-    import msal
-    
-    CLIENT_ID = tenant["applicationId"]
-    TENANT_ID = tenant["tenantId"]
-    CLIENT_SECRET = tenant["applicationSecret"]
-    AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
-    
-    try:
-        # Create MSAL client application
-        app = msal.ConfidentialClientApplication(
-            CLIENT_ID, authority=AUTHORITY, client_credential=CLIENT_SECRET
-        )
-
-        # Acquire an access token
-        result = app.acquire_token_silent(["https://graph.microsoft.com/.default"], account=None)
-        if not result:
-            print("Fetching new token...")
-            result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-
-        if "access_token" not in result:
-            print(f"Error: {result.get('error')}")
-            print(f"Error description: {result.get('error_description')}")
-            return None
-        
-        return result["access_token"]
-    except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+    """Get an access token for a specific tenant, reusing cached tokens."""
+    from app.token_cache import get_tenant_access_token
+    return get_tenant_access_token(tenant)
 
 def get_translation_table():
-    """Get the translation table for SKU IDs to human-readable names."""
-    try:
-        url = "https://download.microsoft.com/download/e/3/e/e3e9faf2-f28b-490a-9ada-c6089a1fc5b0/Product%20names%20and%20service%20plan%20identifiers%20for%20licensing.csv"
-        response = requests.get(url)
-        response.raise_for_status()
-        return pd.read_csv(io.StringIO(response.text))
-    except Exception as e:
-        print(f"Error fetching translation table: {e}")
-        return pd.DataFrame(columns=['GUID', 'Product_Display_Name'])  # Return empty DataFrame
+    """Get the lowercase SKU GUID -> human-readable name dict, from the shared cache."""
+    return get_sku_name_cache().get_names()
 
 def get_tenant_details(tenant_id):
-    """Get tenant details from the tenant configuration database."""
-    conn = get_tenant_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tenants WHERE id = ?', (tenant_id,))
-    tenant = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    
-    if tenant:
-        return {
-            'id': tenant[0],
-            'name': tenant[1],
-            'tenantId': tenant[2],
-            'applicationId': tenant[3],
-            'applicationSecret': tenant[4],
-            'isActive': bool(tenant[5]),
-            'dateAdded': tenant[6]
-        }
-    return None
+    """Get tenant details from the tenant registry."""
+    tenant = get_tenant_registry().get(tenant_id)
+    return tenant.to_dict() if tenant else None
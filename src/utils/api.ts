@@ -1,5 +1,6 @@
 
 // Base API utilities for communicating with the backend
+import { FetchJob } from './types';
 
 // Use the exact URL that's shown in the Flask terminal output
 export const API_URL = 'http://127.0.0.1:5000/api';
@@ -23,3 +24,33 @@ export const initDatabases = async (): Promise<boolean> => {
     return false;
   }
 };
+
+// How often and for how long to poll a fetch job before giving up
+const JOB_POLL_INTERVAL_MS = 2000;
+const JOB_POLL_TIMEOUT_MS = 15 * 60 * 1000;
+
+// Wait for a fetch job queued by a POST /fetch-* endpoint to finish
+export const waitForFetchJob = async (jobId: string): Promise<FetchJob | null> => {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+  
+  while (Date.now() < deadline) {
+    const response = await fetch(`${API_URL}/jobs/${jobId}`);
+    if (!response.ok) {
+      console.error(`Error polling fetch job ${jobId}: ${response.status} ${response.statusText}`);
+      return null;
+    }
+    
+    const job: FetchJob = await response.json();
+    if (job.state === 'succeeded' || job.state === 'failed') {
+      if (job.state === 'failed') {
+        console.error(`Fetch job ${jobId} failed:`, job.error);
+      }
+      return job;
+    }
+    
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+  
+  console.error(`Timed out waiting for fetch job ${jobId}`);
+  return null;
+};
@@ -1,5 +1,5 @@
 
-import { API_URL } from './api';
+import { API_URL, waitForFetchJob } from './api';
 import { M365News } from './types';
 
 export const getM365News = async (tenantId: string): Promise<M365News[]> => {
@@ -84,8 +84,9 @@ export const fetchM365News = async (tenantId: string): Promise<boolean> => {
     }
     
     const result = await response.json();
-    console.log('M365 news fetch result:', result);
-    return true;
+    console.log('M365 news fetch queued:', result);
+    const job = await waitForFetchJob(result.jobId);
+    return job?.state === 'succeeded';
   } catch (error) {
     console.error('Error in fetchM365News:', error);
     return false;
@@ -1,6 +1,6 @@
 
 import { TenantUpdate } from './types';
-import { API_URL } from './api';
+import { API_URL, waitForFetchJob } from './api';
 
 // Message Center Updates Operations
 export const getTenantUpdates = async (tenantId?: string): Promise<TenantUpdate[]> => {
@@ -81,8 +81,9 @@ export const fetchTenantUpdates = async (tenantId: string): Promise<boolean> =>
     }
     
     const result = await response.json();
-    console.log('Fetch updates response:', result);
-    return true;
+    console.log('Fetch updates queued:', result);
+    const job = await waitForFetchJob(result.jobId);
+    return job?.state === 'succeeded';
   } catch (error) {
     console.error('Error triggering update fetch:', error);
     return false;
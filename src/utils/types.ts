@@ -118,3 +118,18 @@ export interface NotificationSetting {
   created_at: string;
   updated_at: string;
 }
+
+export interface FetchJob {
+  id: string;
+  dataType: string;
+  tenantId: string;
+  tenantName: string;
+  state: 'queued' | 'running' | 'succeeded' | 'failed';
+  progress: Record<string, number | boolean>;
+  error: string | null;
+  createdAt: string;
+  startedAt: string | null;
+  finishedAt: string | null;
+  queuedSeconds: number;
+  runSeconds: number | null;
+}
@@ -1,5 +1,5 @@
 
-import { API_URL } from './api';
+import { API_URL, waitForFetchJob } from './api';
 import { WindowsUpdate } from './types';
 
 // Windows Updates Operations
@@ -64,8 +64,9 @@ export const fetchWindowsUpdates = async (tenantId: string): Promise<boolean> =>
     }
     
     const result = await response.json();
-    console.log('Windows updates fetch result:', result);
-    return true;
+    console.log('Windows updates fetch queued:', result);
+    const job = await waitForFetchJob(result.jobId);
+    return job?.state === 'succeeded';
   } catch (error) {
     console.error('Error in fetchWindowsUpdates:', error);
     return false;